@@ -2,12 +2,36 @@
 
 import os
 import sys
-import docx
-import unicodedata
-from docx.oxml.text.run import CT_R
-from docx.oxml.text.paragraph import CT_P
-from docx.oxml.table import CT_Tbl
 import re
+import csv
+import json
+import hashlib
+import zipfile
+import argparse
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+# Parts of the package that hold text, with the label used in the report
+TEXT_PARTS = [
+    (re.compile(r'^word/document\.xml$'), None),
+    (re.compile(r'^word/header(\d*)\.xml$'), "Header"),
+    (re.compile(r'^word/footer(\d*)\.xml$'), "Footer"),
+    (re.compile(r'^word/footnotes\.xml$'), "Footnotes"),
+    (re.compile(r'^word/endnotes\.xml$'), "Endnotes"),
+    (re.compile(r'^word/comments\.xml$'), "Comments"),
+]
+
+# Bump when the scan logic changes so cached results are not reused
+SCANNER_VERSION = 2
+
+# Number of locations kept per character in reports and cache entries
+MAX_LOCATIONS = 50
+
+_invalid_pattern = None
 
 def is_valid_unicode(char):
     """Check if a character is a valid Unicode character."""
@@ -17,87 +41,323 @@ def is_valid_unicode(char):
     except ValueError:
         return False
 
-def analyze_docx(file_path):
-    """Analyze a DOCX file for non-Unicode characters."""
-    print(f"\nAnalyzing: {os.path.basename(file_path)}")
-    
-    # Load the document
-    try:
-        doc = docx.Document(file_path)
-    except Exception as e:
-        print(f"Error opening document: {e}")
-        return
-    
-    # Track non-Unicode characters
-    non_unicode_chars = {}
+def invalid_char_pattern():
+    """
+    Compile (once) a regex matching every character without a Unicode name:
+    private-use, unassigned, surrogates and control characters other than \\n and \\t.
+    """
+    global _invalid_pattern
+    if _invalid_pattern is None:
+        ranges = []
+        start = None
+        for code in range(0x110000):
+            invalid = unicodedata.name(chr(code), None) is None and chr(code) not in "\n\t"
+            if invalid and start is None:
+                start = code
+            elif not invalid and start is not None:
+                ranges.append((start, code - 1))
+                start = None
+        if start is not None:
+            ranges.append((start, 0x10FFFF))
+        char_class = ''.join(
+            re.escape(chr(a)) if a == b else f"{re.escape(chr(a))}-{re.escape(chr(b))}"
+            for a, b in ranges
+        )
+        _invalid_pattern = re.compile(f"[{char_class}]")
+    return _invalid_pattern
+
+def list_text_parts(zip_ref):
+    """Return (part name, label) for every text part of the package, body first."""
+    parts = []
+    for pattern, label in TEXT_PARTS:
+        for name in sorted(zip_ref.namelist()):
+            match = pattern.match(name)
+            if match:
+                if label in ("Header", "Footer"):
+                    parts.append((name, f"{label} {match.group(1) or 1}"))
+                else:
+                    parts.append((name, label))
+    return parts
+
+def scan_part(xml_file, part_label, on_paragraph):
+    """
+    Stream one WordprocessingML part and call on_paragraph(text, location, kind)
+    for each paragraph, with a python-docx like location string.
+    """
+    tables = []        # stack of [table number, row, column, paragraph] for nested tables
+    text_boxes = []    # stack of [text box number, paragraph]
+    buffers = []       # text of the paragraphs being read (text boxes nest inside paragraphs)
+    counters = {"paragraph": 0, "table": 0, "text box": 0}
+    fallback_depth = 0
+
+    for event, elem in etree.iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag
+
+        # Text boxes are stored twice (mc:Choice and mc:Fallback), only read the first copy
+        if tag == f"{MC_NS}Fallback":
+            fallback_depth += 1 if event == "start" else -1
+            if event == "end":
+                elem.clear()
+            continue
+        if fallback_depth:
+            continue
+
+        if event == "start":
+            if tag == f"{W_NS}p":
+                buffers.append([])
+                if text_boxes:
+                    text_boxes[-1][1] += 1
+                elif tables:
+                    tables[-1][3] += 1
+                else:
+                    counters["paragraph"] += 1
+            elif tag == f"{W_NS}tbl" and not text_boxes:
+                if not tables:
+                    counters["table"] += 1
+                    tables.append([counters["table"], 0, 0, 0])
+                else:
+                    tables.append([f"{tables[-1][0]}.{tables[-1][1]}", 0, 0, 0])
+            elif tag == f"{W_NS}tr" and tables and not text_boxes:
+                tables[-1][1] += 1
+                tables[-1][2] = 0
+            elif tag == f"{W_NS}tc" and tables and not text_boxes:
+                tables[-1][2] += 1
+                tables[-1][3] = 0
+            elif tag == f"{W_NS}txbxContent":
+                counters["text box"] += 1
+                text_boxes.append([counters["text box"], 0])
+            continue
+
+        if tag == f"{W_NS}t":
+            if buffers and elem.text:
+                buffers[-1].append(elem.text)
+        elif tag == f"{W_NS}tab":
+            if buffers and elem.getparent() is not None and elem.getparent().tag == f"{W_NS}r":
+                buffers[-1].append("\t")
+        elif tag in (f"{W_NS}br", f"{W_NS}cr"):
+            if buffers:
+                buffers[-1].append("\n")
+        elif tag == f"{W_NS}sym":
+            # Symbol-font characters inserted with Insert > Symbol are not w:t text
+            char = elem.get(f"{W_NS}char")
+            if buffers and char:
+                try:
+                    buffers[-1].append(chr(int(char, 16)))
+                except ValueError:
+                    pass
+        elif tag == f"{W_NS}p":
+            text = ''.join(buffers.pop())
+            if text_boxes:
+                location = f"Text box {text_boxes[-1][0]}, Paragraph {text_boxes[-1][1]}"
+                kind = "text box"
+            elif tables:
+                table, row, col, para = tables[-1]
+                location = f"Table {table}, Row {row}, Column {col}, Paragraph {para}"
+                kind = "table"
+            else:
+                location = f"Paragraph {counters['paragraph']}"
+                kind = "paragraph"
+            if part_label:
+                location = f"{part_label}, {location}"
+                kind = part_label.split()[0].lower()
+            on_paragraph(text, location, kind)
+            if not buffers and not tables:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+        elif tag == f"{W_NS}txbxContent":
+            text_boxes.pop()
+        elif tag == f"{W_NS}tbl" and tables and not text_boxes:
+            tables.pop()
+            if not tables and not buffers:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+def file_sha256(file_path):
+    """Return the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_docx(file_path):
+    """
+    Scan a DOCX file for non-Unicode characters without printing anything.
+    Returns a JSON-serializable result, or a result with an 'error' key.
+    """
+    pattern = invalid_char_pattern()
+
+    characters = {}
+    location_counts = {}
     total_chars = 0
-    
-    # Function to process text and find non-Unicode characters
-    def process_text(text, location):
+
+    # Called once per paragraph of every text part, in a single pass
+    def process_text(text, location, kind):
         nonlocal total_chars
         total_chars += len(text)
-        
-        for i, char in enumerate(text):
-            if char != "\n" and char != "\t":
-                if not is_valid_unicode(char):
-                    char_repr = repr(char)[1:-1]  # Get string representation without quotes
-                    if char_repr not in non_unicode_chars:
-                        non_unicode_chars[char_repr] = []
-                    non_unicode_chars[char_repr].append(f"{location} (position {i})")
-    
-    # Process paragraphs
-    for i, para in enumerate(doc.paragraphs):
-        process_text(para.text, f"Paragraph {i+1}")
-    
-    # Process tables
-    for i, table in enumerate(doc.tables):
-        for row_idx, row in enumerate(table.rows):
-            for col_idx, cell in enumerate(row.cells):
-                for para_idx, para in enumerate(cell.paragraphs):
-                    process_text(para.text, f"Table {i+1}, Row {row_idx+1}, Column {col_idx+1}, Paragraph {para_idx+1}")
-    
-    # Process runs directly (might catch more characters)
-    for i, para in enumerate(doc.paragraphs):
-        for j, run in enumerate(para.runs):
-            process_text(run.text, f"Paragraph {i+1}, Run {j+1}")
-    
+
+        for match in pattern.finditer(text):
+            char_repr = repr(match.group())[1:-1]  # Get string representation without quotes
+            if char_repr not in characters:
+                characters[char_repr] = {
+                    "codepoint": f"U+{ord(match.group()):04X}",
+                    "count": 0,
+                    "by_location": {},
+                    "locations": [],
+                }
+            entry = characters[char_repr]
+            entry["count"] += 1
+            entry["by_location"][kind] = entry["by_location"].get(kind, 0) + 1
+            if len(entry["locations"]) < MAX_LOCATIONS:
+                entry["locations"].append(f"{location} (position {match.start()})")
+            location_counts[kind] = location_counts.get(kind, 0) + 1
+
+    result = {"file": os.path.basename(file_path)}
+
+    # Open the package and stream every text part
+    try:
+        with zipfile.ZipFile(file_path) as zip_ref:
+            for part_name, part_label in list_text_parts(zip_ref):
+                with zip_ref.open(part_name) as xml_file:
+                    scan_part(xml_file, part_label, process_text)
+    except (zipfile.BadZipFile, etree.XMLSyntaxError, KeyError, OSError) as e:
+        result["error"] = str(e)
+        return result
+
+    result.update({
+        "total_chars": total_chars,
+        "occurrences": sum(entry["count"] for entry in characters.values()),
+        "characters": characters,
+        "locations": location_counts,
+    })
+    return result
+
+def print_report(result):
+    """Print the human-readable report of one scan result."""
+    print(f"\nAnalyzing: {result['file']}")
+
+    if "error" in result:
+        print(f"Error opening document: {result['error']}")
+        return
+
+    characters = result["characters"]
+
     # Report findings
-    if non_unicode_chars:
-        print(f"Found {len(non_unicode_chars)} types of non-Unicode characters:")
-        for char, locations in non_unicode_chars.items():
+    if characters:
+        print(f"Found {len(characters)} types of non-Unicode characters:")
+        for char, entry in characters.items():
             print(f"  - Character: '{char}' (hex: {' '.join(hex(ord(c))[2:] for c in char if ord(c) < 0x110000)})")
-            print(f"    Appears {len(locations)} times")
+            print(f"    Appears {entry['count']} times")
             # Print first 5 locations
-            for loc in locations[:5]:
+            for loc in entry["locations"][:5]:
                 print(f"    - {loc}")
-            if len(locations) > 5:
-                print(f"    - ... and {len(locations) - 5} more locations")
+            if entry["count"] > 5:
+                print(f"    - ... and {entry['count'] - 5} more locations")
+        print("Occurrences by location: " + ", ".join(
+            f"{kind}: {count}" for kind, count in sorted(result["locations"].items(), key=lambda x: x[1], reverse=True)))
     else:
         print("No non-Unicode characters found.")
     
-    print(f"Total characters analyzed: {total_chars}")
-    
-    return non_unicode_chars
+    print(f"Total characters analyzed: {result['total_chars']}")
+
+def analyze_docx(file_path):
+    """Analyze a DOCX file for non-Unicode characters."""
+    result = scan_docx(file_path)
+    print_report(result)
+
+    if "error" in result:
+        return
+
+    return {char: entry["locations"] for char, entry in result["characters"].items()}
+
+def load_cache(cache_file):
+    """Load cached scan results, keyed by docx SHA-256."""
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != SCANNER_VERSION:
+        return {}
+    return cache.get("results", {})
+
+def save_cache(cache_file, results):
+    """Atomically write the scan cache."""
+    temp_file = cache_file + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump({"version": SCANNER_VERSION, "results": results}, f, ensure_ascii=False)
+    os.replace(temp_file, cache_file)
+
+def write_report(report_file, results):
+    """Write the scan results as JSON, or as CSV with one row per file, character and location."""
+    if report_file.endswith('.csv'):
+        with open(report_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "sha256", "character", "codepoint", "location", "count", "error"])
+            for result in results:
+                if "error" in result:
+                    writer.writerow([result["file"], result["sha256"], "", "", "", "", result["error"]])
+                    continue
+                if not result["characters"]:
+                    writer.writerow([result["file"], result["sha256"], "", "", "", 0, ""])
+                for char, entry in result["characters"].items():
+                    for kind, count in entry["by_location"].items():
+                        writer.writerow([result["file"], result["sha256"], char, entry["codepoint"], kind, count, ""])
+    else:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump({"files": results}, f, ensure_ascii=False, indent=2)
 
-def analyze_directory(directory):
-    """Analyze all DOCX files in a directory."""
-    docx_files = [f for f in os.listdir(directory) if f.endswith('.docx')]
+    print(f"Report written to {report_file}")
+
+def analyze_directory(directory, jobs=None, report_file=None, cache_file=None):
+    """
+    Analyze all DOCX files in a directory.
+
+    Files are scanned in parallel on a process pool. Results are cached by
+    the SHA-256 of each docx, so unchanged files are not scanned again.
+    """
+    docx_files = sorted(f for f in os.listdir(directory) if f.endswith('.docx'))
     
     if not docx_files:
         print(f"No DOCX files found in {directory}")
         return
     
     print(f"Found {len(docx_files)} DOCX files to analyze")
-    
-    # Summary of findings
-    summary = {}
-    
+
+    cache = load_cache(cache_file)
+    hashes = {file: file_sha256(os.path.join(directory, file)) for file in docx_files}
+    to_scan = [file for file in docx_files if hashes[file] not in cache]
+
+    if to_scan:
+        print(f"Scanning {len(to_scan)} new or modified files ({len(docx_files) - len(to_scan)} cached)")
+        paths = [os.path.join(directory, file) for file in to_scan]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for file, result in zip(to_scan, executor.map(scan_docx, paths)):
+                if "error" not in result:
+                    cache[hashes[file]] = result
+
+    results = []
     for file in docx_files:
-        file_path = os.path.join(directory, file)
-        non_unicode = analyze_docx(file_path)
-        
-        if non_unicode:
-            summary[file] = len(non_unicode)
+        # Rescan files whose scan failed, they are not cached
+        result = dict(cache.get(hashes[file]) or scan_docx(os.path.join(directory, file)))
+        result["file"] = file
+        result["sha256"] = hashes[file]
+        results.append(result)
+        print_report(result)
+
+    if cache_file:
+        current = set(hashes.values())
+        save_cache(cache_file, {h: r for h, r in cache.items() if h in current})
+
+    if report_file:
+        write_report(report_file, results)
+
+    # Summary of findings
+    summary = {r["file"]: len(r["characters"]) for r in results if r.get("characters")}
     
     # Print overall summary
     print("\n=== SUMMARY ===")
@@ -108,17 +368,29 @@ def analyze_directory(directory):
     else:
         print("No non-Unicode characters found in any files.")
 
+    return results
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python detect_non_unicode.py <file.docx or directory>")
-        sys.exit(1)
-    
-    path = sys.argv[1]
+    parser = argparse.ArgumentParser(description='Detect non-Unicode characters in DOCX files.')
+    parser.add_argument('path', help='DOCX file or directory containing DOCX files')
+    parser.add_argument('--report', '-r', help='Write a machine-readable report (.json or .csv)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Number of parallel scans (default: CPU count)')
+    parser.add_argument('--cache', default=None,
+                        help='Scan cache file (default: <directory>/.non_unicode_cache.json)')
+    parser.add_argument('--no-cache', action='store_true', help='Scan every file again and do not write the cache')
+
+    args = parser.parse_args()
+    path = args.path
     
     if os.path.isdir(path):
-        analyze_directory(path)
+        cache_file = None if args.no_cache else (args.cache or os.path.join(path, '.non_unicode_cache.json'))
+        analyze_directory(path, args.jobs, args.report, cache_file)
     elif os.path.isfile(path) and path.endswith('.docx'):
-        analyze_docx(path)
+        result = scan_docx(path)
+        result["sha256"] = file_sha256(path)
+        print_report(result)
+        if args.report:
+            write_report(args.report, [result])
     else:
         print("Please provide a valid DOCX file or directory containing DOCX files.")
         sys.exit(1)
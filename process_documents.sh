@@ -7,6 +7,16 @@ show_usage() {
     echo "  -c, --clean-only    Clean old files without processing new ones"
     echo "  -s, --skip-images   Skip image conversion step"
     echo "  -v, --vector-svg    Convert vector to SVG instead"
+    echo "  -z, --zip-media     Extract referenced images straight from the docx instead of pandoc"
+    echo "  -r, --race-fallback If pandoc fails, race the two best fallback converters"
+    echo "  -n, --native        Convert supported documents without pandoc (others still use pandoc)"
+    echo "  -p, --parts         Split documents at Heading 1 and convert the parts in parallel"
+    echo "  -d, --delta         Only reconvert the sections and images changed since the previous conversion"
+    echo "  -R, --resume        Keep previous outputs and continue an interrupted batch"
+    echo "  -P, --profile       Profile every step (cProfile and tracemalloc) into output/profile"
+    echo "  -j, --jobs N        Convert N documents at the same time (default 1)"
+    echo "  -u, --urgent FILE   Convert this document before the others (repeatable)"
+    echo "  -T, --trace         Write a timeline of the batch to output/trace.json (about:tracing, Perfetto)"
     echo "  -h, --help          Show this help message"
 }
 
@@ -14,6 +24,16 @@ show_usage() {
 CLEAN_ONLY=false
 SKIP_IMAGES=false
 VECTOR_SVG=false
+ZIP_MEDIA=false
+RACE_FALLBACK=false
+NATIVE=false
+SPLIT_PARTS=false
+DELTA=false
+RESUME=false
+PROFILE=false
+JOBS=1
+TRACE=false
+URGENT=()
 while [[ $# -gt 0 ]]; do
     case $1 in
         -c|--clean-only)
@@ -28,6 +48,46 @@ while [[ $# -gt 0 ]]; do
             VECTOR_SVG=true
             shift
             ;;
+        -z|--zip-media)
+            ZIP_MEDIA=true
+            shift
+            ;;
+        -r|--race-fallback)
+            RACE_FALLBACK=true
+            shift
+            ;;
+        -n|--native)
+            NATIVE=true
+            shift
+            ;;
+        -p|--parts)
+            SPLIT_PARTS=true
+            shift
+            ;;
+        -d|--delta)
+            DELTA=true
+            shift
+            ;;
+        -R|--resume)
+            RESUME=true
+            shift
+            ;;
+        -P|--profile)
+            PROFILE=true
+            shift
+            ;;
+        -j|--jobs)
+            JOBS="$2"
+            shift 2
+            ;;
+        -u|--urgent)
+            URGENT+=(--urgent "$2")
+            shift 2
+            ;;
+        -T|--trace)
+            TRACE=true
+            shift
+            ;;
         -h|--help)
             show_usage
             exit 0
@@ -40,25 +100,29 @@ while [[ $# -gt 0 ]]; do
     esac
 done
 
-# Clean up old files
-echo "Cleaning up old files..."
+# Clean up old files (a resumed batch keeps them, the journals say what is left to do)
+if [ "$RESUME" = true ]; then
+    echo "Resuming: keeping previous outputs"
+else
+    echo "Cleaning up old files..."
 
-# Remove old output files
-if [ -d "output" ]; then
-    echo "Removing old output files..."
-    rm -rf output/*
-fi
+    # Remove old output files
+    if [ -d "output" ]; then
+        echo "Removing old output files..."
+        rm -rf output/*
+    fi
 
-# Remove old image directories
-if [ -d "images" ]; then
-    echo "Removing old image directories..."
-    rm -rf images/*
-fi
+    # Remove old image directories
+    if [ -d "images" ]; then
+        echo "Removing old image directories..."
+        rm -rf images/*
+    fi
 
-# Remove old marked source files
-if [ -d "source_marked" ]; then
-    echo "Removing old marked files..."
-    rm -rf source_marked/*.docx
+    # Remove old marked source files
+    if [ -d "source_marked" ]; then
+        echo "Removing old marked files..."
+        rm -rf source_marked/*.docx
+    fi
 fi
 
 # Create directories if they don't exist
@@ -86,85 +150,29 @@ if [ "$SKIP_IMAGES" = false ]; then
     fi
 fi
 
-# Process all .docx files in source directory
-for file in source/*.docx; do
-    if [ -f "$file" ]; then
-        filename=$(basename -- "$file")
-        name="${filename%.*}"
-        
-        # Create a sanitized version of the name (replace spaces with underscores)
-        sanitized_name=$(echo "$name" | tr ' ' '_')
-        
-        echo "=========================================="
-        echo "Processing $filename..."
-        echo "=========================================="
-        
-        # Create image directory with sanitized name
-        mkdir -p "images/$sanitized_name"
-
-        # Before the Pandoc conversion
-        echo "Step 1: Extraction and insertion of the markers inside the docx"
-        python3 scripts/extract_and_mark_inplace.py "$file" "source_marked/${sanitized_name}_marked.docx" "output/${sanitized_name}_codeblocks.json"
-
-        echo "Step 2: Initial conversion with Pandoc on the marked docx"
-        if ! pandoc -f docx -t gfm \
-          --wrap=none \
-          --extract-media="./images/$sanitized_name" \
-          --standalone \
-          "source_marked/${sanitized_name}_marked.docx" -o "output/${sanitized_name}_raw.md"; then
-            
-            echo "Pandoc conversion failed. Trying alternative methods..."
-            
-            # Call the fallback converter
-            if ! python3 scripts/convert_problematic_docx.py "$file" "output/${sanitized_name}_raw.md" "./images/$sanitized_name"; then
-                echo "ERROR: All conversion methods failed for $filename"
-                echo "Skipping to next file..."
-                continue
-            fi
-        fi
-        
-        echo "Step 3: Preserving tables as HTML"
-        python3 scripts/preserve_tables.py "output/${sanitized_name}_raw.md" "output/${sanitized_name}_tables_fixed.md"
-
-        echo "Step 4: Fixing table of contents"
-        python3 scripts/fix_toc.py "output/${sanitized_name}_tables_fixed.md" "output/${sanitized_name}_toc_fixed.md"
-
-        echo "Step 5: Fixing section numbering"
-        python3 scripts/fix_section_numbering.py "output/${sanitized_name}_toc_fixed.md" "output/${sanitized_name}_sections_fixed.md"
-
-        echo "Step 6: Fixing image paths"
-        python3 scripts/fix_image_paths.py "output/${sanitized_name}_sections_fixed.md" "output/${sanitized_name}_images_fixed.md"
-
-        # Convert problematic images (EMF, WMF, GIF) to PNG or SVG
-        if [ "$SKIP_IMAGES" = false ]; then
-            if [ "$VECTOR_SVG" = true ]; then
-                echo "Step 7: Converting problematic images to SVG"
-                python3 scripts/convert_images.py "output/${sanitized_name}_images_fixed.md" "True"
-            else
-                echo "Step 7: Converting problematic images to PNG"
-                python3 scripts/convert_images.py "output/${sanitized_name}_images_fixed.md" "False"
-            fi
-            
-            # If the conversion was successful, copy the result to final
-            if [ $? -eq 0 ]; then
-                cp "output/${sanitized_name}_images_fixed.md" "output/${sanitized_name}_final.md"
-            else
-                echo "WARNING: Image conversion failed. Using previous version as final."
-                cp "output/${sanitized_name}_images_fixed.md" "output/${sanitized_name}_final.md"
-            fi
-        else
-            # Skip image conversion, just copy the file
-            cp "output/${sanitized_name}_images_fixed.md" "output/${sanitized_name}_final.md"
-        fi
-        
-        # Putting back the code blocks inside the markdown
-        echo "Step 8: Injecting the code blocks inside the final markdown"
-        python3 scripts/inject_code_blocks.py "output/${sanitized_name}_final.md" "output/${sanitized_name}_codeblocks.json"
-
-        echo "Completed processing $filename"
-        echo "Final output: output/${sanitized_name}_final.md"
-        echo ""
-    fi
-done
+# Options passed to the per-document pipeline
+pipeline_args=()
+[ "$SKIP_IMAGES" = true ] && pipeline_args+=(--skip-images)
+[ "$VECTOR_SVG" = true ] && pipeline_args+=(--vector-svg)
+[ "$ZIP_MEDIA" = true ] && pipeline_args+=(--zip-media)
+[ "$RACE_FALLBACK" = true ] && pipeline_args+=(--race-fallback)
+[ "$NATIVE" = true ] && pipeline_args+=(--native)
+[ "$SPLIT_PARTS" = true ] && pipeline_args+=(--parts)
+[ "$DELTA" = true ] && pipeline_args+=(--delta)
+[ "$RESUME" = true ] && pipeline_args+=(--resume)
+[ "$PROFILE" = true ] && pipeline_args+=(--profile output/profile --profile-memory)
+[ "$TRACE" = true ] && pipeline_args+=(--trace output/trace.json)
+
+# Process all .docx files in source directory, --jobs at a time, longest estimated first
+# (urgent ones, and any docx copied into source/urgent/ meanwhile, go before the others)
+# (scripts/batch.py runs steps 1 to 8 of scripts/pipeline.py for each document, see convert_document)
+python3 scripts/batch.py --jobs "$JOBS" "${URGENT[@]}" "${pipeline_args[@]}" source
+echo ""
+
+# Per-step timings of this batch (every step appends to output/metrics.jsonl)
+if [ -f "output/metrics.jsonl" ]; then
+    echo "Step metrics:"
+    python3 scripts/metrics.py output/metrics.jsonl --output output/metrics_summary.txt
+fi
 
 echo "All documents processed!"
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from pipeline import convert_document, add_pipeline_arguments, pipeline_options, sanitize_name, setup_logging
+from cost_model import CostModel, document_features
+import tracing
+
+class Scheduler:
+    """
+    Order of the batch: documents with the highest estimated cost first, so that the longest
+    ones do not start last, and urgent documents before anything else. Documents copied into
+    urgent_dir while the batch runs join the urgent lane at the next free worker.
+    """
+
+    def __init__(self, files, model, urgent_files=(), urgent_dir=None):
+        self.model = model
+        self.urgent_dir = urgent_dir
+        self.seen = set()
+        self.estimates = {}
+        self.urgent = []
+        self.waiting = []
+        for file in urgent_files:
+            self.add(file, self.urgent)
+        for file in files:
+            self.add(file, self.waiting)
+        self.waiting.sort(key=lambda file: -self.estimates[file][0])
+
+    def add(self, file, lane):
+        key = os.path.abspath(file)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        features = document_features(file)
+        # Estimate, features and time the document entered the queue
+        self.estimates[file] = (self.model.estimate(features), features, tracing.now_us())
+        lane.append(file)
+
+    def next(self):
+        """Next document to start, (file, urgent), or None when nothing is left."""
+        if self.urgent_dir and os.path.isdir(self.urgent_dir):
+            for file in sorted(glob.glob(os.path.join(self.urgent_dir, "*.docx"))):
+                if os.path.abspath(file) not in self.seen:
+                    print(f"Urgent document: {os.path.basename(file)}")
+                    self.add(file, self.urgent)
+        if self.urgent:
+            return self.urgent.pop(0), True
+        if self.waiting:
+            return self.waiting.pop(0), False
+        return None
+
+    def __len__(self):
+        return len(self.urgent) + len(self.waiting)
+
+def init_worker(counter, trace_dir):
+    """Give each worker process its own number, used as its row of the trace timeline."""
+    with counter.get_lock():
+        counter.value += 1
+        worker_id = counter.value
+    tracing.configure(trace_dir, worker_id)
+
+def convert_one(file, options, queued_us, log_dir=None):
+    """
+    Convert one document in a worker, tracing the time it waited in the queue and its conversion.
+    With log_dir, the output of the pipeline goes to <log_dir>/<doc>.log instead of the terminal.
+    Returns (file, success, seconds).
+    """
+    name = sanitize_name(file)
+    tracing.emit("queued", "queue", queued_us, tracing.now_us(), document=name)
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if log_dir:
+            log = stack.enter_context(open(os.path.join(log_dir, f"{name}.log"), "w", encoding="utf-8"))
+            stack.enter_context(contextlib.redirect_stdout(log))
+        with tracing.span(name, "document", source=os.path.basename(file)):
+            try:
+                success = convert_document(file, **options) is not None
+            except Exception as e:
+                print(f"ERROR: {os.path.basename(file)} failed: {e}")
+                success = False
+    return file, success, time.perf_counter() - start
+
+def report_costs(results, scheduler, model, cost_log, learn=True):
+    """
+    Append estimated and actual time of every document to cost_log, print how far the
+    estimates were, and refit the cost model on the successful conversions
+    (unless learn is False: resumed documents only ran part of their steps).
+    """
+    with open(cost_log, "a", encoding="utf-8") as f:
+        for file, success, seconds, urgent in results:
+            estimate, features, _ = scheduler.estimates[file]
+            f.write(json.dumps(dict(features, size_mb=round(features["size_mb"], 3), document=sanitize_name(file),
+                                    urgent=urgent, success=success, estimated_s=round(estimate, 3),
+                                    actual_s=round(seconds, 3))) + "\n")
+            if success and learn:
+                model.record(features, seconds)
+    ratios = sorted(seconds / scheduler.estimates[file][0] for file, success, seconds, _ in results
+                    if success and scheduler.estimates[file][0] > 0)
+    if ratios:
+        print(f"Cost model: actual/estimated time median {ratios[len(ratios) // 2]:.2f} "
+              f"(min {ratios[0]:.2f}, max {ratios[-1]:.2f}), details in {cost_log}")
+    if learn and model.fit():
+        print("Cost model refitted: " + ", ".join(f"{k}={v}" for k, v in model.coefficients.items()))
+    model.save()
+
+def run_batch(files, options, jobs=1, trace_file=None, urgent_files=(), urgent_dir=None, cost_log="output/cost_model.jsonl"):
+    """
+    Convert the documents on jobs worker processes (in this process when jobs is 1),
+    longest estimated first, urgent documents ahead of the others.
+    With trace_file, every document, step and external tool run is written there as a
+    Chrome trace-event timeline (about:tracing, https://ui.perfetto.dev), one row per worker.
+    Returns (documents converted, documents processed).
+    """
+    trace_dir = f"{trace_file}.d" if trace_file else None
+    if trace_dir:
+        shutil.rmtree(trace_dir, ignore_errors=True)
+
+    model = CostModel()
+    scheduler = Scheduler(files, model, urgent_files, urgent_dir)
+    results = []
+    if jobs <= 1:
+        tracing.configure(trace_dir, 1)
+        while True:
+            entry = scheduler.next()
+            if entry is None:
+                break
+            file, urgent = entry
+            print("==========================================")
+            print(f"Processing {os.path.basename(file)}{' (urgent)' if urgent else ''}...")
+            print("==========================================")
+            _, success, seconds = convert_one(file, options, scheduler.estimates[file][2])
+            results.append((file, success, seconds, urgent))
+            if not success:
+                print("Skipping to next file...")
+            print("")
+    else:
+        log_dir = "output/logs"
+        os.makedirs(log_dir, exist_ok=True)
+        print(f"Converting {len(scheduler)} documents on {jobs} workers, longest first (logs in {log_dir}/)")
+        counter = multiprocessing.Value("i", 0)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(counter, trace_dir)) as executor:
+            # Only as many documents as workers are handed out, so urgent ones can still go first
+            running = {}
+            while True:
+                while len(running) < jobs:
+                    entry = scheduler.next()
+                    if entry is None:
+                        break
+                    file, urgent = entry
+                    future = executor.submit(convert_one, file, options, scheduler.estimates[file][2], log_dir)
+                    running[future] = urgent
+                if not running:
+                    break
+                finished, _ = wait(running, timeout=5, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    urgent = running.pop(future)
+                    file, success, seconds = future.result()
+                    results.append((file, success, seconds, urgent))
+                    print(f"{'Completed' if success else 'FAILED   '} {os.path.basename(file)} in {seconds:.1f}s "
+                          f"(estimated {scheduler.estimates[file][0]:.1f}s)")
+
+    if results:
+        report_costs(results, scheduler, model, cost_log, learn=not options.get("resume"))
+    if trace_dir:
+        events = tracing.merge(trace_dir, trace_file)
+        shutil.rmtree(trace_dir, ignore_errors=True)
+        print(f"Trace of {events} spans written to {trace_file} (open it in about:tracing or ui.perfetto.dev)")
+    return sum(1 for _, success, _, _ in results if success), len(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert every DOCX of a directory (run from the repository root).")
+    parser.add_argument("source", nargs="?", default="source", help="directory of the DOCX files")
+    add_pipeline_arguments(parser)
+    parser.add_argument("-R", "--resume", action="store_true",
+                        help="skip the steps already completed for this version of each document")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="documents converted at the same time")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace-event timeline of the batch to FILE")
+    parser.add_argument("-u", "--urgent", action="append", default=[], metavar="DOCX",
+                        help="convert this document before the others (repeatable)")
+    parser.add_argument("--urgent-dir", metavar="DIR",
+                        help="documents copied here during the batch are converted next (default: <source>/urgent)")
+    args = parser.parse_args()
+    setup_logging()
+
+    files = sorted(f for f in glob.glob(os.path.join(args.source, "*.docx")) if os.path.isfile(f))
+    urgent_dir = args.urgent_dir or os.path.join(args.source, "urgent")
+    options = dict(pipeline_options(args), resume=args.resume)
+    os.makedirs("output", exist_ok=True)
+    converted, total = run_batch(files, options, max(1, args.jobs), args.trace, args.urgent, urgent_dir)
+    print(f"{converted}/{total} documents converted")
+    sys.exit(0 if converted == total else 1)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+import subprocess
+
+from generate_test_corpus import generate_docx
+from pipeline import convert_document, add_pipeline_arguments, pipeline_options
+from metrics import load_metrics
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+# Size tiers: generator parameters of the documents of each tier
+TIERS = {
+    "small": {"pages": 5, "toc_depth": 2, "tables": 2, "code_blocks": 1, "emf_images": 1, "gif_images": 1, "private_use": 3},
+    "medium": {"pages": 50, "toc_depth": 2, "tables": 15, "code_blocks": 8, "emf_images": 4, "gif_images": 4, "private_use": 20},
+    "large": {"pages": 300, "toc_depth": 3, "tables": 80, "code_blocks": 40, "emf_images": 20, "gif_images": 20, "private_use": 100},
+}
+
+def corpus_for(tier, documents):
+    """Generate (once) the documents of a tier; the same seeds always give the same files."""
+    corpus_dir = os.path.join(BENCHMARK_DIR, "corpus", tier)
+    os.makedirs(corpus_dir, exist_ok=True)
+    files = []
+    for seed in range(documents):
+        docx_file = os.path.join(corpus_dir, f"{tier}_{seed}.docx")
+        if not os.path.exists(docx_file):
+            generate_docx(docx_file, seed=seed, **TIERS[tier])
+        files.append(docx_file)
+    return files
+
+def run_once(docx_file, options):
+    """Convert a document in a scratch directory, returning (end-to-end seconds, {step: seconds})."""
+    work_dir = tempfile.mkdtemp(prefix="docx2md_bench_")
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(work_dir)
+        metrics_file = os.path.join(work_dir, "metrics.jsonl")
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            final_md = convert_document(docx_file, metrics_file=metrics_file, **options)
+        total = time.perf_counter() - start
+        steps = {}
+        if os.path.exists(metrics_file):
+            for record in load_metrics(metrics_file):
+                steps[record["step"]] = steps.get(record["step"], 0.0) + record["wall_s"]
+        return (total if final_md else None), steps
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def benchmark(tiers, documents, runs, options):
+    """Median end-to-end and per-step times of every tier."""
+    results = {}
+    for tier in tiers:
+        files = corpus_for(tier, documents)
+        totals = []
+        per_step = {}
+        failures = 0
+        for run in range(runs):
+            for docx_file in files:
+                total, steps = run_once(docx_file, options)
+                if total is None:
+                    failures += 1
+                    continue
+                totals.append(total)
+                for step, seconds in steps.items():
+                    per_step.setdefault(step, []).append(seconds)
+        results[tier] = {
+            "documents": len(files),
+            "runs": runs,
+            "failures": failures,
+            "end_to_end_s": round(statistics.median(totals), 4) if totals else None,
+            "steps_s": {step: round(statistics.median(values), 4) for step, values in per_step.items()},
+        }
+        print(f"{tier}: {results[tier]['end_to_end_s']}s per document "
+              f"({len(files)} documents x {runs} runs, {failures} failures)")
+        for step, seconds in results[tier]["steps_s"].items():
+            print(f"    {step:<14}{seconds:>10.4f}s")
+    return results
+
+def version_label():
+    """Short commit id of the working tree, used to name the results."""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BENCHMARK_DIR.rsplit(os.sep, 1)[0])
+        if result.returncode == 0 and result.stdout.strip():
+            return result.stdout.strip()
+    except OSError:
+        pass
+    return time.strftime("%Y%m%d-%H%M%S")
+
+def compare(old_file, new_file):
+    """Print the change of every tier and step between two result files."""
+    with open(old_file, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_file, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{'':<24}{old['label']:>12}{new['label']:>12}{'change':>10}")
+
+    def line(label, before, after):
+        if before is None or after is None:
+            print(f"{label:<24}{str(before):>12}{str(after):>12}")
+            return
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{label:<24}{before:>12.4f}{after:>12.4f}{change:>+9.1f}%")
+
+    for tier, result in new["tiers"].items():
+        if tier not in old["tiers"]:
+            continue
+        previous = old["tiers"][tier]
+        line(f"{tier} end-to-end", previous["end_to_end_s"], result["end_to_end_s"])
+        for step, seconds in result["steps_s"].items():
+            line(f"  {step}", previous["steps_s"].get(step), seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline step on a synthetic corpus (run from the repository root).")
+    parser.add_argument("--tiers", nargs="+", default=["small", "medium"], choices=list(TIERS))
+    parser.add_argument("--documents", type=int, default=3, help="documents per tier")
+    parser.add_argument("--runs", type=int, default=3, help="runs of each document")
+    parser.add_argument("--label", help="name of the results (default: current commit)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    add_pipeline_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    label = args.label or version_label()
+    results = benchmark(args.tiers, args.documents, args.runs, pipeline_options(args))
+
+    results_dir = os.path.join(BENCHMARK_DIR, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    results_file = os.path.join(results_dir, f"{label}.json")
+    with open(results_file, "w", encoding="utf-8") as f:
+        json.dump({"label": label, "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                   "options": pipeline_options(args), "tiers": results}, f, indent=2)
+    print(f"Results saved in {results_file}")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import json
+import shutil
+import signal
+import zipfile
+import argparse
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# Imported before the workers are forked, so every worker starts with the pipeline loaded
+from pipeline import convert_document, sanitize_name
+
+MAX_UPLOAD_SIZE = 200 * 1024 * 1024  # bytes
+
+# Query parameters accepted by POST /convert (?native=1&skip_images=1...)
+BOOLEAN_OPTIONS = ("native", "split_parts", "zip_media", "race_fallback", "skip_images", "vector_svg")
+
+class ConversionTimeout(BaseException):
+    """Raised in a worker when its conversion runs out of time (not caught by the steps' error handling)."""
+
+def on_alarm(signum, frame):
+    raise ConversionTimeout()
+
+def convert_upload(filename, data, options, timeout):
+    """
+    Worker entry point: convert one uploaded DOCX in a private working directory
+    and return a zip of the final markdown and its images.
+    """
+    work_dir = tempfile.mkdtemp(prefix="docx2md_")
+    previous_dir = os.getcwd()
+    signal.signal(signal.SIGALRM, on_alarm)
+    signal.alarm(timeout)
+    try:
+        os.chdir(work_dir)
+        os.makedirs("source", exist_ok=True)
+        source_file = os.path.join("source", filename)
+        with open(source_file, 'wb') as f:
+            f.write(data)
+
+        # The pipeline prints its progress, keep it with the request instead of the server log
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            final_md = convert_document(source_file, **options)
+        if not final_md:
+            return None, log.getvalue()
+
+        name = sanitize_name(filename)
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_out:
+            zip_out.write(final_md, f"output/{name}_final.md")
+            image_dir = os.path.join("images", name)
+            for root, _, files in os.walk(image_dir):
+                for file in files:
+                    path = os.path.join(root, file)
+                    zip_out.write(path, path)
+        return archive.getvalue(), log.getvalue()
+    finally:
+        signal.alarm(0)
+        os.chdir(previous_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+class ConversionService:
+    """Warm worker pool with a bounded number of accepted requests."""
+
+    def __init__(self, workers, queue_size, timeout):
+        self.timeout = timeout
+        self.capacity = workers + queue_size
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self.active = 0
+        self.lock = threading.Lock()
+        self.workers = workers
+        self.executor = self.start_pool()
+
+    def start_pool(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+        # Start every worker now rather than on the first requests
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def restart_pool(self, broken):
+        """Replace a pool a dead worker broke, unless another request already did."""
+        with self.lock:
+            if self.executor is broken:
+                print("A worker died, restarting the worker pool")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self.executor = self.start_pool()
+
+    def submit(self, filename, data, options):
+        """
+        Run a conversion, returning (status, zip bytes or error message).
+        Requests beyond the pool and its queue are refused straight away.
+        """
+        if not self.slots.acquire(blocking=False):
+            return 503, "Too many conversions in progress, retry later"
+        with self.lock:
+            self.active += 1
+        executor = self.executor
+        try:
+            future = executor.submit(convert_upload, filename, data, options, self.timeout)
+            try:
+                # The worker stops itself at the timeout, the margin covers the time spent queued
+                archive, log = future.result(timeout=self.timeout * (1 + self.capacity // self.workers))
+            except (ConversionTimeout, TimeoutError):
+                return 504, f"Conversion took more than {self.timeout}s"
+            if archive is None:
+                return 422, f"Conversion failed\n\n{log}"
+            return 200, archive
+        except BrokenProcessPool:
+            # Only this request (and the ones sharing the dead pool) fail, later ones get fresh workers
+            self.restart_pool(executor)
+            return 503, "A conversion worker died, retry later"
+        except Exception as e:
+            return 500, f"Conversion error: {e}"
+        finally:
+            with self.lock:
+                self.active -= 1
+            self.slots.release()
+
+    def status(self):
+        with self.lock:
+            active = self.active
+        return {"workers": self.workers, "capacity": self.capacity, "in_progress": active,
+                "timeout": self.timeout}
+
+def make_handler(service, max_upload):
+    class Handler(BaseHTTPRequestHandler):
+        def send_text(self, status, message):
+            body = message.encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 503:
+                self.send_header("Retry-After", "10")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urlparse(self.path).path != "/health":
+                self.send_text(404, "Use POST /convert or GET /health")
+                return
+            body = json.dumps(service.status()).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/convert":
+                self.send_text(404, "Use POST /convert or GET /health")
+                return
+            query = parse_qs(url.query)
+
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0:
+                self.send_text(400, "Send the DOCX as the request body")
+                return
+            if length > max_upload:
+                self.send_text(413, f"Upload larger than {max_upload} bytes")
+                return
+            data = self.rfile.read(length)
+            if not data.startswith(b"PK"):
+                self.send_text(400, "The request body is not a DOCX file")
+                return
+
+            filename = os.path.basename(query.get("filename", [self.headers.get("X-Filename", "document.docx")])[0])
+            if not filename.lower().endswith(".docx"):
+                filename += ".docx"
+            options = {option: query.get(option, ["0"])[0].lower() in ("1", "true", "yes")
+                       for option in BOOLEAN_OPTIONS}
+
+            status, result = service.submit(filename, data, options)
+            if status != 200:
+                self.send_text(status, result)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/zip")
+            self.send_header("Content-Disposition",
+                             f'attachment; filename="{sanitize_name(filename)}.zip"')
+            self.send_header("Content-Length", str(len(result)))
+            self.end_headers()
+            self.wfile.write(result)
+
+    return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="HTTP service converting one DOCX per request: POST /convert returns a zip "
+                    "of the final markdown and its images.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="warm worker processes")
+    parser.add_argument("--queue", type=int, default=4, help="requests waiting for a worker before answering 503")
+    parser.add_argument("--timeout", type=int, default=600, help="seconds allowed per conversion")
+    parser.add_argument("--max-upload", type=int, default=MAX_UPLOAD_SIZE, help="largest accepted upload in bytes")
+    args = parser.parse_args()
+
+    service = ConversionService(args.workers, args.queue, args.timeout)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.max_upload))
+    print(f"Conversion service on http://{args.host}:{args.port} "
+          f"({args.workers} workers, {args.queue} queued, {args.timeout}s per document)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.executor.shutdown(cancel_futures=True)
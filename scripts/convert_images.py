@@ -7,26 +7,39 @@ import sys
 from pathlib import Path
 import shutil
 import glob
+import hashlib
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools import run_tool, record_tool, bind
+import governor
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('image_conversion.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
+def setup_logging():
+    """Log to the console and to image_conversion.log; called by the command line entry points, not on import."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('image_conversion.log')
+        ]
+    )
+
+# Number of persistent Inkscape shells used for batch SVG export
+INKSCAPE_WORKERS = 2
+# Seconds allowed per file in a batch before the shell is killed
+INKSCAPE_SECONDS_PER_FILE = 60
+
 def convert_gif_to_png(gif_path):
     """Convert a GIF image to PNG using ImageMagick."""
     png_path = gif_path.replace('.gif', '.png')
     
     try:
         cmd = ['convert', gif_path, png_path]
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        run_tool(cmd, check=True, capture_output=True, text=True)
         logger.info(f"Converted GIF to PNG: {gif_path} -> {png_path}")
         return png_path
     except subprocess.CalledProcessError as e:
@@ -48,7 +61,7 @@ def convert_vector_to_png(vector_path):
     try:
         # Step 1: Convert to PDF with unoconv
         cmd = ['unoconv', '-f', 'pdf', '-o', pdf_path, vector_path]
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        run_tool(cmd, check=True, capture_output=True, text=True)
         logger.info(f"Converted vector to PDF: {vector_path} -> {pdf_path}")
         
         # Step 2: Convert PDF to PNG with ImageMagick
@@ -61,7 +74,7 @@ def convert_vector_to_png(vector_path):
             pdf_path, 
             png_path
         ]
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        run_tool(cmd, check=True, capture_output=True, text=True)
         logger.info(f"Converted PDF to PNG: {pdf_path} -> {png_path}")
         
         # Clean up temporary PDF file
@@ -84,7 +97,7 @@ def convert_vector_to_svg(vector_path):
         # First try using Inkscape if available
         if shutil.which('inkscape'):
             cmd = ['inkscape', '--export-filename=' + svg_path, vector_path]
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            run_tool(cmd, check=True, capture_output=True, text=True)
             logger.info(f"Converted vector to SVG using Inkscape: {vector_path} -> {svg_path}")
             return svg_path
             
@@ -92,13 +105,13 @@ def convert_vector_to_svg(vector_path):
         # First convert to PDF with unoconv
         pdf_path = vector_path.replace('.emf', '.pdf').replace('.wmf', '.pdf')
         cmd = ['unoconv', '-f', 'pdf', '-o', pdf_path, vector_path]
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        run_tool(cmd, check=True, capture_output=True, text=True)
         logger.info(f"Converted vector to PDF: {vector_path} -> {pdf_path}")
         
         # Then convert PDF to SVG with pdf2svg if available
         if shutil.which('pdf2svg'):
             cmd = ['pdf2svg', pdf_path, svg_path]
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            run_tool(cmd, check=True, capture_output=True, text=True)
             logger.info(f"Converted PDF to SVG using pdf2svg: {pdf_path} -> {svg_path}")
         else:
             # If pdf2svg is not available, try rsvg-convert
@@ -106,11 +119,11 @@ def convert_vector_to_svg(vector_path):
                 # First convert PDF to PNG with high resolution
                 png_temp = pdf_path.replace('.pdf', '_temp.png')
                 cmd = ['convert', '-density', '600', pdf_path, png_temp]
-                subprocess.run(cmd, check=True, capture_output=True, text=True)
+                run_tool(cmd, check=True, capture_output=True, text=True)
                 
                 # Then convert PNG to SVG with rsvg-convert
                 cmd = ['rsvg-convert', '-f', 'svg', '-o', svg_path, png_temp]
-                subprocess.run(cmd, check=True, capture_output=True, text=True)
+                run_tool(cmd, check=True, capture_output=True, text=True)
                 logger.info(f"Converted PDF to SVG using rsvg-convert: {pdf_path} -> {svg_path}")
                 
                 # Clean up temporary PNG file
@@ -118,7 +131,7 @@ def convert_vector_to_svg(vector_path):
             else:
                 # Last resort: try direct conversion with ImageMagick
                 cmd = ['convert', pdf_path, svg_path]
-                subprocess.run(cmd, check=True, capture_output=True, text=True)
+                run_tool(cmd, check=True, capture_output=True, text=True)
                 logger.info(f"Converted PDF to SVG using ImageMagick: {pdf_path} -> {svg_path}")
         
         # Clean up temporary PDF file
@@ -141,7 +154,100 @@ def convert_vector_to_svg(vector_path):
         
         return None
 
-def process_images_in_directory(media_dir, use_svg=False):
+def inkscape_shell_export(vector_files):
+    """
+    Export several EMF/WMF files to SVG through a single `inkscape --shell` process,
+    so Inkscape only starts once for the whole batch.
+    Returns the list of files whose SVG was actually written.
+    """
+    jobs = []
+    commands = []
+    for vector_path in vector_files:
+        svg_path = vector_path.replace('.emf', '.svg').replace('.wmf', '.svg')
+        if os.path.exists(svg_path):
+            os.remove(svg_path)
+        jobs.append((vector_path, svg_path))
+        commands.append(
+            f"file-open:{os.path.abspath(vector_path)}; "
+            f"export-filename:{os.path.abspath(svg_path)}; export-do; file-close"
+        )
+    commands.append("quit")
+
+    start = time.perf_counter()
+    # The governor limits the shell's memory and kills its whole process group on timeout
+    # Its CPU limit is per file like its timeout, the whole batch runs in this one process
+    process = governor.start(
+        ['inkscape', '--shell'],
+        limits={"cpu_seconds": governor.tool_limits('inkscape')["cpu_seconds"] * len(jobs)},
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        _, stderr, timed_out = governor.communicate(process, ['inkscape', '--shell'], '\n'.join(commands) + '\n',
+                                                    timeout=INKSCAPE_SECONDS_PER_FILE * len(jobs))
+        if timed_out:
+            logger.warning(f"Inkscape shell timed out after {len(jobs)} files")
+        elif process.returncode != 0:
+            logger.warning(f"Inkscape shell exited with code {process.returncode}: {stderr.strip()}")
+    finally:
+        record_tool('inkscape', time.perf_counter() - start, files=len(jobs))
+
+    # A file only counts as converted if its own SVG exists
+    converted = []
+    for vector_path, svg_path in jobs:
+        if os.path.exists(svg_path) and os.path.getsize(svg_path) > 0:
+            logger.info(f"Converted vector to SVG using Inkscape shell: {vector_path} -> {svg_path}")
+            converted.append(vector_path)
+    return converted
+
+def convert_vectors_to_svg(vector_files):
+    """
+    Convert EMF/WMF images to SVG in batches spread over a few persistent Inkscape shells.
+    Files the shells could not convert go through convert_vector_to_svg one by one,
+    which keeps the per-file fallback to PNG.
+    Returns a dictionary mapping each vector file to its new path (or None).
+    """
+    results = {}
+    pending = list(vector_files)
+
+    # Inkscape actions are separated by ';', such paths are converted one by one
+    batchable = [f for f in pending if ';' not in f]
+    if shutil.which('inkscape') and len(batchable) > 1:
+        workers = min(INKSCAPE_WORKERS, len(batchable))
+        chunks = [batchable[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for converted in executor.map(bind(inkscape_shell_export), chunks):
+                for vector_file in converted:
+                    results[vector_file] = vector_file.replace('.emf', '.svg').replace('.wmf', '.svg')
+        pending = [f for f in pending if f not in results]
+
+    for vector_file in pending:
+        results[vector_file] = convert_vector_to_svg(vector_file)
+
+    return results
+
+def cache_key(image_path, mode):
+    """Name of the converted image in the cache: content hash of the source and target mode."""
+    sha256 = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return f"{sha256.hexdigest()}_{mode}"
+
+def restore_converted(image_path, cache_dir, mode):
+    """Copy a conversion of the same image made earlier next to it; returns its path or None."""
+    cached = glob.glob(os.path.join(cache_dir, glob.escape(cache_key(image_path, mode)) + ".*"))
+    if not cached:
+        return None
+    new_path = os.path.splitext(image_path)[0] + os.path.splitext(cached[0])[1]
+    shutil.copyfile(cached[0], new_path)
+    logger.info(f"Reused earlier conversion: {image_path} -> {new_path}")
+    return new_path
+
+def store_converted(image_path, new_path, cache_dir, mode):
+    os.makedirs(cache_dir, exist_ok=True)
+    shutil.copyfile(new_path, os.path.join(cache_dir, cache_key(image_path, mode) + os.path.splitext(new_path)[1]))
+
+def process_images_in_directory(media_dir, use_svg=False, cache_dir=None):
     """
     Process all EMF, WMF, and GIF images in the given directory.
     Returns a dictionary mapping original image paths to new PNG/SVG paths.
@@ -149,24 +255,39 @@ def process_images_in_directory(media_dir, use_svg=False):
     Args:
         media_dir: Directory containing the media files
         use_svg: If True, convert vector images to SVG instead of PNG
+        cache_dir: Optional directory of earlier conversions, by content hash of the source image
     """
     image_map = {}
     
     # Find all EMF, WMF, and GIF files
     vector_files = glob.glob(os.path.join(media_dir, "*.emf")) + glob.glob(os.path.join(media_dir, "*.wmf"))
     gif_files = glob.glob(os.path.join(media_dir, "*.gif"))
+    vector_mode = 'svg' if use_svg else 'png'
+
+    # Images converted for a previous version of the document are copied instead of converted again
+    if cache_dir:
+        for files, mode in ((vector_files, vector_mode), (gif_files, 'png')):
+            for image_file in list(files):
+                new_path = restore_converted(image_file, cache_dir, mode)
+                if new_path:
+                    image_map[os.path.basename(image_file)] = os.path.basename(new_path)
+                    files.remove(image_file)
+    converted = []
     
     # Process vector files
-    for vector_file in vector_files:
-        logger.info(f"Processing vector file: {vector_file}")
-        if use_svg:
-            new_path = convert_vector_to_svg(vector_file)
+    if use_svg:
+        logger.info(f"Processing {len(vector_files)} vector files")
+        for vector_file, new_path in convert_vectors_to_svg(vector_files).items():
             if new_path:
                 image_map[os.path.basename(vector_file)] = os.path.basename(new_path)
-        else:
+                converted.append((vector_file, new_path, vector_mode))
+    else:
+        for vector_file in vector_files:
+            logger.info(f"Processing vector file: {vector_file}")
             new_path = convert_vector_to_png(vector_file)
             if new_path:
                 image_map[os.path.basename(vector_file)] = os.path.basename(new_path)
+                converted.append((vector_file, new_path, vector_mode))
     
     # Process GIF files
     for gif_file in gif_files:
@@ -174,6 +295,11 @@ def process_images_in_directory(media_dir, use_svg=False):
         png_path = convert_gif_to_png(gif_file)
         if png_path:
             image_map[os.path.basename(gif_file)] = os.path.basename(png_path)
+            converted.append((gif_file, png_path, 'png'))
+
+    if cache_dir:
+        for image_file, new_path, mode in converted:
+            store_converted(image_file, new_path, cache_dir, mode)
     
     return image_map
 
@@ -208,7 +334,7 @@ def update_markdown_links(md_file, image_map, media_dir_rel_path):
     
     logger.info(f"Updated image links in: {md_file}")
 
-def process_markdown_file(md_file, use_svg=False):
+def process_markdown_file(md_file, use_svg=False, cache_dir=None):
     """
     Process a single Markdown file:
     1. Find the associated media directory
@@ -218,6 +344,7 @@ def process_markdown_file(md_file, use_svg=False):
     Args:
         md_file: Path to the markdown file
         use_svg: If True, convert vector images to SVG instead of PNG
+        cache_dir: Optional directory where converted images are kept and reused by content
     """
     # Determine the media directory based on your specific structure
     md_dir = os.path.dirname(md_file)
@@ -243,7 +370,7 @@ def process_markdown_file(md_file, use_svg=False):
     logger.info(f"Converting vector images to {'SVG' if use_svg else 'PNG'}")
     
     # Process images in the media directory
-    image_map = process_images_in_directory(media_dir, use_svg)
+    image_map = process_images_in_directory(media_dir, use_svg, cache_dir)
     
     if not image_map:
         logger.info(f"No problematic images found for: {md_file}")
@@ -287,6 +414,7 @@ def check_dependencies():
 
 
 if __name__ == "__main__":
+    setup_logging()
     if not check_dependencies():
         sys.exit(1)
     
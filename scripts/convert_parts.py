@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import zipfile
+import argparse
+from lxml import etree
+from concurrent.futures import ProcessPoolExecutor
+
+from split_docx import split_docx, DOCUMENT_PART, DOCUMENT_RELS
+from extract_media import R_NS, REL_NS
+from native_convert import W_NS, load_styles
+from tools import run_tool, tool_times, reset_tool_times, add_tool_times
+from governor import interventions, reset_interventions, add_interventions
+from preserve_tables import preserve_tables
+from fix_toc import fix_toc
+from fix_section_numbering import fix_section_numbering
+from fix_image_paths import fix_image_paths
+
+# Sections converted for the previous version of each document: <dir>/documents/<doc>/
+# and converted images by content: <dir>/images/ (kept across batches, output/ is cleaned)
+SECTION_CACHE_DIR = os.environ.get('SECTION_CACHE_DIR', '.section_cache')
+
+MARKER = re.compile(r'@@CODEBLOCK_(\d+)@@')
+HEADING = re.compile(r'^heading\s+\d$', re.IGNORECASE)
+# Word rewrites these on every save (revision session ids...), they do not change the markdown
+VOLATILE_PARTS = ("word/settings.xml", "word/webSettings.xml")
+
+def section_fingerprint(part_file, code_blocks):
+    """
+    Fingerprint of what a part converts from: its body, with relationship ids replaced by
+    their targets and code block markers by the code they stand for, and the CRC of every
+    other member it carries (pictures, styles, numbering...) except the volatile settings.
+    Returns (fingerprint, code block numbers in order, heading texts).
+    """
+    sha256 = hashlib.sha256()
+    with zipfile.ZipFile(part_file) as zip_ref:
+        targets = {}
+        with zip_ref.open(DOCUMENT_RELS) as rels_file:
+            for rel in etree.parse(rels_file).getroot().iter(f"{REL_NS}Relationship"):
+                targets[rel.get("Id")] = rel.get("Target")
+        with zip_ref.open(DOCUMENT_PART) as document:
+            root = etree.parse(document).getroot()
+        heading_ids = {style_id for style_id, (name, _) in load_styles(zip_ref).items() if HEADING.match(name)}
+
+        headings = []
+        for element in root.iter():
+            for attr in list(element.attrib):
+                # Revision session ids change with edits elsewhere in the document
+                if attr.startswith(f"{W_NS}rsid"):
+                    del element.attrib[attr]
+                elif attr.startswith(R_NS):
+                    element.set(attr, targets.get(element.get(attr), ""))
+            if element.tag == f"{W_NS}p":
+                style = element.find(f"{W_NS}pPr/{W_NS}pStyle")
+                if style is not None and style.get(f"{W_NS}val") in heading_ids:
+                    headings.append("".join(element.itertext()).strip())
+
+        body = etree.tostring(root, encoding="unicode")
+        markers = [int(number) for number in MARKER.findall(body)]
+        body = MARKER.sub(lambda m: hashlib.sha256(code_blocks[int(m.group(1)) - 1].encode("utf-8")).hexdigest()
+                          if int(m.group(1)) <= len(code_blocks) else m.group(0), body)
+        sha256.update(body.encode("utf-8"))
+        for info in sorted(zip_ref.infolist(), key=lambda info: info.filename):
+            if (info.filename in (DOCUMENT_PART, DOCUMENT_RELS) + VOLATILE_PARTS
+                    or info.filename.startswith("docProps/")):
+                continue
+            sha256.update(f"{info.filename}:{info.CRC}:{info.file_size}\n".encode("utf-8"))
+    return sha256.hexdigest(), markers, headings
+
+def renumber_markers(content, old_markers, new_markers):
+    """Give the code block markers of a reused section the numbers of the new version."""
+    numbers = dict(zip(old_markers, new_markers))
+    return MARKER.sub(lambda m: f"@@CODEBLOCK_{numbers.get(int(m.group(1)), int(m.group(1)))}@@", content)
+
+def load_section_state(document_cache):
+    try:
+        with open(os.path.join(document_cache, "sections.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_section_state(document_cache, headings, sections, contents):
+    """Keep the markdown of every section of this version, and drop the ones no longer used."""
+    os.makedirs(document_cache, exist_ok=True)
+    for (fingerprint, _, _), content in zip(sections, contents):
+        with open(os.path.join(document_cache, f"{fingerprint}.md"), 'w', encoding='utf-8') as f:
+            f.write(content)
+    state = {"headings": headings,
+             "sections": [{"fingerprint": fingerprint, "markers": markers} for fingerprint, markers, _ in sections]}
+    temp_file = os.path.join(document_cache, "sections.json.tmp")
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_file, os.path.join(document_cache, "sections.json"))
+    kept = {f"{fingerprint}.md" for fingerprint, _, _ in sections}
+    for name in os.listdir(document_cache):
+        if name.endswith(".md") and name not in kept:
+            os.remove(os.path.join(document_cache, name))
+
+def convert_part(part_file, doc_name, has_toc):
+    """
+    Run steps 2 to 6 of the pipeline on one part. The intermediate files are named
+    after the document so that image paths point to images/<doc_name>.
+    Returns the fixed markdown of the part (or None when pandoc failed), the
+    time the worker spent in external tools and the governor interventions.
+    """
+    reset_tool_times()
+    reset_interventions()
+    work_dir = os.path.splitext(part_file)[0]
+    os.makedirs(work_dir, exist_ok=True)
+
+    def step(name):
+        return os.path.join(work_dir, f"{doc_name}_{name}.md")
+
+    result = run_tool(
+        ["pandoc", "-f", "docx", "-t", "gfm", "--wrap=none",
+         f"--extract-media=./images/{doc_name}", "--standalone",
+         part_file, "-o", step("raw")],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Pandoc failed on {part_file}: {result.stderr.strip()}")
+        return None, tool_times(), interventions()
+
+    preserve_tables(step("raw"), step("tables_fixed"))
+    # Only the first part holds the table of contents
+    if has_toc:
+        fix_toc(step("tables_fixed"), step("toc_fixed"))
+    else:
+        shutil.copyfile(step("tables_fixed"), step("toc_fixed"))
+    fix_section_numbering(step("toc_fixed"), step("sections_fixed"))
+    fix_image_paths(step("sections_fixed"), step("images_fixed"))
+    return step("images_fixed"), tool_times(), interventions()
+
+def convert_parts(input_docx, doc_name, output_file, jobs=None, keep_parts=False, cache_dir=None, codeblocks_json=None):
+    """
+    Split a large DOCX at its Heading 1s, convert the parts concurrently and stitch
+    the results into one markdown file (the equivalent of <doc>_images_fixed.md).
+    With cache_dir, only the sections whose fingerprint changed since the previous conversion
+    of the document are converted; the others are taken from the cache with their code block
+    markers renumbered. The first part (title page and TOC) is converted again whenever a heading changed.
+    Returns False when the document cannot be split or a part fails to convert.
+    """
+    parts_dir = os.path.join(os.path.dirname(output_file) or '.', f"{doc_name}_parts")
+    part_files = split_docx(input_docx, parts_dir)
+    if not part_files:
+        print(f"{input_docx} has no Heading 1 to split at")
+        return False
+
+    contents = [None] * len(part_files)
+    if cache_dir:
+        document_cache = os.path.join(cache_dir, "documents", doc_name)
+        code_blocks = []
+        if codeblocks_json and os.path.exists(codeblocks_json):
+            with open(codeblocks_json, 'r', encoding='utf-8') as f:
+                code_blocks = json.load(f)
+        sections = [section_fingerprint(part_file, code_blocks) for part_file in part_files]
+        headings = [heading for _, _, section_headings in sections for heading in section_headings]
+        previous = load_section_state(document_cache) or {"headings": None, "sections": []}
+        cached_markers = {section["fingerprint"]: section["markers"] for section in previous["sections"]}
+        for index, (fingerprint, markers, _) in enumerate(sections):
+            cached_md = os.path.join(document_cache, f"{fingerprint}.md")
+            if index == 0 and headings != previous["headings"]:
+                continue
+            if fingerprint in cached_markers and os.path.exists(cached_md):
+                with open(cached_md, 'r', encoding='utf-8') as f:
+                    contents[index] = renumber_markers(f.read(), cached_markers[fingerprint], markers)
+        print(f"{len(part_files) - contents.count(None)} of {len(part_files)} sections unchanged since the previous conversion")
+
+    pending = [index for index, content in enumerate(contents) if content is None]
+    if pending:
+        print(f"Converting {len(pending)} parts of {input_docx} with {jobs or os.cpu_count()} workers")
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {index: executor.submit(convert_part, part_files[index], doc_name, index == 0) for index in pending}
+            for index, future in futures.items():
+                part_md, times, entries = future.result()
+                add_tool_times(times)
+                add_interventions(entries)
+                if part_md is not None:
+                    with open(part_md, 'r', encoding='utf-8') as f:
+                        contents[index] = f.read()
+
+    if any(content is None for content in contents):
+        print(f"Some parts of {input_docx} could not be converted")
+        return False
+
+    # Parts are written one after the other, in document order
+    with open(output_file, 'w', encoding='utf-8') as out:
+        out.write('\n\n'.join(content.strip('\n') for content in contents))
+        out.write('\n')
+
+    if cache_dir:
+        save_section_state(document_cache, headings, sections, contents)
+    if not keep_parts:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    print(f"Stitched {len(contents)} parts: {output_file}")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a large DOCX in parts split at its Heading 1s.")
+    parser.add_argument("input_docx", help="marked DOCX to convert")
+    parser.add_argument("doc_name", help="sanitized document name (images go to images/<doc_name>)")
+    parser.add_argument("output_file", help="stitched markdown, e.g. output/<doc_name>_images_fixed.md")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="parallel parts (default: CPU count)")
+    parser.add_argument("--keep-parts", action="store_true", help="keep the part documents and their markdown")
+    parser.add_argument("--delta", action="store_true",
+                        help=f"only convert the sections changed since the previous conversion (cache in {SECTION_CACHE_DIR})")
+    parser.add_argument("--codeblocks", help="codeblocks JSON of the marked docx (for --delta)")
+    args = parser.parse_args()
+
+    cache_dir = SECTION_CACHE_DIR if args.delta else None
+    sys.exit(0 if convert_parts(args.input_docx, args.doc_name, args.output_file, args.jobs, args.keep_parts,
+                                cache_dir, args.codeblocks) else 2)
@@ -2,39 +2,175 @@
 
 import sys
 import os
+import io
+import json
+import time
+import fcntl
+import resource
+import multiprocessing
+from multiprocessing.connection import wait
+
+import tracing
+
+# Budget given to each fallback method, overridable from the environment
+METHOD_TIMEOUT = int(os.environ.get('FALLBACK_TIMEOUT', 120))  # seconds
+METHOD_MEMORY_LIMIT = int(os.environ.get('FALLBACK_MEMORY_MB', 2048)) * 1024 * 1024  # bytes of address space
+
+# Success rates of the methods, used to try the most successful ones first. Kept at the repository
+# root: the service and the work queue convert in temporary directories
+STATS_FILE = os.environ.get('FALLBACK_STATS_FILE', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.fallback_stats.json'))
+
+def convert_problematic_docx(input_file, output_file, race=False):
+    """
+    Try multiple methods to convert a problematic DOCX file.
+
+    The file is read once and handed to each method in memory. Every method runs
+    in its own process with a time and memory budget, in the order of their
+    recorded success rates. With race=True the two best methods run concurrently
+    and the first good result is kept.
+    """
+    with open(input_file, 'rb') as f:
+        data = f.read()
+
+    methods = order_methods(METHODS, load_stats())
+    print(f"Method order: {', '.join(m.__name__ for m in methods)}")
+
+    # Outcomes of this conversion, added to the statistics on disk at the end
+    outcomes = {}
+    if race and len(methods) >= 2:
+        contenders, methods = methods[:2], methods[2:]
+        if run_methods(contenders, data, output_file, outcomes):
+            save_stats(outcomes)
+            return True
 
-def convert_problematic_docx(input_file, output_file):
-    """Try multiple methods to convert a problematic DOCX file."""
-    methods = [
-        try_mammoth,
-        try_python_docx,
-        try_docx2python,
-        try_docx2txt,
-        try_direct_extraction
-    ]
-    
     for method in methods:
-        try:
-            print(f"Trying {method.__name__}...")
-            if method(input_file, output_file):
-                return True
-        except Exception as e:
-            print(f"Method {method.__name__} failed: {e}")
-    
+        if run_methods([method], data, output_file, outcomes):
+            save_stats(outcomes)
+            return True
+
+    save_stats(outcomes)
     print("All conversion methods failed.")
     return False
 
-def try_mammoth(input_file, output_file):
+def load_stats():
+    """Load the recorded successes and failures of each method."""
+    try:
+        with open(STATS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_stats(outcomes):
+    """
+    Add the outcomes of one conversion to the statistics on disk and write them atomically.
+    Concurrent conversions (batch workers) take a lock, so that none of their updates is lost.
+    """
+    try:
+        with open(f"{STATS_FILE}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = load_stats()
+            for method, outcome in outcomes.items():
+                entry = stats.setdefault(method, {"success": 0, "failure": 0, "seconds": 0.0})
+                entry["success"] += outcome["success"]
+                entry["failure"] += outcome["failure"]
+                entry["seconds"] = round(entry["seconds"] + outcome["seconds"], 3)
+            temp_file = f"{STATS_FILE}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=2)
+            os.replace(temp_file, STATS_FILE)
+    except OSError as e:
+        print(f"Could not save method statistics: {e}")
+
+def record(stats, method, success, seconds):
+    """Record the outcome of one attempt."""
+    entry = stats.setdefault(method.__name__, {"success": 0, "failure": 0, "seconds": 0.0})
+    entry["success" if success else "failure"] += 1
+    entry["seconds"] = round(entry["seconds"] + seconds, 3)
+
+def order_methods(methods, stats):
+    """Sort methods by smoothed success rate, keeping the default order for ties."""
+    def rate(method):
+        entry = stats.get(method.__name__, {})
+        success = entry.get("success", 0)
+        attempts = success + entry.get("failure", 0)
+        return (success + 1) / (attempts + 2)
+    return sorted(methods, key=lambda m: -rate(m))
+
+def run_in_budget(method, data, output_file):
+    """Child process entry point: apply the memory limit and run one method."""
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (METHOD_MEMORY_LIMIT, METHOD_MEMORY_LIMIT))
+    except (ValueError, OSError):
+        pass
+    try:
+        with tracing.span(method.__name__, "fallback"):
+            ok = method(data, output_file)
+    except MemoryError:
+        print(f"Method {method.__name__} exceeded its memory budget")
+        ok = False
+    except Exception as e:
+        print(f"Method {method.__name__} failed: {e}")
+        ok = False
+    sys.stdout.flush()
+    os._exit(0 if ok else 1)
+
+def run_methods(methods, data, output_file, outcomes):
+    """
+    Run the given methods concurrently, each in its own process, and keep the first
+    one that succeeds within its budget. The others are stopped. Attempts are recorded in outcomes.
+    """
+    context = multiprocessing.get_context('fork')
+    running = {}
+    for method in methods:
+        print(f"Trying {method.__name__}...")
+        temp_output = f"{output_file}.{method.__name__}.tmp"
+        process = context.Process(target=run_in_budget, args=(method, data, temp_output))
+        process.start()
+        running[process.sentinel] = (process, method, temp_output, time.monotonic())
+
+    winner = None
+    deadline = time.monotonic() + METHOD_TIMEOUT
+    while running and winner is None:
+        ready = wait(list(running), timeout=max(0, deadline - time.monotonic()))
+        if not ready:
+            for process, method, temp_output, started in running.values():
+                print(f"Method {method.__name__} exceeded its {METHOD_TIMEOUT}s budget")
+                record(outcomes, method, False, time.monotonic() - started)
+            break
+        for sentinel in ready:
+            process, method, temp_output, started = running.pop(sentinel)
+            process.join()
+            success = process.exitcode == 0 and os.path.exists(temp_output)
+            record(outcomes, method, success, time.monotonic() - started)
+            if success and winner is None:
+                os.replace(temp_output, output_file)
+                winner = method
+
+    # Stop the methods still running and drop their partial outputs
+    for process, method, temp_output, started in running.values():
+        if process.is_alive():
+            process.kill()
+        process.join()
+    for method in methods:
+        temp_output = f"{output_file}.{method.__name__}.tmp"
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+
+    if winner is not None and len(methods) > 1:
+        print(f"{winner.__name__} finished first")
+    return winner is not None
+
+def try_mammoth(data, output_file):
     """Try converting with mammoth."""
     try:
         import mammoth
-        with open(input_file, "rb") as docx_file:
-            result = mammoth.convert_to_markdown(docx_file)
-            markdown = result.value
-        
+        result = mammoth.convert_to_markdown(io.BytesIO(data))
+        markdown = result.value
+
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(markdown)
-        
+
         print(f"Successfully converted using mammoth")
         return True
     except ImportError:
@@ -44,20 +180,20 @@ def try_mammoth(input_file, output_file):
         print(f"mammoth conversion error: {e}")
         return False
 
-def try_python_docx(input_file, output_file):
+def try_python_docx(data, output_file):
     """Try converting with python-docx."""
     try:
         import docx
-        doc = docx.Document(input_file)
-        
+        doc = docx.Document(io.BytesIO(data))
+
         full_text = []
         for para in doc.paragraphs:
             if para.text.strip():
                 full_text.append(para.text)
-        
+
         with open(output_file, "w", encoding="utf-8") as f:
             f.write('\n\n'.join(full_text))
-        
+
         print(f"Successfully converted using python-docx")
         return True
     except ImportError:
@@ -67,22 +203,22 @@ def try_python_docx(input_file, output_file):
         print(f"python-docx conversion error: {e}")
         return False
 
-def try_docx2python(input_file, output_file):
+def try_docx2python(data, output_file):
     """Try converting with docx2python."""
     try:
         import docx2python
-        doc = docx2python.docx2python(input_file)
-        
+        doc = docx2python.docx2python(io.BytesIO(data))
+
         markdown_content = []
         for paragraph in doc.body_runs:
             if paragraph:
                 text = ' '.join([run[1] for run in paragraph if run[1].strip()])
                 if text.strip():
                     markdown_content.append(text)
-        
+
         with open(output_file, "w", encoding="utf-8") as f:
             f.write('\n\n'.join(markdown_content))
-        
+
         print(f"Successfully converted using docx2python")
         return True
     except ImportError:
@@ -92,15 +228,15 @@ def try_docx2python(input_file, output_file):
         print(f"docx2python conversion error: {e}")
         return False
 
-def try_docx2txt(input_file, output_file):
+def try_docx2txt(data, output_file):
     """Try converting with docx2txt."""
     try:
         import docx2txt
-        text = docx2txt.process(input_file)
-        
+        text = docx2txt.process(io.BytesIO(data))
+
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(text)
-        
+
         print(f"Successfully converted using docx2txt")
         return True
     except ImportError:
@@ -110,63 +246,71 @@ def try_docx2txt(input_file, output_file):
         print(f"docx2txt conversion error: {e}")
         return False
 
-def try_direct_extraction(input_file, output_file):
-    """Try direct extraction by treating the DOCX as a ZIP file."""
+def try_direct_extraction(data, output_file):
+    """Try direct extraction by reading document.xml from the in-memory ZIP."""
     try:
         import zipfile
         import xml.etree.ElementTree as ET
-        
-        # Create a temporary directory
-        temp_dir = os.path.join(os.path.dirname(input_file), "temp_extract")
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Extract the DOCX file as a ZIP
-        with zipfile.ZipFile(input_file, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        # Parse the document.xml file
-        doc_xml = os.path.join(temp_dir, "word", "document.xml")
-        
-        if not os.path.exists(doc_xml):
-            print(f"Could not find document.xml in the extracted DOCX file")
-            return False
-        
-        # Parse the XML
-        tree = ET.parse(doc_xml)
+
+        with zipfile.ZipFile(io.BytesIO(data), 'r') as zip_ref:
+            if "word/document.xml" not in zip_ref.namelist():
+                print(f"Could not find document.xml in the DOCX file")
+                return False
+
+            # Parse the XML straight from the archive
+            with zip_ref.open("word/document.xml") as doc_xml:
+                tree = ET.parse(doc_xml)
         root = tree.getroot()
-        
+
         # Extract text content
         namespace = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
         text_content = []
-        
+
         for paragraph in root.findall(f".//{namespace}p"):
             para_text = []
             for text_elem in paragraph.findall(f".//{namespace}t"):
                 if text_elem.text:
                     para_text.append(text_elem.text)
-            
+
             if para_text:
                 text_content.append("".join(para_text))
-        
+
         # Write the extracted text to the output file
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write("\n\n".join(text_content))
-        
+
         print(f"Successfully extracted text directly")
-        
-        # Clean up
-        import shutil
-        shutil.rmtree(temp_dir)
-        
+
         return True
     except Exception as e:
         print(f"Direct extraction error: {e}")
         return False
 
+# Default order, used until statistics are recorded
+METHODS = [
+    try_mammoth,
+    try_python_docx,
+    try_docx2python,
+    try_docx2txt,
+    try_direct_extraction
+]
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python convert_problematic_docx.py input_file.docx output_file.md")
+    race = '--race' in sys.argv
+    args = [a for a in sys.argv[1:] if a != '--race']
+    if len(args) not in (2, 3):
+        print("Usage: python convert_problematic_docx.py [--race] input_file.docx output_file.md [media_root]")
+        print("  media_root: optional, extract the document's images there (like pandoc's --extract-media)")
+        print("  --race: run the two most successful methods concurrently and keep the first result")
         sys.exit(1)
-    
-    success = convert_problematic_docx(sys.argv[1], sys.argv[2])
+
+    success = convert_problematic_docx(args[0], args[1], race)
+
+    if success and len(args) == 3:
+        from extract_media import extract_media
+        try:
+            extract_media(args[0], args[2])
+        except Exception as e:
+            print(f"Media extraction error: {e}")
+
     sys.exit(0 if success else 1)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import zipfile
+
+# Coefficients and past measurements, kept across batches (output/ is cleaned by every run)
+MODEL_FILE = os.environ.get('COST_MODEL_FILE', '.cost_model.json')
+MAX_SAMPLES = 1000
+# Measurements needed before the coefficients are fitted instead of the defaults
+MIN_SAMPLES = 8
+
+FEATURES = ("size_mb", "media", "vectors")
+# Seconds: fixed cost, per MB of docx, per picture and per EMF/WMF picture (LibreOffice / Inkscape)
+DEFAULT_COEFFICIENTS = {"base": 2.0, "size_mb": 1.0, "media": 0.2, "vectors": 3.0}
+
+def document_features(docx_file):
+    """Cost features read from the zip directory only (nothing is decompressed)."""
+    features = {"size_mb": os.path.getsize(docx_file) / 1024 / 1024, "media": 0, "vectors": 0}
+    try:
+        with zipfile.ZipFile(docx_file) as zip_ref:
+            for name in zip_ref.namelist():
+                if name.startswith('word/media/'):
+                    features["media"] += 1
+                    if name.lower().endswith(('.emf', '.wmf')):
+                        features["vectors"] += 1
+    except (zipfile.BadZipFile, OSError):
+        pass
+    return features
+
+def solve(matrix, vector):
+    """Gaussian elimination with partial pivoting; None for a singular system."""
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(size):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[col])]
+    return [rows[i][size] / rows[i][i] for i in range(size)]
+
+class CostModel:
+    """Linear estimate of a document's conversion time, refitted on the measured times of past batches."""
+
+    def __init__(self, model_file=MODEL_FILE):
+        self.model_file = model_file
+        self.coefficients = dict(DEFAULT_COEFFICIENTS)
+        self.samples = []
+        try:
+            with open(model_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.coefficients.update(state.get("coefficients", {}))
+            self.samples = state.get("samples", [])
+        except (OSError, ValueError):
+            pass
+
+    def estimate(self, features):
+        return self.coefficients["base"] + sum(self.coefficients[f] * features[f] for f in FEATURES)
+
+    def record(self, features, seconds):
+        self.samples.append(dict(features, seconds=round(seconds, 3)))
+        self.samples = self.samples[-MAX_SAMPLES:]
+
+    def fit(self):
+        """
+        Least-squares fit of the coefficients on the recorded samples (with a little ridge
+        so that a feature absent from the corpus keeps a coefficient near 0). Returns True when refitted.
+        """
+        if len(self.samples) < MIN_SAMPLES:
+            return False
+        rows = [[1.0] + [sample[f] for f in FEATURES] for sample in self.samples]
+        size = len(FEATURES) + 1
+        normal = [[sum(row[i] * row[j] for row in rows) + (1e-3 if i == j else 0.0) for j in range(size)]
+                  for i in range(size)]
+        target = [sum(row[i] * sample["seconds"] for row, sample in zip(rows, self.samples)) for i in range(size)]
+        solution = solve(normal, target)
+        if solution is None:
+            return False
+        # A negative cost per picture only fits noise
+        self.coefficients = {name: round(max(0.0, value), 4)
+                             for name, value in zip(("base",) + FEATURES, solution)}
+        return True
+
+    def save(self):
+        try:
+            temp_file = f"{self.model_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"coefficients": self.coefficients, "samples": self.samples}, f, indent=2)
+            os.replace(temp_file, self.model_file)
+        except OSError as e:
+            print(f"Could not save the cost model: {e}")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import mmap
+import shutil
+import struct
+import zipfile
+import zlib
+import posixpath
+import xml.etree.ElementTree as ET
+
+# Relationship types that point to pictures pandoc would extract
+IMAGE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+# Parts whose pictures end up in the pandoc output (headers and footers are dropped by pandoc)
+CONTENT_PARTS = [
+    "word/document.xml",
+    "word/footnotes.xml",
+    "word/endnotes.xml",
+]
+
+# Size of the fixed part of a zip local file header
+LOCAL_HEADER_SIZE = 30
+
+def rels_path_for(part_name):
+    """Return the relationships part of a package part (word/x.xml -> word/_rels/x.xml.rels)."""
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+def read_image_relationships(zip_ref, part_name):
+    """Map relationship ids to internal image targets for one part."""
+    rels_name = rels_path_for(part_name)
+    if rels_name not in zip_ref.NameToInfo:
+        return {}
+
+    images = {}
+    with zip_ref.open(rels_name) as rels_file:
+        for _, elem in ET.iterparse(rels_file):
+            if elem.tag != f"{REL_NS}Relationship":
+                continue
+            # OLE payloads, charts and external links are never published
+            if elem.get("Type") != IMAGE_REL_TYPE or elem.get("TargetMode") == "External":
+                continue
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(part_name), elem.get("Target", "")))
+            images[elem.get("Id")] = target.lstrip("/")
+    return images
+
+def referenced_relationship_ids(zip_ref, part_name):
+    """Collect the relationship ids actually used by drawings in a part."""
+    used = set()
+    with zip_ref.open(part_name) as part_file:
+        for _, elem in ET.iterparse(part_file):
+            for attr in (f"{R_NS}embed", f"{R_NS}id", f"{R_NS}link"):
+                value = elem.get(attr)
+                if value:
+                    used.add(value)
+            elem.clear()
+    return used
+
+def find_referenced_images(zip_ref):
+    """Return the package names of every image referenced by the content parts."""
+    members = []
+    for part_name in CONTENT_PARTS:
+        if part_name not in zip_ref.NameToInfo:
+            continue
+        images = read_image_relationships(zip_ref, part_name)
+        if not images:
+            continue
+        used = referenced_relationship_ids(zip_ref, part_name)
+        for rel_id, target in images.items():
+            if rel_id in used and target in zip_ref.NameToInfo and target not in members:
+                members.append(target)
+    return members
+
+def stored_data_offset(mapped, info):
+    """Return the offset of a stored member's data inside the archive."""
+    header = mapped[info.header_offset:info.header_offset + LOCAL_HEADER_SIZE]
+    signature, name_len, extra_len = struct.unpack("<4s22xHH", header)
+    if signature != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    return info.header_offset + LOCAL_HEADER_SIZE + name_len + extra_len
+
+def write_member(zip_ref, info, mapped, dest_file):
+    """Write one member to disk, straight from the mapped archive when it is stored."""
+    temp_file = dest_file + ".part"
+    with open(temp_file, "wb") as out:
+        if mapped is not None and info.compress_type == zipfile.ZIP_STORED:
+            start = stored_data_offset(mapped, info)
+            view = memoryview(mapped)[start:start + info.file_size]
+            try:
+                if zlib.crc32(view) & 0xffffffff != info.CRC:
+                    raise zipfile.BadZipFile(f"Bad CRC-32 for {info.filename}")
+                out.write(view)
+            finally:
+                view.release()
+        else:
+            with zip_ref.open(info) as src:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+    os.replace(temp_file, dest_file)
+
+def extract_media(docx_file, media_root):
+    """
+    Extract the pictures referenced by a DOCX into <media_root>/media.
+
+    Only image relationships of the body, footnotes and endnotes are followed,
+    so embedded OLE binaries and unreferenced parts are never decompressed.
+    Files keep their package names, exactly like pandoc's --extract-media.
+    """
+    media_dir = os.path.join(media_root, "media")
+    extracted = []
+
+    with open(docx_file, "rb") as raw, zipfile.ZipFile(raw) as zip_ref:
+        members = find_referenced_images(zip_ref)
+        skipped = [n for n in zip_ref.namelist()
+                   if n.startswith("word/embeddings/") or n.endswith(".bin")]
+
+        if not members:
+            print(f"No referenced images found in {docx_file}")
+            return extracted
+
+        os.makedirs(media_dir, exist_ok=True)
+
+        mapped = None
+        if any(zip_ref.getinfo(m).compress_type == zipfile.ZIP_STORED for m in members):
+            mapped = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            for member in members:
+                info = zip_ref.getinfo(member)
+                # pandoc drops the leading "word/" and keeps the rest of the path
+                relative = member[5:] if member.startswith("word/") else member
+                dest_file = os.path.join(media_root, *relative.split("/"))
+                os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+                write_member(zip_ref, info, mapped, dest_file)
+                extracted.append(dest_file)
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+    print(f"Extracted {len(extracted)} images to {media_dir} (skipped {len(skipped)} embedded objects)")
+    return extracted
+
+def rewrite_media_links(md_file, media_root):
+    """
+    Prefix the bare media/ links pandoc writes without --extract-media,
+    so the markdown is identical to a run with --extract-media=<media_root>.
+    """
+    with open(md_file, 'r', encoding='utf-8') as file:
+        content = file.read()
+
+    prefix = media_root.rstrip("/") + "/media/"
+    content = re.sub(r'(!\[[^\]]*\]\()media/', lambda m: m.group(1) + prefix, content)
+    content = re.sub(r'(<img src=")media/', lambda m: m.group(1) + prefix, content)
+
+    with open(md_file, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+    print(f"Media links rewritten: {md_file}")
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python extract_media.py <input.docx> <media_root> [markdown_file]")
+        print("  media_root: same value as pandoc's --extract-media (e.g. ./images/<doc>)")
+        print("  markdown_file: optional pandoc output whose media/ links should be rewritten")
+        sys.exit(1)
+
+    try:
+        extract_media(sys.argv[1], sys.argv[2])
+    except (zipfile.BadZipFile, ET.ParseError, OSError) as e:
+        print(f"Media extraction error: {e}")
+        sys.exit(1)
+
+    if len(sys.argv) == 4:
+        rewrite_media_links(sys.argv[3], sys.argv[2])
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import random
+import struct
+import zipfile
+import argparse
+from docx import Document
+from docx.shared import Pt, Inches
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+# Smallest valid GIF (1x1 pixel), python-docx embeds it as is
+GIF_1X1 = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00'
+           b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+# Offset of the first palette color, changed per picture (python-docx stores identical pictures once)
+GIF_COLOR_OFFSET = 13
+
+WORDS = ("network switch interface vlan routing address server client configuration port "
+         "firewall gateway subnet protocol migration backup cluster storage policy access "
+         "redundancy monitoring latency throughput certificate domain tunnel peer route").split()
+
+# Private-use characters Word documents carry through Symbol / Wingdings fonts
+PRIVATE_USE_CHARS = ['\uf0b7', '\uf0a7', '\uf0fc', '\uf0d8', '\uf06c', '\uf0e0']
+
+PARAGRAPHS_PER_PAGE = 5
+
+def minimal_emf():
+    """An EMF made of a header and an end-of-file record, enough for converters to open it."""
+    records = 2
+    header_size = 88
+    eof = struct.pack('<IIIII', 14, 20, 0, 16, 20)
+    total = header_size + len(eof)
+    header = struct.pack(
+        '<II4i4iIIIIHHIII2i2i',
+        1, header_size,
+        0, 0, 99, 99,              # bounds (device units)
+        0, 0, 2540, 2540,          # frame (0.01 mm)
+        0x464D4520, 0x10000,       # " EMF" signature, version
+        total, records, 1, 0,      # bytes, records, handles, reserved
+        0, 0, 0,                   # description, palette
+        1024, 768, 320, 240,       # reference device in pixels and millimeters
+    )
+    return header + eof
+
+def sentence(rng, words=12):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+def add_toc(doc, entries):
+    """Add a Word TOC field whose cached result lists the given (number, title, page) entries."""
+    doc.add_paragraph('Table of Contents')
+    for index, (number, title, page) in enumerate(entries):
+        paragraph = doc.add_paragraph()
+        run = paragraph.add_run()
+        if index == 0:
+            begin = OxmlElement('w:fldChar')
+            begin.set(qn('w:fldCharType'), 'begin')
+            instr = OxmlElement('w:instrText')
+            instr.set(qn('xml:space'), 'preserve')
+            instr.text = ' TOC \\o "1-3" \\h \\z \\u '
+            separate = OxmlElement('w:fldChar')
+            separate.set(qn('w:fldCharType'), 'separate')
+            run._r.append(begin)
+            paragraph.add_run()._r.append(instr)
+            paragraph.add_run()._r.append(separate)
+        paragraph.add_run(f"{number} {title}\t{page}")
+        if index == len(entries) - 1:
+            end = OxmlElement('w:fldChar')
+            end.set(qn('w:fldCharType'), 'end')
+            paragraph.add_run()._r.append(end)
+
+def add_table(doc, rng, rows, cols, merged):
+    table = doc.add_table(rows=rows, cols=cols)
+    table.style = 'Table Grid'
+    for c in range(cols):
+        table.cell(0, c).text = rng.choice(WORDS).capitalize()
+    for r in range(1, rows):
+        for c in range(cols):
+            table.cell(r, c).text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    if merged and rows > 2 and cols > 2:
+        # One horizontal and one vertical merge
+        table.cell(1, 0).merge(table.cell(1, 1))
+        table.cell(2, cols - 1).merge(table.cell(rows - 1, cols - 1))
+    return table
+
+def add_code_block(doc, rng, lines):
+    for i in range(lines):
+        paragraph = doc.add_paragraph()
+        run = paragraph.add_run(f"set interfaces ge-0/0/{i} unit 0 family inet address 10.{rng.randint(0, 255)}.{i}.1/24")
+        run.font.name = 'Courier New'
+        run.font.size = Pt(9)
+
+def generate_docx(output_file, pages=10, toc_depth=2, tables=3, merged_cells=True, code_blocks=2,
+                  emf_images=1, gif_images=1, private_use=5, seed=0):
+    """
+    Build a reproducible synthetic DOCX: same parameters and seed give the same document.
+    Returns the number of headings written.
+    """
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_paragraph('Synthetic test document', style='Title')
+
+    # Section layout first, so the TOC can list it
+    chapters = max(1, pages // 5)
+    paragraphs = max(1, pages * PARAGRAPHS_PER_PAGE)
+    outline = []
+    for chapter in range(1, chapters + 1):
+        outline.append((1, f"{chapter}", ' '.join(rng.choice(WORDS) for _ in range(2)).title()))
+        if toc_depth >= 2:
+            for section in range(1, 3):
+                outline.append((2, f"{chapter}.{section}", ' '.join(rng.choice(WORDS) for _ in range(3)).title()))
+                if toc_depth >= 3:
+                    outline.append((3, f"{chapter}.{section}.1", ' '.join(rng.choice(WORDS) for _ in range(3)).title()))
+
+    if toc_depth > 0:
+        add_toc(doc, [(number, title, 2 + i * pages // len(outline)) for i, (_, number, title) in enumerate(outline)])
+
+    # Spread paragraphs, tables, code blocks and pictures evenly over the sections
+    per_section = max(1, paragraphs // len(outline))
+    table_at = set(rng.sample(range(len(outline)), min(tables, len(outline))))
+    code_at = set(rng.sample(range(len(outline)), min(code_blocks, len(outline))))
+    picture_at = set(rng.sample(range(len(outline)), min(emf_images + gif_images, len(outline))))
+    pictures = 0
+    pua_left = private_use
+
+    for index, (level, number, title) in enumerate(outline):
+        doc.add_heading(f"{number} {title}", level)
+        for _ in range(per_section):
+            paragraph = doc.add_paragraph(sentence(rng, rng.randint(20, 60)))
+            if pua_left > 0 and rng.random() < 0.3:
+                run = paragraph.add_run(' ' + rng.choice(PRIVATE_USE_CHARS))
+                run.font.name = 'Symbol'
+                pua_left -= 1
+        if index in table_at:
+            add_table(doc, rng, rng.randint(3, 8), rng.randint(3, 5), merged_cells)
+        if index in code_at:
+            add_code_block(doc, rng, rng.randint(3, 10))
+        if index in picture_at:
+            gif = bytearray(GIF_1X1)
+            gif[GIF_COLOR_OFFSET:GIF_COLOR_OFFSET + 3] = pictures.to_bytes(3, 'big')
+            doc.add_picture(io.BytesIO(bytes(gif)), width=Inches(1))
+            pictures += 1
+    while pua_left > 0:
+        run = doc.add_paragraph().add_run(rng.choice(PRIVATE_USE_CHARS))
+        run.font.name = 'Wingdings'
+        pua_left -= 1
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    write_reproducible(buffer.getvalue(), output_file, emf_images)
+    return len(outline)
+
+def write_reproducible(data, output_file, emf_images):
+    """
+    Rewrite the package with fixed timestamps (byte-identical output for the same seed)
+    and turn the first emf_images pictures into EMF files, which python-docx cannot insert itself.
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as source:
+        names = source.namelist()
+        pictures = sorted(n for n in names if n.startswith('word/media/'))
+        renamed = {}
+        for name in pictures[:emf_images]:
+            renamed[name] = os.path.splitext(name)[0] + '.emf'
+
+        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as target:
+            for name in names:
+                content = source.read(name)
+                if name in renamed:
+                    name, content = renamed[name], minimal_emf()
+                elif name == 'word/_rels/document.xml.rels':
+                    for old, new in renamed.items():
+                        content = content.replace(old[len('word/'):].encode(), new[len('word/'):].encode())
+                elif name == '[Content_Types].xml' and renamed and b'Extension="emf"' not in content:
+                    content = content.replace(
+                        b'</Types>', b'<Default Extension="emf" ContentType="image/x-emf"/></Types>')
+                info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                target.writestr(info, content)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate reproducible synthetic DOCX files for tests and benchmarks.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--count", type=int, default=1, help="number of documents (seeds seed..seed+count-1)")
+    parser.add_argument("--pages", type=int, default=10, help="approximate number of pages")
+    parser.add_argument("--toc-depth", type=int, default=2, choices=[0, 1, 2, 3], help="0 for no TOC")
+    parser.add_argument("--tables", type=int, default=3)
+    parser.add_argument("--no-merged-cells", action="store_true", help="tables without merged cells")
+    parser.add_argument("--code-blocks", type=int, default=2, help="blocks of code-styled paragraphs")
+    parser.add_argument("--emf", type=int, default=1, help="EMF pictures")
+    parser.add_argument("--gif", type=int, default=1, help="GIF pictures")
+    parser.add_argument("--private-use", type=int, default=5, help="private-use (symbol font) characters")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default="synthetic", help="file name prefix")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for seed in range(args.seed, args.seed + args.count):
+        output_file = os.path.join(args.output_dir, f"{args.prefix}_{args.pages}p_{seed}.docx")
+        headings = generate_docx(output_file, args.pages, args.toc_depth, args.tables, not args.no_merged_cells,
+                                 args.code_blocks, args.emf, args.gif, args.private_use, seed)
+        print(f"Generated {output_file} ({headings} headings)")
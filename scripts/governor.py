@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import signal
+import zipfile
+import resource
+import threading
+import subprocess
+
+# Limits of each external tool. Every value can be overridden from the environment with
+# <TOOL>_TIMEOUT (seconds), <TOOL>_MEMORY_MB and <TOOL>_CPU_SECONDS, e.g. UNOCONV_TIMEOUT=300.
+DEFAULT_LIMITS = {"timeout": 300, "memory_mb": 2048, "cpu_seconds": 300}
+TOOL_LIMITS = {
+    "pandoc": {"timeout": 900, "memory_mb": 4096, "cpu_seconds": 900},
+    "unoconv": {"timeout": 180, "memory_mb": 4096, "cpu_seconds": 180},
+    "convert": {"timeout": 120, "memory_mb": 2048, "cpu_seconds": 120},
+    "inkscape": {"timeout": 120, "memory_mb": 2048, "cpu_seconds": 120},
+}
+# The Haskell runtime reserves a huge address space up front: pandoc's memory is capped with its own RTS option
+RTS_MEMORY_TOOLS = ("pandoc",)
+
+# Admission limits of an input docx, checked from its zip directory before any work
+MAX_UNCOMPRESSED_MB = int(os.environ.get('DOCX_MAX_UNCOMPRESSED_MB', 2048))
+MAX_COMPRESSION_RATIO = int(os.environ.get('DOCX_MAX_RATIO', 100))
+MAX_MEMBERS = int(os.environ.get('DOCX_MAX_MEMBERS', 20000))
+# Small members (tiny XML parts) compress very well without being a threat
+RATIO_MIN_SIZE = 1024 * 1024
+
+# Messages of tools that ran out of memory
+OUT_OF_MEMORY = ("cannot allocate memory", "out of memory", "bad_alloc", "heap exhausted", "memory allocation failed")
+
+_interventions = []
+_lock = threading.Lock()
+# Tools started and not yet waited for, so that an interrupted conversion can kill them from any thread
+_running = set()
+_stopped = False
+
+def tool_limits(tool):
+    limits = dict(DEFAULT_LIMITS, **TOOL_LIMITS.get(tool, {}))
+    prefix = tool.upper().replace('-', '_')
+    for key, suffix in (("timeout", "TIMEOUT"), ("memory_mb", "MEMORY_MB"), ("cpu_seconds", "CPU_SECONDS")):
+        value = os.environ.get(f"{prefix}_{suffix}")
+        if value:
+            limits[key] = int(value)
+    return limits
+
+def intervene(kind, subject, detail):
+    """Record (and print) something the governor stopped or refused."""
+    entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "kind": kind, "subject": subject, "detail": detail}
+    with _lock:
+        _interventions.append(entry)
+    print(f"GOVERNOR: {kind} {subject}: {detail}")
+
+def interventions():
+    with _lock:
+        return list(_interventions)
+
+def reset_interventions():
+    with _lock:
+        _interventions.clear()
+
+def add_interventions(entries):
+    """Merge the interventions of another process (parts converted in a pool)."""
+    with _lock:
+        _interventions.extend(entries)
+
+def write_report(report_file, document):
+    """Write the interventions of one document as JSON (nothing is written when there were none)."""
+    entries = interventions()
+    if not entries:
+        return 0
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump({"document": document, "interventions": entries}, f, indent=2)
+    print(f"{len(entries)} governor interventions for {document}, see {report_file}")
+    return len(entries)
+
+def admit_docx(docx_file):
+    """
+    Check a docx from its zip directory only: number of members, total uncompressed size and
+    compression ratio of the large members. Returns None when it is admitted, or the reason.
+    Python's zip reader never returns more than the declared size of a member, so these figures hold.
+    """
+    try:
+        with zipfile.ZipFile(docx_file) as zip_ref:
+            infos = zip_ref.infolist()
+    except (zipfile.BadZipFile, OSError) as e:
+        return f"not a readable zip ({e})"
+    if len(infos) > MAX_MEMBERS:
+        return f"{len(infos)} zip members (limit {MAX_MEMBERS})"
+    total = sum(info.file_size for info in infos)
+    if total > MAX_UNCOMPRESSED_MB * 1024 * 1024:
+        return f"{total / 1024 / 1024:.0f} MB uncompressed (limit {MAX_UNCOMPRESSED_MB} MB)"
+    for info in infos:
+        if info.file_size >= RATIO_MIN_SIZE and info.file_size > MAX_COMPRESSION_RATIO * max(info.compress_size, 1):
+            return (f"{info.filename} expands {info.file_size // max(info.compress_size, 1)}x "
+                    f"(limit {MAX_COMPRESSION_RATIO}x)")
+    return None
+
+def governed_command(cmd, limits):
+    """Command line with the tool's own memory option, for tools that cannot run under an address space limit."""
+    tool = os.path.basename(cmd[0])
+    if tool in RTS_MEMORY_TOOLS and limits["memory_mb"]:
+        return [cmd[0], "+RTS", f"-M{limits['memory_mb']}m", "-RTS"] + list(cmd[1:])
+    return list(cmd)
+
+def apply_limits(pid, tool, limits):
+    """Cap the address space and CPU time of a started tool (Linux prlimit)."""
+    if not hasattr(resource, "prlimit"):
+        return
+    try:
+        if limits["memory_mb"] and tool not in RTS_MEMORY_TOOLS:
+            memory = limits["memory_mb"] * 1024 * 1024
+            resource.prlimit(pid, resource.RLIMIT_AS, (memory, memory))
+        if limits["cpu_seconds"]:
+            # SIGXCPU at the soft limit, SIGKILL a few seconds later
+            resource.prlimit(pid, resource.RLIMIT_CPU, (limits["cpu_seconds"], limits["cpu_seconds"] + 5))
+    except (ProcessLookupError, PermissionError, ValueError):
+        # Already finished, or limits above what this process may grant
+        pass
+
+def start(cmd, limits=None, **kwargs):
+    """
+    Popen for an external tool: its own process group, with the tool's limits applied
+    (limits overrides some of them, e.g. a CPU limit scaled to a batch of files).
+    Refused once kill_running stopped the conversion.
+    """
+    tool = os.path.basename(cmd[0])
+    limits = dict(tool_limits(tool), **(limits or {}))
+    with _lock:
+        if _stopped:
+            raise RuntimeError(f"conversion interrupted, {tool} not started")
+        process = subprocess.Popen(governed_command(cmd, limits), start_new_session=True, **kwargs)
+        _running.add(process)
+    apply_limits(process.pid, tool, limits)
+    process.governor_limits = limits
+    return process
+
+def kill_running():
+    """
+    Kill every tool still running and refuse to start new ones, for a conversion interrupted
+    while some of its steps run in other threads. allow_tools() lifts the refusal.
+    """
+    global _stopped
+    with _lock:
+        _stopped = True
+        processes = list(_running)
+    for process in processes:
+        kill_group(process)
+    if processes:
+        intervene("interrupted", "conversion", f"killed {len(processes)} running tools")
+    return len(processes)
+
+def allow_tools():
+    global _stopped
+    with _lock:
+        _stopped = False
+
+def kill_group(process):
+    """Kill a tool and everything it started (LibreOffice behind unoconv...)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def communicate(process, cmd, input=None, timeout=None):
+    """
+    Wait for a started tool within its wall-clock limit (or timeout). Returns (stdout, stderr, timed_out).
+    A timed out tool is killed with its whole process group and the intervention recorded.
+    """
+    tool = os.path.basename(cmd[0])
+    limit = timeout or process.governor_limits["timeout"]
+    try:
+        return _communicate(process, cmd, tool, limit, input)
+    finally:
+        with _lock:
+            _running.discard(process)
+
+def _communicate(process, cmd, tool, limit, input):
+    try:
+        stdout, stderr = process.communicate(input, timeout=limit)
+        timed_out = False
+    except subprocess.TimeoutExpired:
+        kill_group(process)
+        stdout, stderr = process.communicate()
+        intervene("timeout", tool, f"killed after {limit}s: {' '.join(map(str, cmd))[:300]}")
+        timed_out = True
+    except BaseException:
+        # Interrupted (service timeout, Ctrl-C): the tool must not outlive its caller
+        kill_group(process)
+        process.wait()
+        raise
+    else:
+        # Children left behind by the tool go with it
+        kill_group(process)
+        if _stopped:
+            # Killed by kill_running, already recorded
+            pass
+        elif process.returncode == -signal.SIGXCPU:
+            intervene("cpu_limit", tool, f"stopped after {process.governor_limits['cpu_seconds']}s of CPU: "
+                                         f"{' '.join(map(str, cmd))[:300]}")
+        elif process.returncode == -signal.SIGKILL:
+            intervene("killed", tool, f"killed at its CPU hard limit or by the kernel OOM killer: "
+                                      f"{' '.join(map(str, cmd))[:300]}")
+        elif process.returncode and stderr:
+            message = stderr if isinstance(stderr, str) else stderr.decode('utf-8', 'replace')
+            if any(marker in message.lower() for marker in OUT_OF_MEMORY):
+                intervene("memory_limit", tool, f"ran out of its {process.governor_limits['memory_mb']} MB: "
+                                                f"{' '.join(map(str, cmd))[:300]}")
+    return stdout, stderr, timed_out
+
+def run(cmd, check=False, capture_output=False, input=None, timeout=None, **kwargs):
+    """subprocess.run under the governor; a timed out tool fails like a tool returning an error."""
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+    process = start(cmd, **kwargs)
+    stdout, stderr, timed_out = communicate(process, cmd, input, timeout)
+    returncode = -signal.SIGKILL if timed_out else process.returncode
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import math
+import time
+import resource
+import argparse
+from contextlib import contextmanager
+
+from tools import tool_times
+from governor import interventions
+
+def reset_peak_rss():
+    """Reset the peak resident set size of this process (Linux), so each step gets its own peak."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB (since the last reset when supported)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def total_size(paths):
+    """Bytes of the given files and directories (missing ones count as 0)."""
+    size = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        elif os.path.exists(path):
+            size += os.path.getsize(path)
+    return size
+
+class StepMetrics:
+    """
+    Record wall time, CPU time, memory, I/O bytes, external tool time and governor
+    interventions of each step as JSON lines. Tool time is the one of the thread running the step,
+    so it stays exact when steps run concurrently; CPU time is the one of the process.
+    The memory peak of a step is only known when steps run one at a time (exclusive):
+    otherwise the peak of the whole process so far is recorded as process_peak_rss_kb.
+    """
+
+    def __init__(self, metrics_file, document, exclusive=False):
+        self.metrics_file = metrics_file
+        self.document = document
+        self.exclusive = exclusive
+
+    @contextmanager
+    def step(self, name, inputs=(), outputs=()):
+        """Measure the enclosed block; it can set state["status"] to report a failure without raising."""
+        state = {}
+        input_bytes = total_size(inputs)
+        tools_before = tool_times()
+        interventions_before = len(interventions())
+        self_before = resource.getrusage(resource.RUSAGE_SELF)
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        if self.exclusive:
+            # Resets the peak of the whole process, so only when no other step is running
+            reset_peak_rss()
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            yield state
+            status = state.get("status", "ok")
+        finally:
+            wall = time.perf_counter() - start
+            self_after = resource.getrusage(resource.RUSAGE_SELF)
+            children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            tools = {tool: round(seconds - tools_before.get(tool, 0.0), 3)
+                     for tool, seconds in tool_times().items()
+                     if seconds - tools_before.get(tool, 0.0) > 0}
+            record = {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "document": self.document,
+                "step": name,
+                "status": status,
+                "wall_s": round(wall, 3),
+                "cpu_s": round(max(0.0, self_after.ru_utime + self_after.ru_stime
+                                   - self_before.ru_utime - self_before.ru_stime), 3),
+                "child_cpu_s": round(max(0.0, children_after.ru_utime + children_after.ru_stime
+                                         - children_before.ru_utime - children_before.ru_stime), 3),
+                "input_bytes": input_bytes,
+                "output_bytes": total_size(outputs),
+                "tool_s": tools,
+                "governor": [entry["kind"] + " " + entry["subject"] for entry in interventions()[interventions_before:]],
+            }
+            if self.exclusive:
+                record["peak_rss_kb"] = peak_rss_kb()
+                # Only known when a child process of this step set a new peak
+                record["child_peak_rss_kb"] = (children_after.ru_maxrss
+                                               if children_after.ru_maxrss > children_before.ru_maxrss else None)
+            else:
+                record["process_peak_rss_kb"] = max(peak_rss_kb(), children_after.ru_maxrss)
+            if self.metrics_file:
+                with open(self.metrics_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+def load_metrics(metrics_file):
+    records = []
+    with open(metrics_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Last line of an interrupted run
+                    continue
+    return records
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(records, slowest=10):
+    """Text report: percentiles of every step, then the slowest documents."""
+    lines = []
+    steps = []
+    for record in records:
+        if record["step"] not in steps:
+            steps.append(record["step"])
+
+    header = f"{'step':<14}{'runs':>6}{'p50 s':>9}{'p90 s':>9}{'p99 s':>9}{'max s':>9}{'cpu p50':>9}{'tools p50':>10}{'peak MB':>9}"
+    lines.append(header)
+    lines.append("-" * len(header))
+    for step in steps:
+        runs = [r for r in records if r["step"] == step]
+        walls = [r["wall_s"] for r in runs]
+        cpus = [r["cpu_s"] + r.get("child_cpu_s", 0) for r in runs]
+        tools = [sum(r.get("tool_s", {}).values()) for r in runs]
+        peak = max(max(r.get("peak_rss_kb") or 0, r.get("child_peak_rss_kb") or 0,
+                       r.get("process_peak_rss_kb") or 0) for r in runs) / 1024
+        lines.append(f"{step:<14}{len(runs):>6}{percentile(walls, 0.5):>9.2f}{percentile(walls, 0.9):>9.2f}"
+                     f"{percentile(walls, 0.99):>9.2f}{max(walls):>9.2f}{percentile(cpus, 0.5):>9.2f}"
+                     f"{percentile(tools, 0.5):>10.2f}{peak:>9.0f}")
+
+    per_document = {}
+    for record in records:
+        entry = per_document.setdefault(record["document"], {"wall": 0.0, "slowest": None})
+        entry["wall"] += record["wall_s"]
+        if entry["slowest"] is None or record["wall_s"] > entry["slowest"][1]:
+            entry["slowest"] = (record["step"], record["wall_s"])
+
+    lines.append("")
+    lines.append(f"Slowest documents (top {slowest}):")
+    ranked = sorted(per_document.items(), key=lambda item: -item[1]["wall"])[:slowest]
+    for document, entry in ranked:
+        step, wall = entry["slowest"]
+        lines.append(f"  {entry['wall']:>9.2f}s  {document}  (slowest step: {step} {wall:.2f}s)")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a metrics JSON-lines file written by the pipeline.")
+    parser.add_argument("metrics_file", nargs="?", default="output/metrics.jsonl")
+    parser.add_argument("--output", "-o", help="also write the summary to this file")
+    parser.add_argument("--slowest", type=int, default=10, help="number of slowest documents to list")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.metrics_file):
+        print(f"Metrics file not found: {args.metrics_file}")
+        sys.exit(1)
+
+    records = load_metrics(args.metrics_file)
+    if not records:
+        print(f"No metrics in {args.metrics_file}")
+        sys.exit(0)
+
+    summary = summarize(records, args.slowest)
+    print(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(summary + "\n")
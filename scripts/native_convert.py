@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import html
+import time
+import zipfile
+import posixpath
+from lxml import etree
+
+from extract_media import extract_media
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+A_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+V_NS = "{urn:schemas-microsoft-com:vml}"
+M_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/math}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+PICTURE_URI = "http://schemas.openxmlformats.org/drawingml/2006/picture"
+
+# Elements the fast path cannot render like pandoc does: those documents go through pandoc
+UNSUPPORTED_TAGS = {
+    f"{M_NS}oMath": "equations",
+    f"{M_NS}oMathPara": "equations",
+    f"{W_NS}txbxContent": "text boxes",
+    f"{W_NS}object": "embedded objects",
+    f"{W_NS}footnoteReference": "footnotes",
+    f"{W_NS}endnoteReference": "endnotes",
+    f"{W_NS}ins": "tracked changes",
+    f"{W_NS}del": "tracked changes",
+    f"{W_NS}moveFrom": "tracked changes",
+    f"{W_NS}moveTo": "tracked changes",
+    f"{W_NS}altChunk": "embedded documents",
+    f"{MC_NS}AlternateContent": "shapes",
+}
+
+HEADING_STYLE = re.compile(r'^heading\s+(\d+)$', re.IGNORECASE)
+TOC_STYLE = re.compile(r'^toc\s+(\d+)$', re.IGNORECASE)
+CODE_MARKER = re.compile(r'^@@CODEBLOCK_(\d+)@@$')
+SECTION_NUMBER = re.compile(r'^\d+(?:\.\d+)*\.?$')
+TOC_TITLE = re.compile(r'^(table\s+of\s+)?contents?$', re.IGNORECASE)
+
+TOC_PLACEHOLDER = "@@NATIVE_TOC@@"
+
+class Unsupported(Exception):
+    """The document uses a feature the fast path does not handle."""
+
+def github_slug(text, used):
+    """Anchor GitHub generates for a heading, with -1, -2... suffixes for duplicates."""
+    slug = re.sub(r'[^\w\- ]', '', text.strip().lower()).replace(' ', '-')
+    base = slug
+    count = used.get(base, 0)
+    if count:
+        slug = f"{base}-{count}"
+    used[base] = count + 1
+    return slug
+
+def heading_key(text):
+    """Compare heading and TOC texts without markup, punctuation, case or spacing."""
+    return ' '.join(re.sub(r'[^\w ]', ' ', text.replace('\\', '')).lower().split())
+
+def escape_markdown(text):
+    """Escape the characters pandoc escapes in GFM text."""
+    return re.sub(r'([\\`*_\[\]<>])', r'\\\1', text)
+
+def escape_block_start(text):
+    """
+    Escape what would make a paragraph start a heading, list, block quote or table, as pandoc does:
+    "# x" -> "\\# x", "- x" -> "\\- x", "1. x" -> "1\\. x", "> x" -> "\\> x", "| x" -> "\\| x".
+    """
+    number = re.match(r'^(\d{1,9})([.)])(?=\s|$)', text)
+    if number:
+        return f"{number.group(1)}\\{number.group(2)}{text[number.end():]}"
+    if re.match(r'^(#{1,6}(?=\s|$)|[-+*](?=\s|$)|-{3,}\s*$|=+\s*$|[>|])', text):
+        return "\\" + text
+    return text
+
+def read_xml(zip_ref, name):
+    """Parse a package part, or return None when it does not exist."""
+    if name not in zip_ref.NameToInfo:
+        return None
+    with zip_ref.open(name) as part:
+        return etree.parse(part).getroot()
+
+def load_styles(zip_ref):
+    """Map paragraph style ids to (lowercase name, (numId, ilvl) or None)."""
+    styles = {}
+    root = read_xml(zip_ref, "word/styles.xml")
+    if root is None:
+        return styles
+    for style in root.iter(f"{W_NS}style"):
+        name = style.find(f"{W_NS}name")
+        num_pr = style.find(f"{W_NS}pPr/{W_NS}numPr")
+        numbering = None
+        if num_pr is not None:
+            num_id = num_pr.find(f"{W_NS}numId")
+            ilvl = num_pr.find(f"{W_NS}ilvl")
+            if num_id is not None:
+                numbering = (num_id.get(f"{W_NS}val"), ilvl.get(f"{W_NS}val") if ilvl is not None else "0")
+        styles[style.get(f"{W_NS}styleId")] = (
+            name.get(f"{W_NS}val", "").lower() if name is not None else "", numbering)
+    return styles
+
+def load_numbering(zip_ref):
+    """Map (numId, ilvl) to the number format of the level (bullet, decimal...)."""
+    formats = {}
+    root = read_xml(zip_ref, "word/numbering.xml")
+    if root is None:
+        return formats
+    abstract = {}
+    for abstract_num in root.iter(f"{W_NS}abstractNum"):
+        levels = {}
+        for lvl in abstract_num.iter(f"{W_NS}lvl"):
+            fmt = lvl.find(f"{W_NS}numFmt")
+            levels[lvl.get(f"{W_NS}ilvl")] = fmt.get(f"{W_NS}val") if fmt is not None else "decimal"
+        abstract[abstract_num.get(f"{W_NS}abstractNumId")] = levels
+    for num in root.iter(f"{W_NS}num"):
+        ref = num.find(f"{W_NS}abstractNumId")
+        if ref is None:
+            continue
+        for ilvl, fmt in abstract.get(ref.get(f"{W_NS}val"), {}).items():
+            formats[(num.get(f"{W_NS}numId"), ilvl)] = fmt
+    return formats
+
+def load_relationships(zip_ref):
+    """Map relationship ids of document.xml to (target, is_external)."""
+    rels = {}
+    root = read_xml(zip_ref, "word/_rels/document.xml.rels")
+    if root is None:
+        return rels
+    for rel in root.iter(f"{REL_NS}Relationship"):
+        external = rel.get("TargetMode") == "External"
+        target = rel.get("Target", "")
+        if not external:
+            target = posixpath.normpath(posixpath.join("word", target)).lstrip("/")
+        rels[rel.get("Id")] = (target, external)
+    return rels
+
+class NativeConverter:
+    """Render the body of document.xml to GFM in one streaming pass."""
+
+    def __init__(self, zip_ref, doc_name, code_blocks=None):
+        self.zip_ref = zip_ref
+        self.doc_name = doc_name
+        self.code_blocks = code_blocks
+        self.styles = load_styles(zip_ref)
+        self.numbering = load_numbering(zip_ref)
+        self.rels = load_relationships(zip_ref)
+        self.blocks = []          # (kind, markdown)
+        self.used_slugs = {}
+        self.bookmark_slugs = {}  # bookmark name -> heading anchor
+        self.heading_slugs = {}   # heading key -> anchors of the headings with that text, in order
+        self.toc_entries = []     # (level, text, bookmark)
+        self.toc_emitted = False
+        self.fields = []          # stack of [instruction, showing result]
+
+    # --- inline content -------------------------------------------------
+
+    def image_path(self, rel_id):
+        target, external = self.rels.get(rel_id, (None, True))
+        if target is None or external:
+            return None
+        # Same path fix_image_paths.py produces after pandoc's --extract-media
+        relative = target[5:] if target.startswith("word/") else target
+        return f"../images/{self.doc_name}/{relative}"
+
+    def in_toc_field(self):
+        return any(instr.strip().upper().startswith("TOC") for instr, _ in self.fields)
+
+    def showing_field_result(self):
+        # Instruction text is hidden, results of every open field are shown
+        return all(showing for _, showing in self.fields)
+
+    def run_pieces(self, run, html_mode):
+        """Return (format, text, raw) pieces of one run."""
+        rpr = run.find(f"{W_NS}rPr")
+        fmt = (
+            self.flag(rpr, "b"),
+            self.flag(rpr, "i"),
+            self.flag(rpr, "strike"),
+        )
+        pieces = []
+        for child in run:
+            tag = child.tag
+            if tag in UNSUPPORTED_TAGS:
+                raise Unsupported(UNSUPPORTED_TAGS[tag])
+            if tag == f"{W_NS}fldChar":
+                kind = child.get(f"{W_NS}fldCharType")
+                if kind == "begin":
+                    self.fields.append(["", False])
+                elif kind == "separate" and self.fields:
+                    self.fields[-1][1] = True
+                elif kind == "end" and self.fields:
+                    self.fields.pop()
+                continue
+            if tag == f"{W_NS}instrText":
+                if self.fields and not self.fields[-1][1]:
+                    self.fields[-1][0] += child.text or ""
+                continue
+            if not self.showing_field_result():
+                continue
+            if tag == f"{W_NS}t":
+                pieces.append((fmt, child.text or "", False))
+            elif tag == f"{W_NS}tab":
+                pieces.append((fmt, " ", False))
+            elif tag in (f"{W_NS}br", f"{W_NS}cr"):
+                if child.get(f"{W_NS}type") in (None, "textWrapping"):
+                    pieces.append((None, "<br>" if html_mode else "\\\n", True))
+            elif tag == f"{W_NS}noBreakHyphen":
+                pieces.append((fmt, "-", False))
+            elif tag == f"{W_NS}sym":
+                try:
+                    pieces.append((fmt, chr(int(child.get(f"{W_NS}char"), 16)), False))
+                except (TypeError, ValueError):
+                    pass
+            elif tag in (f"{W_NS}drawing", f"{W_NS}pict"):
+                pieces.extend(self.image_pieces(child, html_mode))
+        return pieces
+
+    def image_pieces(self, element, html_mode):
+        """Render the pictures of a w:drawing or w:pict."""
+        for graphic in element.iter(f"{A_NS}graphicData"):
+            if graphic.get("uri") != PICTURE_URI:
+                raise Unsupported("charts, diagrams or shape groups")
+        pieces = []
+        refs = [blip.get(f"{R_NS}embed") for blip in element.iter(f"{A_NS}blip")]
+        refs += [data.get(f"{R_NS}id") for data in element.iter(f"{V_NS}imagedata")]
+        for rel_id in refs:
+            path = self.image_path(rel_id)
+            if path is None:
+                raise Unsupported("linked images")
+            markup = f'<img src="{path}" />' if html_mode else f"![image]({path})"
+            pieces.append((None, markup, True))
+        return pieces
+
+    @staticmethod
+    def flag(rpr, name):
+        if rpr is None:
+            return False
+        elem = rpr.find(f"{W_NS}{name}")
+        return elem is not None and elem.get(f"{W_NS}val", "true") not in ("0", "false", "none")
+
+    def collect_pieces(self, container, html_mode, bookmarks):
+        """Walk the inline children of a paragraph (or hyperlink, field...)."""
+        pieces = []
+        for child in container:
+            tag = child.tag
+            if tag in UNSUPPORTED_TAGS:
+                raise Unsupported(UNSUPPORTED_TAGS[tag])
+            if tag == f"{W_NS}r":
+                pieces.extend(self.run_pieces(child, html_mode))
+            elif tag == f"{W_NS}hyperlink":
+                inner = self.render_pieces(self.collect_pieces(child, html_mode, bookmarks), html_mode)
+                target = None
+                if child.get(f"{R_NS}id"):
+                    target, external = self.rels.get(child.get(f"{R_NS}id"), (None, False))
+                    target = target if external else None
+                elif child.get(f"{W_NS}anchor"):
+                    bookmarks.append(("link", child.get(f"{W_NS}anchor")))
+                    target = ("anchor", child.get(f"{W_NS}anchor"))
+                if target is None or not inner.strip():
+                    pieces.append((None, inner, True))
+                elif isinstance(target, tuple):
+                    # Resolved when the whole document is known
+                    pieces.append((None, f"@@ANCHOR[{inner}]({target[1]})@@", True))
+                elif html_mode:
+                    pieces.append((None, f'<a href="{html.escape(target)}">{inner}</a>', True))
+                else:
+                    pieces.append((None, f"[{inner}]({target})", True))
+            elif tag == f"{W_NS}bookmarkStart":
+                bookmarks.append(("bookmark", child.get(f"{W_NS}name")))
+            elif tag in (f"{W_NS}fldSimple", f"{W_NS}smartTag", f"{W_NS}customXml"):
+                pieces.extend(self.collect_pieces(child, html_mode, bookmarks))
+            elif tag == f"{W_NS}sdt":
+                content = child.find(f"{W_NS}sdtContent")
+                if content is not None:
+                    pieces.extend(self.collect_pieces(content, html_mode, bookmarks))
+        return pieces
+
+    @staticmethod
+    def render_pieces(pieces, html_mode):
+        """Merge runs with the same formatting and wrap them in markdown (or HTML) markers."""
+        out = []
+        groups = []
+        for fmt, text, raw in pieces:
+            if not raw and groups and groups[-1][0] == fmt and not groups[-1][2]:
+                groups[-1][1] += text
+            else:
+                groups.append([fmt, text, raw])
+        for fmt, text, raw in groups:
+            if raw:
+                out.append(text)
+                continue
+            escaped = html.escape(text, quote=False) if html_mode else escape_markdown(text)
+            bold, italic, strike = fmt
+            core = escaped.strip()
+            if not core or not (bold or italic or strike):
+                out.append(escaped)
+                continue
+            lead = escaped[:len(escaped) - len(escaped.lstrip())]
+            trail = escaped[len(escaped.rstrip()):]
+            if html_mode:
+                if strike:
+                    core = f"<del>{core}</del>"
+                if italic:
+                    core = f"<em>{core}</em>"
+                if bold:
+                    core = f"<strong>{core}</strong>"
+            else:
+                if strike:
+                    core = f"~~{core}~~"
+                if italic:
+                    core = f"*{core}*"
+                if bold:
+                    core = f"**{core}**"
+            out.append(lead + core + trail)
+        return ''.join(out)
+
+    # --- blocks ---------------------------------------------------------
+
+    def paragraph_style(self, p):
+        style = p.find(f"{W_NS}pPr/{W_NS}pStyle")
+        return self.styles.get(style.get(f"{W_NS}val"), ("", None)) if style is not None else ("", None)
+
+    def paragraph_numbering(self, p, style_numbering):
+        num_pr = p.find(f"{W_NS}pPr/{W_NS}numPr")
+        if num_pr is not None:
+            num_id = num_pr.find(f"{W_NS}numId")
+            ilvl = num_pr.find(f"{W_NS}ilvl")
+            if num_id is None:
+                return None
+            return num_id.get(f"{W_NS}val"), ilvl.get(f"{W_NS}val") if ilvl is not None else "0"
+        return style_numbering
+
+    def convert_paragraph(self, p, in_toc_block=False):
+        style_name, style_numbering = self.paragraph_style(p)
+        toc_paragraph = in_toc_block or self.in_toc_field() or TOC_STYLE.match(style_name)
+        bookmarks = []
+        text = self.render_pieces(self.collect_pieces(p, False, bookmarks), False).strip()
+        toc_paragraph = toc_paragraph or self.in_toc_field()
+
+        if toc_paragraph:
+            level = TOC_STYLE.match(style_name)
+            links = [name for kind, name in bookmarks if kind == "link"]
+            if text:
+                self.add_toc_entry(int(level.group(1)) if level else 1, text, links[0] if links else None)
+            return
+
+        heading = HEADING_STYLE.match(style_name)
+        if heading and text:
+            slug = github_slug(re.sub(r'[*_~\\]', '', text), self.used_slugs)
+            self.heading_slugs.setdefault(heading_key(text), []).append(slug)
+            for kind, name in bookmarks:
+                if kind == "bookmark":
+                    self.bookmark_slugs[name] = slug
+            self.blocks.append(("block", "#" * min(int(heading.group(1)), 6) + " " + text))
+            return
+
+        marker = CODE_MARKER.match(text.replace('\\', ''))
+        if marker and self.code_blocks is not None:
+            index = int(marker.group(1)) - 1
+            if 0 <= index < len(self.code_blocks):
+                self.blocks.append(("block", f"```\n{self.code_blocks[index]}\n```"))
+                return
+
+        if not text:
+            return
+
+        numbering = self.paragraph_numbering(p, style_numbering)
+        if numbering and numbering[0] != "0" and numbering in self.numbering:
+            fmt = self.numbering[numbering]
+            level = int(numbering[1])
+            marker = "-" if fmt == "bullet" else "1."
+            self.blocks.append(("list", "    " * level + f"{marker} {escape_block_start(text)}"))
+            return
+
+        self.blocks.append(("block", escape_block_start(text)))
+
+    def add_toc_entry(self, level, text, bookmark):
+        """Record a TOC line and put the TOC placeholder where the TOC was."""
+        if not self.toc_emitted:
+            # The document's own "Table of Contents" title is replaced by the generated one, as fix_toc does
+            if self.blocks and TOC_TITLE.match(re.sub(r'[#*_\\]', '', self.blocks[-1][1]).strip()):
+                self.blocks.pop()
+            self.blocks.append(("block", TOC_PLACEHOLDER))
+            self.toc_emitted = True
+        # Drop the page number and split the section number from the title
+        parts = [part.strip() for part in text.replace('\\', '').split(' ') if part.strip()]
+        if len(parts) > 1 and parts[-1].isdigit():
+            parts = parts[:-1]
+        if not parts or TOC_TITLE.match(' '.join(parts)):
+            return
+        self.toc_entries.append((level, ' '.join(parts), bookmark))
+
+    def convert_table(self, tbl):
+        if tbl.find(f".//{W_NS}tbl") is not None:
+            raise Unsupported("nested tables")
+
+        rows = []
+        origins = {}  # grid column -> cell dict currently spanning rows
+        for tr in tbl.iter(f"{W_NS}tr"):
+            row = []
+            column = 0
+            for tc in tr.iter(f"{W_NS}tc"):
+                tc_pr = tc.find(f"{W_NS}tcPr")
+                span = 1
+                merge = None
+                if tc_pr is not None:
+                    grid_span = tc_pr.find(f"{W_NS}gridSpan")
+                    if grid_span is not None:
+                        span = int(grid_span.get(f"{W_NS}val", "1"))
+                    v_merge = tc_pr.find(f"{W_NS}vMerge")
+                    if v_merge is not None:
+                        merge = v_merge.get(f"{W_NS}val", "continue")
+                if merge == "continue" and column in origins:
+                    origins[column]["rowspan"] += 1
+                else:
+                    paragraphs = []
+                    for p in tc.iter(f"{W_NS}p"):
+                        paragraphs.append(self.render_pieces(self.collect_pieces(p, True, []), True).strip())
+                    cell = {"text": "<br>".join(x for x in paragraphs if x), "colspan": span, "rowspan": 1}
+                    row.append(cell)
+                    if merge == "restart":
+                        origins[column] = cell
+                    else:
+                        origins.pop(column, None)
+                column += span
+            rows.append(row)
+
+        if not rows:
+            return
+
+        def cell_html(tag, cell):
+            attrs = ""
+            if cell["colspan"] > 1:
+                attrs += f' colspan="{cell["colspan"]}"'
+            if cell["rowspan"] > 1:
+                attrs += f' rowspan="{cell["rowspan"]}"'
+            return f"<{tag}{attrs}>{cell['text']}</{tag}>"
+
+        # Same layout preserve_tables.py gives pandoc's tables
+        lines = ['<table>', '<thead>', '<tr>']
+        lines += [cell_html('th', cell) for cell in rows[0]]
+        lines += ['</tr>', '</thead>', '<tbody>']
+        for i, row in enumerate(rows[1:]):
+            lines.append(f'<tr class="{"odd" if i % 2 == 0 else "even"}">')
+            lines += [cell_html('td', cell) for cell in row]
+            lines.append('</tr>')
+        lines += ['</tbody>', '</table>']
+        self.blocks.append(("block", '\n'.join(lines)))
+
+    def convert_block(self, element, in_toc_block=False):
+        tag = element.tag
+        if tag in UNSUPPORTED_TAGS:
+            raise Unsupported(UNSUPPORTED_TAGS[tag])
+        if tag == f"{W_NS}p":
+            self.convert_paragraph(element, in_toc_block)
+        elif tag == f"{W_NS}tbl":
+            self.convert_table(element)
+        elif tag == f"{W_NS}sdt":
+            gallery = element.find(f"{W_NS}sdtPr/{W_NS}docPartObj/{W_NS}docPartGallery")
+            is_toc = gallery is not None and "table of contents" in gallery.get(f"{W_NS}val", "").lower()
+            content = element.find(f"{W_NS}sdtContent")
+            if content is not None:
+                for child in content:
+                    self.convert_block(child, in_toc_block or is_toc)
+
+    # --- output ---------------------------------------------------------
+
+    def heading_anchor(self, texts, seen):
+        """Anchor of the next heading showing one of texts, for TOC lines without a bookmark."""
+        for text in texts:
+            key = heading_key(text)
+            slugs = self.heading_slugs.get(key)
+            if slugs:
+                index = seen.get(key, 0)
+                seen[key] = index + 1
+                return slugs[min(index, len(slugs) - 1)]
+        return github_slug(texts[-1], dict())
+
+    def toc_markdown(self):
+        lines = ["## Table of Contents", ""]
+        seen = {}
+        for level, text, bookmark in self.toc_entries:
+            words = text.split(' ', 1)
+            if len(words) == 2 and SECTION_NUMBER.match(words[0]):
+                number, title = words[0].rstrip('.'), words[1]
+                indent = "  " * number.count('.')
+            else:
+                number, title = None, text
+                indent = "  " * (level - 1)
+            anchor = self.bookmark_slugs.get(bookmark) or self.heading_anchor([text, title], seen)
+            label = f"{number} {title}" if number else title
+            lines.append(f"{indent}* [{label}](#{anchor})")
+        return '\n'.join(lines)
+
+    def markdown(self):
+        out = []
+        previous = None
+        for kind, text in self.blocks:
+            if text == TOC_PLACEHOLDER:
+                text = self.toc_markdown()
+            if out:
+                out.append("\n" if kind == "list" and previous == "list" else "\n\n")
+            out.append(text)
+            previous = kind
+        content = ''.join(out) + "\n"
+
+        # Internal links point at heading anchors, unknown bookmarks become plain text
+        def resolve(match):
+            slug = self.bookmark_slugs.get(match.group(2))
+            return f"[{match.group(1)}](#{slug})" if slug else match.group(1)
+        return re.sub(r'@@ANCHOR\[(.*?)\]\(([^)]*)\)@@', resolve, content)
+
+    def convert(self):
+        """Stream the body of document.xml, one top-level block at a time."""
+        with self.zip_ref.open("word/document.xml") as document:
+            context = etree.iterparse(document, events=("end",))
+            for _, elem in context:
+                parent = elem.getparent()
+                if parent is None or parent.tag != f"{W_NS}body":
+                    continue
+                if elem.tag != f"{W_NS}sectPr":
+                    self.convert_block(elem)
+                # Free what has been rendered
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+        return self.markdown()
+
+def log_route(log_file, doc_name, route, reason=""):
+    """Append the routing decision of a document to the routing log."""
+    line = f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{doc_name}\t{route}\t{reason}\n"
+    print(f"Routing {doc_name}: {route}{' (' + reason + ')' if reason else ''}")
+    if log_file:
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+def native_convert(input_docx, output_file, doc_name, codeblocks_json=None, log_file=None):
+    """
+    Convert a marked DOCX straight to the fixed GFM the pandoc pipeline produces.
+    Returns False (and writes nothing) when the document needs pandoc.
+    """
+    code_blocks = None
+    if codeblocks_json and os.path.exists(codeblocks_json):
+        with open(codeblocks_json, 'r', encoding='utf-8') as f:
+            code_blocks = json.load(f)
+
+    try:
+        with zipfile.ZipFile(input_docx) as zip_ref:
+            content = NativeConverter(zip_ref, doc_name, code_blocks).convert()
+    except Unsupported as e:
+        log_route(log_file, doc_name, "pandoc", f"unsupported: {e}")
+        return False
+    except (zipfile.BadZipFile, etree.XMLSyntaxError, KeyError) as e:
+        log_route(log_file, doc_name, "pandoc", f"unreadable: {e}")
+        return False
+
+    extract_media(input_docx, os.path.join("images", doc_name))
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    log_route(log_file, doc_name, "native")
+    print(f"Native conversion: {input_docx} → {output_file}")
+    return True
+
+if __name__ == "__main__":
+    log_file = None
+    args = sys.argv[1:]
+    if '--log' in args:
+        index = args.index('--log')
+        log_file = args[index + 1] if index + 1 < len(args) else None
+        args = args[:index] + args[index + 2:]
+
+    if len(args) not in (3, 4):
+        print("Usage: python native_convert.py [--log routing.log] <marked.docx> <output.md> <doc_name> [codeblocks.json]")
+        print("  exits with 2 when the document uses features that need the pandoc pipeline")
+        sys.exit(1)
+
+    sys.exit(0 if native_convert(*args, log_file=log_file) else 2)
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Every step is imported once, so long-running callers (service, daemon) keep them warm
+from preflight import preflight, load_preflight
+from extract_and_mark_inplace import main as extract_and_mark
+from native_convert import native_convert
+from convert_parts import convert_parts, SECTION_CACHE_DIR
+from extract_media import extract_media, rewrite_media_links
+from convert_problematic_docx import convert_problematic_docx
+from preserve_tables import preserve_tables
+from fix_toc import fix_toc
+from fix_section_numbering import fix_section_numbering
+from fix_image_paths import fix_image_paths
+from convert_images import process_images_in_directory, update_markdown_links, check_dependencies, setup_logging
+from inject_code_blocks import inject_code_blocks
+from tools import run_tool
+from metrics import StepMetrics
+from profiling import StepProfiler
+from governor import admit_docx, intervene, reset_interventions, write_report, kill_running, allow_tools
+import tracing
+
+# Files and directories each document produces, relative to the working directory
+DOCUMENT_OUTPUTS = [
+    "source_marked/{name}_marked.docx",
+    "output/{name}_codeblocks.json",
+    "output/{name}_preflight.json",
+    "output/{name}_raw.md",
+    "output/{name}_tables_fixed.md",
+    "output/{name}_toc_fixed.md",
+    "output/{name}_sections_fixed.md",
+    "output/{name}_images_fixed.md",
+    "output/{name}_final.md",
+    "output/{name}_image_map.json",
+    "output/{name}_journal.json",
+    "output/{name}_governor.json",
+    "output/{name}_parts",
+    "images/{name}",
+]
+
+def sanitize_name(file):
+    """Document name used for every output (file name without extension, spaces replaced by underscores)."""
+    return os.path.splitext(os.path.basename(file))[0].replace(' ', '_')
+
+def remove_document_outputs(name):
+    """Delete what a previous conversion of one document left, leaving other documents alone."""
+    removed = 0
+    for pattern in DOCUMENT_OUTPUTS:
+        path = pattern.format(name=name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        elif os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+def run_pandoc(marked_docx, raw_md, media_root=None):
+    """Initial pandoc conversion, extracting the media under media_root when given."""
+    command = ["pandoc", "-f", "docx", "-t", "gfm", "--wrap=none"]
+    if media_root:
+        command.append(f"--extract-media={media_root}")
+    command += ["--standalone", marked_docx, "-o", raw_md]
+    try:
+        return run_tool(command).returncode == 0
+    except OSError as e:
+        print(f"Could not run pandoc: {e}")
+        return False
+
+class Journal:
+    """
+    Per-document record of the completed steps, rewritten atomically after each step
+    so that an interrupted batch can resume where it stopped.
+    """
+
+    def __init__(self, name, source_file, options, resume=False):
+        self.path = f"output/{name}_journal.json"
+        stat = os.stat(source_file)
+        # A different source version or different options invalidate the recorded steps
+        self.key = {"source": os.path.basename(source_file), "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns, "options": options}
+        self.state = {"key": self.key, "steps": [], "route": None, "completed": False}
+        # Steps running concurrently record themselves from their own threads
+        self.lock = threading.Lock()
+        if resume:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get("key") == self.key:
+                    self.state = state
+            except (OSError, ValueError):
+                pass
+
+    def save(self):
+        with self.lock:
+            temp_file = f"{self.path}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.path)
+
+    def done(self, step):
+        return step in self.state["steps"]
+
+    def complete(self, step):
+        with self.lock:
+            if step not in self.state["steps"]:
+                self.state["steps"].append(step)
+        self.save()
+
+def discard(paths):
+    """Remove the possibly partial outputs of a step before running it again."""
+    for path in paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+def run_graph(nodes, workers=None):
+    """
+    Run {name: (dependencies, action)}: each node starts, in its own thread, as soon as the
+    nodes it depends on succeeded (dependencies that are not nodes count as met).
+    A node fails when its action returns False, and the nodes depending on it are not run.
+    When this thread is interrupted, the running tools of every node are killed without waiting.
+    Returns the set of nodes that succeeded.
+    """
+    done, failed, running = set(), set(), {}
+    executor = ThreadPoolExecutor(max_workers=workers or max(1, len(nodes)))
+    try:
+        while True:
+            for name, (dependencies, action) in nodes.items():
+                if name in done or name in failed or name in running.values():
+                    continue
+                dependencies = [d for d in dependencies if d in nodes]
+                if any(d in failed for d in dependencies):
+                    failed.add(name)
+                elif all(d in done for d in dependencies):
+                    running[executor.submit(action)] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                (failed if future.result() is False else done).add(name)
+    except BaseException:
+        # Interrupted (service timeout, Ctrl-C) in this thread: do not wait for the steps still
+        # running, kill their tools so they finish at once and start no other node
+        executor.shutdown(wait=False, cancel_futures=True)
+        kill_running()
+        raise
+    executor.shutdown()
+    return done
+
+def convert_document(file, native=False, split_parts=False, zip_media=False, race_fallback=False,
+                     skip_images=False, vector_svg=False, delta=False, resume=False, metrics_file="output/metrics.jsonl",
+                     profile_dir=None, profile_docs=None, profile_memory=False):
+    """
+    Run the whole pipeline on one DOCX, relative to the current directory
+    (source_marked/, output/ and images/ as in process_documents.sh).
+    With resume=True, the steps the journal records as completed for this version of the
+    document are skipped and the pipeline continues from the first incomplete step.
+    Wall time, CPU, memory, I/O and external tool time of every step are appended to metrics_file.
+    With profile_dir, the steps of the documents matching profile_docs (all when empty) are
+    profiled there with cProfile, and with tracemalloc when profile_memory is set.
+    With delta=True, the document is converted in parts and only the sections changed since its
+    previous conversion go through pandoc and steps 3 to 6; images converted before are reused.
+    Documents failing the governor's admission check (size, compression ratio) are refused before
+    any work, and the governor's interventions are reported in output/<doc>_governor.json.
+    Returns the path of the final markdown, or None when the document could not be converted.
+    """
+    name = sanitize_name(file)
+    reset_interventions()
+    allow_tools()
+    try:
+        reason = admit_docx(file)
+        if reason:
+            intervene("refused", os.path.basename(file), reason)
+            print(f"ERROR: {os.path.basename(file)} refused before conversion: {reason}")
+            return None
+        return run_pipeline(file, native, split_parts, zip_media, race_fallback, skip_images, vector_svg, delta,
+                            resume, metrics_file, profile_dir, profile_docs, profile_memory)
+    finally:
+        os.makedirs("output", exist_ok=True)
+        write_report(f"output/{name}_governor.json", name)
+
+def run_pipeline(file, native=False, split_parts=False, zip_media=False, race_fallback=False,
+                 skip_images=False, vector_svg=False, delta=False, resume=False, metrics_file="output/metrics.jsonl",
+                 profile_dir=None, profile_docs=None, profile_memory=False):
+    """Steps 1 to 8 of convert_document on an admitted document."""
+    name = sanitize_name(file)
+    marked = f"source_marked/{name}_marked.docx"
+    codeblocks = f"output/{name}_codeblocks.json"
+    analysis = f"output/{name}_preflight.json"
+
+    def out(step):
+        return f"output/{name}_{step}.md"
+
+    for directory in ("output", "source_marked", f"images/{name}"):
+        os.makedirs(directory, exist_ok=True)
+
+    options = {"native": native, "split_parts": split_parts, "zip_media": zip_media,
+               "race_fallback": race_fallback, "skip_images": skip_images, "vector_svg": vector_svg, "delta": delta}
+    journal = Journal(name, file, options, resume)
+    profiler = StepProfiler(profile_dir, name, profile_docs, profile_memory)
+    # Profiled steps run one at a time, so that each profile (and memory peak) only holds its own step
+    workers = 1 if profiler.enabled else None
+    metrics = StepMetrics(metrics_file, name, exclusive=workers == 1)
+    if journal.state["completed"] and os.path.exists(out("final")):
+        print(f"Already converted, skipping {os.path.basename(file)}")
+        return out("final")
+
+    # Steps run by this call: the steps depending on them have to run again too
+    ran = set()
+
+    def run_step(step, inputs, outputs, action, after=()):
+        """Run and measure one step unless the journal has it, and record it when it succeeds."""
+        if journal.done(step) and all(os.path.exists(path) for path in outputs) and not ran.intersection(after):
+            print(f"{step}: already done, skipping")
+            return True
+        ran.add(step)
+        discard(outputs)
+        with metrics.step(step, inputs, outputs) as measure, profiler.step(step), tracing.span(step, "step", document=name):
+            if action() is False:
+                measure["status"] = "failed"
+                return False
+        journal.complete(step)
+        return True
+
+    # Before the Pandoc conversion : one pass over the docx remaps symbol-font characters,
+    # marks the code blocks and stores the analysis next to the outputs
+    def mark():
+        print("Step 1: Preflight analysis and insertion of the markers inside the docx")
+        try:
+            preflight(file, marked, codeblocks, analysis)
+        except Exception as e:
+            print(f"WARNING: Preflight failed ({e}). Marking the original document without analysis.")
+            extract_and_mark(file, marked, codeblocks)
+    if not journal.done("preflight") and os.path.exists(marked) and os.path.exists(codeblocks) \
+            and load_preflight(analysis, file):
+        print(f"Preflight up to date, reusing {analysis}")
+        journal.complete("preflight")
+    run_step("preflight", [file], [marked, codeblocks, analysis], mark)
+
+    # How steps 2 to 6 are done is decided once and kept in the journal
+    route = journal.state["route"]
+    if route in ("native", "parts") and not os.path.exists(out("images_fixed")) or "preflight" in ran:
+        route = None
+    if route is None:
+        ran.add("route")
+        # Documents the native converter fully supports skip pandoc and steps 3 to 6,
+        # the routing of every document is logged in output/routing.log
+        if native:
+            print("Step 2-6: Native conversion of the marked docx")
+            with metrics.step("native", [marked], [out("images_fixed")]) as measure, profiler.step("native"), \
+                    tracing.span("native", "step", document=name):
+                if native_convert(marked, out("images_fixed"), name, codeblocks, log_file="output/routing.log"):
+                    route = "native"
+                else:
+                    measure["status"] = "unsupported"
+            if route is None:
+                print("Native conversion not possible, using pandoc")
+
+        # Large documents: pandoc and steps 3 to 6 run on each top-level section concurrently,
+        # and with delta only on the sections that changed since the previous conversion.
+        # The heading outline of the preflight analysis tells whether there is anything to split at
+        outline = load_preflight(analysis)
+        if route is None and (split_parts or delta) and outline is not None \
+                and not any(heading["level"] == 1 for heading in outline["headings"]):
+            print("No Heading 1 in the preflight outline, converting the whole document")
+        elif route is None and (split_parts or delta):
+            print("Step 2-6: Converting the document in parts split at Heading 1")
+            with metrics.step("parts", [marked], [out("images_fixed")]) as measure, profiler.step("parts"), \
+                    tracing.span("parts", "step", document=name):
+                if convert_parts(marked, name, out("images_fixed"), cache_dir=SECTION_CACHE_DIR if delta else None,
+                                 codeblocks_json=codeblocks):
+                    # Reused sections were not extracted by pandoc
+                    if delta:
+                        extract_media(marked, f"./images/{name}")
+                    route = "parts"
+                else:
+                    measure["status"] = "failed"
+            if route is None:
+                print("Conversion in parts not possible, converting the whole document")
+
+        journal.state["route"] = route or "pandoc"
+        journal.save()
+
+    # Steps 2 to 8 form a graph: image conversion only needs the media pandoc extracted, so it
+    # runs while the text passes fix the markdown, and only the link rewrite waits for both
+    nodes = {}
+
+    def node(step, after, inputs, outputs, action):
+        nodes[step] = (after, lambda: run_step(step, inputs, outputs, action, after))
+
+    text_ready = media_ready = "route"
+    if journal.state["route"] == "pandoc":
+        def initial_conversion():
+            print("Step 2: Initial conversion with Pandoc on the marked docx")
+            # Let pandoc extract the media, or read only the referenced images from the zip ourselves
+            if run_pandoc(marked, out("raw"), None if zip_media else f"./images/{name}"):
+                if zip_media:
+                    extract_media(marked, f"./images/{name}")
+                    rewrite_media_links(out("raw"), f"./images/{name}")
+                return True
+            print("Pandoc conversion failed. Trying alternative methods...")
+            # Call the fallback converter (each method runs with a time and memory budget)
+            if not convert_problematic_docx(file, out("raw"), race_fallback):
+                print(f"ERROR: All conversion methods failed for {os.path.basename(file)}")
+                return False
+            try:
+                extract_media(file, f"./images/{name}")
+            except Exception as e:
+                print(f"Media extraction error: {e}")
+            return True
+        node("pandoc", ("preflight", "route"), [marked], [out("raw"), f"images/{name}"], initial_conversion)
+
+        def preserve():
+            print("Step 3: Preserving tables as HTML")
+            preserve_tables(out("raw"), out("tables_fixed"))
+        node("tables", ("pandoc",), [out("raw")], [out("tables_fixed")], preserve)
+
+        def toc():
+            print("Step 4: Fixing table of contents")
+            fix_toc(out("tables_fixed"), out("toc_fixed"))
+        node("toc", ("tables",), [out("tables_fixed")], [out("toc_fixed")], toc)
+
+        def sections():
+            print("Step 5: Fixing section numbering")
+            fix_section_numbering(out("toc_fixed"), out("sections_fixed"))
+        node("sections", ("toc",), [out("toc_fixed")], [out("sections_fixed")], sections)
+
+        def image_paths():
+            print("Step 6: Fixing image paths")
+            fix_image_paths(out("sections_fixed"), out("images_fixed"))
+        node("image_paths", ("sections",), [out("sections_fixed")], [out("images_fixed")], image_paths)
+        text_ready, media_ready = "image_paths", "pandoc"
+
+    # Convert problematic images (EMF, WMF, GIF) to PNG or SVG, keeping the new names for the links
+    image_map_file = f"output/{name}_image_map.json"
+    media_dir = os.path.join("images", name, "media")
+
+    def images():
+        print(f"Step 7: Converting problematic images to {'SVG' if vector_svg else 'PNG'}")
+        image_map = {}
+        cache_dir = os.path.join(SECTION_CACHE_DIR, "images") if delta else None
+        if not check_dependencies() or not os.path.isdir(media_dir):
+            print("WARNING: Image conversion failed. Using previous version as final.")
+        else:
+            image_map = process_images_in_directory(media_dir, vector_svg, cache_dir)
+        with open(image_map_file, 'w', encoding='utf-8') as f:
+            json.dump(image_map, f, indent=2)
+
+    def links():
+        print("Step 7: Pointing the image links to the converted images")
+        with open(image_map_file, 'r', encoding='utf-8') as f:
+            image_map = json.load(f)
+        if image_map:
+            update_markdown_links(out("images_fixed"), image_map, os.path.relpath(media_dir, "output"))
+
+    last = text_ready
+    if not skip_images:
+        node("images", (media_ready,), [f"images/{name}"], [image_map_file], images)
+        node("links", ("images", text_ready), [out("images_fixed"), image_map_file], [], links)
+        last = "links"
+
+    # Putting back the code blocks inside the markdown
+    def inject():
+        shutil.copyfile(out("images_fixed"), out("final"))
+        print("Step 8: Injecting the code blocks inside the final markdown")
+        inject_code_blocks(out("final"), codeblocks)
+    node("inject", (last,), [out("images_fixed"), codeblocks], [out("final")], inject)
+
+    if "inject" not in run_graph(nodes, workers):
+        return None
+
+    journal.state["completed"] = True
+    journal.save()
+
+    print(f"Completed processing {os.path.basename(file)}")
+    print(f"Final output: {out('final')}")
+    return out("final")
+
+def add_pipeline_arguments(parser):
+    """Options shared by every front end of the pipeline."""
+    parser.add_argument("-s", "--skip-images", action="store_true", help="skip image conversion step")
+    parser.add_argument("-v", "--vector-svg", action="store_true", help="convert vector to SVG instead")
+    parser.add_argument("-z", "--zip-media", action="store_true",
+                        help="extract referenced images straight from the docx instead of pandoc")
+    parser.add_argument("-r", "--race-fallback", action="store_true",
+                        help="if pandoc fails, race the two best fallback converters")
+    parser.add_argument("-n", "--native", action="store_true",
+                        help="convert supported documents without pandoc")
+    parser.add_argument("-p", "--parts", action="store_true",
+                        help="split documents at Heading 1 and convert the parts in parallel")
+    parser.add_argument("-d", "--delta", action="store_true",
+                        help="only reconvert the sections and images changed since the previous conversion")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="profile every step with cProfile and write the results to DIR/<doc>/")
+    parser.add_argument("--profile-docs", action="append", metavar="PATTERN",
+                        help="only profile the documents whose name matches this pattern (repeatable)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also record the top allocation sites of each step with tracemalloc")
+
+def pipeline_options(args):
+    """Keyword arguments of convert_document from parsed options."""
+    return {
+        "native": args.native,
+        "split_parts": args.parts,
+        "zip_media": args.zip_media,
+        "race_fallback": args.race_fallback,
+        "skip_images": args.skip_images,
+        "vector_svg": args.vector_svg,
+        "delta": args.delta,
+        "profile_dir": args.profile,
+        "profile_docs": args.profile_docs,
+        "profile_memory": args.profile_memory,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert one DOCX to markdown (run from the repository root).")
+    parser.add_argument("file", help="DOCX file to convert")
+    add_pipeline_arguments(parser)
+    parser.add_argument("-R", "--resume", action="store_true",
+                        help="skip the steps already completed for this version of the document")
+    args = parser.parse_args()
+    setup_logging()
+
+    sys.exit(0 if convert_document(args.file, resume=args.resume, **pipeline_options(args)) else 1)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import hashlib
+from docx import Document
+from docx.text.paragraph import Paragraph
+from docx.oxml.ns import qn
+from lxml import etree
+
+from extract_and_mark_inplace import is_code_paragraph
+from remap_symbol_fonts import TEXT_PART_PATTERN, remap_symbols
+
+# detect_non_unicode.py lives at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detect_non_unicode import invalid_char_pattern
+
+# Bump when the analysis format changes so stale files are regenerated
+PREFLIGHT_VERSION = 1
+
+IMAGE_TAGS = (
+    "{http://schemas.openxmlformats.org/drawingml/2006/main}blip",
+    "{urn:schemas-microsoft-com:vml}imagedata",
+)
+
+HEADING_STYLE = re.compile(r'^heading\s+(\d+)$', re.IGNORECASE)
+
+def file_sha256(file_path):
+    """Return the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_preflight(analysis_file, input_docx=None):
+    """
+    Return the stored analysis of a document, or None when it is missing,
+    from an older format, or (when input_docx is given) made from another version of the file.
+    """
+    if not os.path.exists(analysis_file):
+        return None
+    try:
+        with open(analysis_file, 'r', encoding='utf-8') as f:
+            analysis = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if analysis.get("version") != PREFLIGHT_VERSION:
+        return None
+    if input_docx and analysis.get("source_sha256") != file_sha256(input_docx):
+        return None
+    return analysis
+
+def remap_package_symbols(doc, unmapped):
+    """Remap symbol-font characters in every text part of the already opened package."""
+    remapped = 0
+    for part in doc.part.package.iter_parts():
+        if not TEXT_PART_PATTERN.match(str(part.partname).lstrip('/')):
+            continue
+        element = getattr(part, '_element', None)
+        if element is not None:
+            remapped += remap_symbols(element, unmapped)
+        else:
+            # Parts python-docx does not model (footnotes, comments) are kept as a blob
+            root = etree.fromstring(part.blob)
+            count = remap_symbols(root, unmapped)
+            if count:
+                part._blob = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+                remapped += count
+    return remapped
+
+def paragraph_text(p_element):
+    """Text of a raw w:p element (only used for paragraphs inside tables)."""
+    return ''.join(t.text or '' for t in p_element.iter(qn('w:t')))
+
+def preflight(input_docx, output_docx, codeblocks_json, analysis_file):
+    """
+    Open a DOCX once and, in a single traversal of the body:
+    - remap symbol-font characters to Unicode
+    - replace code blocks by @@CODEBLOCK_n@@ markers (same rules as extract_and_mark_inplace.py)
+    - record special characters, the heading outline, and table/image counts
+    Writes the marked document, the code blocks JSON and the analysis JSON.
+    """
+    doc = Document(input_docx)
+    pattern = invalid_char_pattern()
+
+    unmapped = {}
+    remapped = remap_package_symbols(doc, unmapped)
+
+    code_blocks = []
+    boundaries = []
+    headings = []
+    special_chars = {}
+    counts = {"paragraphs": 0, "tables": 0, "images": 0}
+
+    def record_special(text, kind):
+        for match in pattern.finditer(text):
+            char_repr = repr(match.group())[1:-1]
+            entry = special_chars.setdefault(char_repr, {
+                "codepoint": f"U+{ord(match.group()):04X}", "count": 0, "by_location": {}})
+            entry["count"] += 1
+            entry["by_location"][kind] = entry["by_location"].get(kind, 0) + 1
+
+    current_block = None
+    block_start = None
+    paragraph_index = 0
+
+    for child in doc.element.body.iterchildren():
+        counts["images"] += sum(1 for el in child.iter(*IMAGE_TAGS))
+
+        if child.tag == qn('w:tbl'):
+            # Tables do not end a code block, as doc.paragraphs skips them
+            counts["tables"] += 1
+            for p in child.iter(qn('w:p')):
+                record_special(paragraph_text(p), "table")
+            continue
+        if child.tag != qn('w:p'):
+            continue
+
+        paragraph_index += 1
+        para = Paragraph(child, doc._body)
+        text = para.text
+        record_special(text, "paragraph")
+
+        style_name = para.style.name if para.style is not None else ""
+        heading = HEADING_STYLE.match(style_name)
+        if heading and text.strip():
+            headings.append({"level": int(heading.group(1)), "text": text.strip(), "paragraph": paragraph_index})
+
+        if is_code_paragraph(para):
+            if current_block is None:
+                # First paragraph of the block carries the marker
+                current_block = [text]
+                block_start = paragraph_index
+                for run in para.runs:
+                    run.text = ''
+                para.add_run(f'@@CODEBLOCK_{len(code_blocks) + 1}@@')
+            else:
+                # Empty the other paragraphs of the block (to avoid clones)
+                current_block.append(text)
+                for run in para.runs:
+                    run.text = ''
+            end_paragraph = paragraph_index
+        elif current_block is not None:
+            code_blocks.append('\n'.join(current_block))
+            boundaries.append([block_start, end_paragraph])
+            current_block = None
+
+    if current_block is not None:
+        code_blocks.append('\n'.join(current_block))
+        boundaries.append([block_start, end_paragraph])
+
+    counts["paragraphs"] = paragraph_index
+
+    os.makedirs(os.path.dirname(output_docx) or '.', exist_ok=True)
+    doc.save(output_docx)
+
+    with open(codeblocks_json, 'w', encoding='utf-8') as f:
+        json.dump(code_blocks, f, ensure_ascii=False, indent=2)
+
+    analysis = {
+        "version": PREFLIGHT_VERSION,
+        "source": os.path.basename(input_docx),
+        "source_sha256": file_sha256(input_docx),
+        "source_size": os.path.getsize(input_docx),
+        "marked_docx": output_docx,
+        "codeblocks_json": codeblocks_json,
+        "symbols_remapped": remapped,
+        "symbols_unmapped": [
+            {"character": repr(char)[1:-1], "codepoint": f"U+{ord(char):04X}", "font": font, "count": count}
+            for (char, font), count in unmapped.items()
+        ],
+        "special_characters": special_chars,
+        "code_blocks": boundaries,
+        "headings": headings,
+        **counts,
+    }
+    temp_file = analysis_file + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(analysis, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, analysis_file)
+
+    return analysis
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != '--force']
+    if len(args) != 4:
+        print("Usage: python preflight.py [--force] <input.docx> <output_marked.docx> <output_codeblocks.json> <output_preflight.json>")
+        sys.exit(1)
+
+    input_docx, output_docx, codeblocks_json, analysis_file = args
+
+    # Re-runs reuse the stored analysis while the source document is unchanged
+    if '--force' not in sys.argv and os.path.exists(output_docx) and os.path.exists(codeblocks_json) \
+            and load_preflight(analysis_file, input_docx):
+        print(f"Preflight up to date, reusing {analysis_file}")
+        sys.exit(0)
+
+    analysis = preflight(input_docx, output_docx, codeblocks_json, analysis_file)
+
+    print(f"Modified Document saved in {output_docx}")
+    print(f"Extracted code blocks saved in {codeblocks_json}")
+    print(f"Remapped {analysis['symbols_remapped']} symbol characters, "
+          f"{sum(s['count'] for s in analysis['symbols_unmapped'])} could not be remapped")
+    print(f"{analysis['paragraphs']} paragraphs, {len(analysis['headings'])} headings, "
+          f"{analysis['tables']} tables, {analysis['images']} images, {len(analysis['code_blocks'])} code blocks")
+    print(f"Analysis saved in {analysis_file}")
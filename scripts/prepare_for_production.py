@@ -5,13 +5,498 @@ import sys
 import os
 import shutil
 import glob
+import time
+import sqlite3
+import gzip
+import json
+import hashlib
 import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 
-def prepare_for_production(input_file, production_dir):
+# Tables of the optional production database (one row per document, section and media file,
+# plus an FTS5 index of the section texts whose rowid is the id of the section)
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    markdown TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    document TEXT NOT NULL REFERENCES documents(name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    anchor TEXT NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sections_by_anchor ON sections(document, anchor);
+CREATE TABLE IF NOT EXISTS media (
+    document TEXT NOT NULL REFERENCES documents(name) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    PRIMARY KEY (document, name)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS section_text USING fts5(document, title, body, tokenize = 'unicode61');
+"""
+
+# Written at the root of the production directory after every run, and not listed in the manifest
+MANIFEST_FILE = "manifest.json"
+MANIFEST_DIFF_FILE = "manifest_diff.json"
+CHANGED_LIST_FILE = "changed_files.txt"
+
+# Text assets served with precompressed siblings (<file>.gz, .br with brotli, .zst with zstandard)
+PRECOMPRESS_EXTENSIONS = ('.md', '.svg', '.html')
+PRECOMPRESSED_SUFFIXES = ('.gz', '.br', '.zst')
+PRECOMPRESS_MIN_SIZE = int(os.environ.get('PRECOMPRESS_MIN_SIZE', 1024))
+
+def remove_siblings(path):
+    """Remove the precompressed siblings of a production file that is replaced or removed."""
+    for suffix in PRECOMPRESSED_SUFFIXES:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(f"{path}{suffix}")
+
+def write_text(path, content):
+    """
+    Write a production file, leaving it untouched when it already holds this content (its
+    precompressed siblings stay valid); otherwise the siblings are removed with the old content.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            if file.read() == content:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    remove_siblings(path)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    return True
+
+def link_or_copy(source_file, dest_file):
+    """Hard-link a media file into production, copying only when linking is not possible."""
+    if os.path.exists(dest_file):
+        if os.path.samefile(source_file, dest_file):
+            return
+        os.remove(dest_file)
+    remove_siblings(dest_file)
+    try:
+        os.link(source_file, dest_file)
+    except OSError:
+        # Different filesystem or no hard link support
+        shutil.copy2(source_file, dest_file)
+
+def heading_anchor(title, used):
+    """GitHub-style anchor of a heading, with -1, -2... suffixes for repeated titles."""
+    anchor = re.sub(r'[^\w\- ]', '', title.strip().lower()).replace(' ', '-')
+    count = used.get(anchor, 0)
+    used[anchor] = count + 1
+    return f"{anchor}-{count}" if count else anchor
+
+def split_sections(content):
+    """
+    Heading outline of a markdown document: a list of (level, title, anchor, line, body),
+    the text before the first heading being a level 0 section. Fenced code is not scanned for headings.
+    """
+    sections = [[0, '', '', 1, []]]
+    used = {}
+    in_fence = False
+    for number, line in enumerate(content.split('\n'), 1):
+        if line.lstrip().startswith('```'):
+            in_fence = not in_fence
+        match = None if in_fence else re.match(r'^(#{1,6})\s+(.*?)\s*#*\s*$', line)
+        if match:
+            title = match.group(2)
+            sections.append([len(match.group(1)), title, heading_anchor(title, used), number, []])
+        else:
+            sections[-1][4].append(line)
+    return [(level, title, anchor, line, '\n'.join(body).strip())
+            for level, title, anchor, line, body in sections
+            if level or ''.join(body).strip()]
+
+def open_database(database_file):
+    """Open (and create when needed) the production database."""
+    directory = os.path.dirname(database_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(database_file)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    try:
+        connection.executescript(DATABASE_SCHEMA)
+    except sqlite3.OperationalError as e:
+        connection.close()
+        raise RuntimeError(f"SQLite of this Python has no FTS5 support: {e}")
+    return connection
+
+def remove_from_database(connection, name):
+    """Delete a document, its sections, media rows and search index entries."""
+    connection.execute("DELETE FROM section_text WHERE rowid IN (SELECT id FROM sections WHERE document = ?)", (name,))
+    connection.execute("DELETE FROM documents WHERE name = ?", (name,))
+
+def prune_database(database_file, names):
+    """Delete the documents of the database that are not in names (their final markdown is gone)."""
+    connection = open_database(database_file)
+    try:
+        stored = [row[0] for row in connection.execute("SELECT name FROM documents")]
+        removed = sorted(name for name in stored if name not in names)
+        with connection:
+            for name in removed:
+                remove_from_database(connection, name)
+    finally:
+        connection.close()
+    for name in removed:
+        print(f"Removed {name} from {database_file}: no final markdown any more")
+    return removed
+
+def store_document(database_file, name, content, prod_md_file, media_prod_dir):
+    """
+    Write one document to the production database, replacing its previous version in a single
+    transaction. Documents whose markdown did not change are left as they are.
+    """
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    connection = open_database(database_file)
+    try:
+        row = connection.execute("SELECT sha256 FROM documents WHERE name = ?", (name,)).fetchone()
+        if row and row[0] == digest:
+            print(f"Database already up to date for {name}")
+            return False
+        with connection:
+            remove_from_database(connection, name)
+            connection.execute("INSERT INTO documents (name, path, sha256, markdown, updated) VALUES (?, ?, ?, ?, ?)",
+                               (name, prod_md_file, digest, content, time.strftime("%Y-%m-%dT%H:%M:%S")))
+            sections = split_sections(content)
+            for position, (level, title, anchor, line, body) in enumerate(sections):
+                cursor = connection.execute(
+                    "INSERT INTO sections (document, position, level, title, anchor, line) VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, position, level, title, anchor, line))
+                connection.execute("INSERT INTO section_text (rowid, document, title, body) VALUES (?, ?, ?, ?)",
+                                   (cursor.lastrowid, name, title, body))
+            media = []
+            if os.path.isdir(media_prod_dir):
+                for media_name in sorted(os.listdir(media_prod_dir)):
+                    media_file = os.path.join(media_prod_dir, media_name)
+                    if os.path.isfile(media_file):
+                        media.append((name, media_name, media_file, os.path.getsize(media_file)))
+            connection.executemany("INSERT INTO media (document, name, path, bytes) VALUES (?, ?, ?, ?)", media)
+        print(f"Stored {name} in {database_file}: {len(sections)} sections, {len(media)} media files")
+        return True
+    finally:
+        connection.close()
+
+def search_database(database_file, query, limit=20):
+    """Sections matching an FTS5 query, best first: (document, title, anchor, snippet)."""
+    connection = open_database(database_file)
+    try:
+        return connection.execute(
+            "SELECT sections.document, sections.title, sections.anchor,"
+            " snippet(section_text, 2, '[', ']', '...', 12)"
+            " FROM section_text JOIN sections ON sections.id = section_text.rowid"
+            " WHERE section_text MATCH ? ORDER BY rank LIMIT ?", (query, limit)).fetchall()
+    finally:
+        connection.close()
+
+def find_section(database_file, name, anchor):
+    """Markdown of one section (heading included) looked up by its anchor, or None."""
+    connection = open_database(database_file)
+    try:
+        row = connection.execute(
+            "SELECT sections.level, sections.title, section_text.body FROM sections"
+            " JOIN section_text ON section_text.rowid = sections.id"
+            " WHERE sections.document = ? AND sections.anchor = ?", (name, anchor)).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+    level, title, body = row
+    return f"{'#' * level} {title}\n\n{body}" if level else body
+
+# Heading lines, the document's own table of contents and the in-document links to rewrite
+HEADING_LINE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+TOC_TITLE = re.compile(r'^\W*(table\s+of\s+)?contents?\W*$', re.IGNORECASE)
+TOC_ENTRY = re.compile(r'^\s*(?:[*+-]|\d+\.)?\s*\[.*\]\(#[^)]*\)\s*$')
+ANCHOR_LINK = re.compile(r'(\]\(|href=["\'])#([^)"\'\s]+)')
+EXPLICIT_ID = re.compile(r'\{#([^}\s]+)[^}]*\}|\b(?:id|name)=["\']([^"\']+)["\']')
+
+def pandoc_identifier(title):
+    """Identifier pandoc gives a heading (everything before the first letter is dropped)."""
+    text = re.sub(r'<[^>]+>|\{#[^}]*\}|[*_`\[\]]', '', title).lower()
+    text = re.sub(r'^[^a-z]+', '', text)
+    return re.sub(r'[^\w\-. ]', '', text).strip().replace(' ', '-')
+
+def split_document(content, depth):
+    """
+    Cut a markdown document before every heading of its first depth levels (the top level being
+    the highest heading level used). Returns (preamble lines, [(level, title, lines, headings)]),
+    headings being the (level, title) of every heading inside a section, or None without headings.
+    """
+    lines = content.split('\n')
+    headings = []
+    in_fence = False
+    for number, line in enumerate(lines):
+        if line.lstrip().startswith('```'):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_LINE.match(line)
+        if match:
+            headings.append((number, len(match.group(1)), match.group(2)))
+    levels = [level for _, level, title in headings if not TOC_TITLE.match(title)]
+    if not levels:
+        return None
+    top = min(levels)
+    cuts = [(number, level, title) for number, level, title in headings
+            if level < top + depth or TOC_TITLE.match(title)]
+    sections = []
+    for index, (number, level, title) in enumerate(cuts):
+        end = cuts[index + 1][0] if index + 1 < len(cuts) else len(lines)
+        inner = [(l, t) for n, l, t in headings if number <= n < end]
+        sections.append((level, title, lines[number:end], inner))
+    return lines[:cuts[0][0]], sections
+
+def write_split_document(content, doc_prod_dir, clean_name, depth):
+    """
+    Write a document as one markdown file per section (NNN_<anchor>.md) next to its media folder,
+    and <doc>.md as an index: the text before the first heading and a table of contents linking to
+    the section files. Links to anchors of another section are pointed at that section's file.
+    Returns the written files, or None when the document has no headings.
+    """
+    split = split_document(content, depth)
+    if split is None:
+        return None
+    preamble, sections = split
+    index_name = f"{clean_name}.md"
+
+    used = {}
+    targets = {}
+    files = []
+    entries = []
+    trailing = []
+    top = min(level for level, title, _, _ in sections if not TOC_TITLE.match(title))
+    for level, title, lines, inner in sections:
+        toc = TOC_TITLE.match(title)
+        stem = heading_anchor(re.sub(r'\s*\{#[^}]*\}', '', title), {}) or 'section'
+        file_name = index_name if toc else f"{len(files) + 1:03d}_{stem}.md"
+        # Every id a link may use for a heading or an element of this section
+        for position, (heading_level, heading_title) in enumerate(inner):
+            explicit = re.search(r'\{#([^}\s]+)', heading_title)
+            identifier = explicit.group(1) if explicit else pandoc_identifier(heading_title)
+            anchor = heading_anchor(heading_title, used)
+            for name in (identifier, anchor):
+                targets.setdefault(name, file_name)
+            if not toc and heading_level <= top + depth:
+                link = file_name if position == 0 else f"{file_name}#{identifier or anchor}"
+                entries.append((heading_level, heading_title, link))
+        for match in EXPLICIT_ID.finditer('\n'.join(lines)):
+            targets.setdefault(match.group(1) or match.group(2), file_name)
+        if toc:
+            # The index gets a new table of contents, text following the old one is kept after it
+            trailing.extend(line for line in lines[1:] if not TOC_ENTRY.match(line))
+        else:
+            files.append((file_name, lines))
+
+    def relink(text, file_name):
+        def replace(match):
+            target = targets.get(match.group(2))
+            if target is None or target == file_name:
+                return match.group(0)
+            return f"{match.group(1)}{target}#{match.group(2)}"
+        return ANCHOR_LINK.sub(replace, text)
+
+    written = []
+    for file_name, lines in files:
+        section_file = os.path.join(doc_prod_dir, file_name)
+        write_text(section_file, relink('\n'.join(lines).strip() + '\n', file_name))
+        written.append(section_file)
+
+    toc_lines = ["## Table of Contents", ""]
+    for level, title, link in entries:
+        text = re.sub(r'\s*\{#[^}]*\}', '', title)
+        toc_lines.append(f"{'  ' * (level - top)}* [{text}]({link})")
+    index_file = os.path.join(doc_prod_dir, index_name)
+    index = '\n'.join(preamble).strip() + '\n\n' + '\n'.join(toc_lines) + '\n'
+    if '\n'.join(trailing).strip():
+        index += '\n' + '\n'.join(trailing).strip() + '\n'
+    write_text(index_file, relink(index, index_name))
+    print(f"Split into {len(written)} section files (depth {depth}), index: {index_file}")
+    return [index_file] + written
+
+def file_sha256(file_path):
+    """Return the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def source_hash(input_dir, document):
+    """SHA-256 of the docx a document was converted from, as recorded by its preflight analysis."""
+    try:
+        with open(os.path.join(input_dir, f"{document}_preflight.json"), 'r', encoding='utf-8') as f:
+            return json.load(f).get("source_sha256")
+    except (OSError, ValueError):
+        return None
+
+def load_manifest(production_dir):
+    """Manifest written by the previous run, or an empty one."""
+    try:
+        with open(os.path.join(production_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+def cached_sha256(path, stat, entry):
+    """SHA-256 of a file, taken from its manifest entry when its size and modification time did not change."""
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+    return file_sha256(path)
+
+def etag(digest):
+    """ETag derived from the content only, so it stays the same across runs and servers."""
+    return f'"{digest[:32]}"'
+
+def compression_formats():
+    """Suffixes of the precompressed siblings this Python can write (gzip always, brotli and zstd when installed)."""
+    formats = ['.gz']
+    try:
+        import brotli
+        formats.append('.br')
+    except ImportError:
+        print("brotli not installed. Skipping .br files.")
+    try:
+        import zstandard
+        formats.append('.zst')
+    except ImportError:
+        print("zstandard not installed. Skipping .zst files.")
+    return formats
+
+def compress_file(path, formats):
+    """Write the precompressed siblings of one file (atomically, with its modification time). Returns their sizes."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    sizes = {}
+    for suffix in formats:
+        if suffix == '.gz':
+            # No timestamp in the header: the same content always gives the same bytes
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        elif suffix == '.br':
+            import brotli
+            compressed = brotli.compress(data, quality=11)
+        else:
+            import zstandard
+            compressed = zstandard.ZstdCompressor(level=19).compress(data)
+        temp_file = f"{path}{suffix}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(compressed)
+        shutil.copystat(path, temp_file)
+        os.replace(temp_file, f"{path}{suffix}")
+        sizes[suffix] = len(compressed)
+    return path, len(data), sizes
+
+def precompress(production_dir, min_size=PRECOMPRESS_MIN_SIZE, jobs=None):
+    """
+    Write gzip (and brotli / zstd) siblings of the .md, .svg and .html files of at least min_size bytes,
+    for servers that send precompressed files as they are (nginx gzip_static / brotli_static).
+    Files whose hash is the one of the previous manifest and whose siblings exist are not compressed again,
+    and siblings of files that were removed or became too small are deleted. Compression runs on jobs processes.
+    """
+    formats = compression_formats()
+    old_files = load_manifest(production_dir).get("files", {})
+    pending = []
+    skipped = removed = 0
+    for root, dirs, names in os.walk(production_dir):
+        for file_name in names:
+            path = os.path.join(root, file_name)
+            base, suffix = os.path.splitext(path)
+            if suffix in PRECOMPRESSED_SUFFIXES:
+                if base.endswith(PRECOMPRESS_EXTENSIONS) and \
+                        (not os.path.isfile(base) or os.path.getsize(base) < min_size or suffix not in formats):
+                    os.remove(path)
+                    removed += 1
+                continue
+            if not file_name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            stat = os.stat(path)
+            if stat.st_size < min_size:
+                continue
+            entry = old_files.get(os.path.relpath(path, production_dir).replace(os.sep, '/'), {})
+            if entry and all(os.path.exists(f"{path}{s}") for s in formats) \
+                    and cached_sha256(path, stat, entry) == entry["sha256"]:
+                # Same content: the siblings only take the modification time of the rewritten file
+                for s in formats:
+                    os.utime(f"{path}{s}", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                skipped += 1
+                continue
+            pending.append(path)
+
+    original = compressed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for path, size, sizes in executor.map(compress_file, pending, [formats] * len(pending)):
+                original += size
+                compressed += sizes['.gz']
+    print(f"Precompressed {len(pending)} files ({', '.join(formats)}), {skipped} unchanged, "
+          f"{removed} stale siblings removed" + (f", gzip {original} -> {compressed} bytes" if pending else ""))
+    return len(pending)
+
+def write_manifest(production_dir, input_dir="output"):
+    """
+    List every file of the production directory with its size, SHA-256 and the hash of its source
+    docx in manifest.json, and compare it with the previous manifest: manifest_diff.json holds the
+    added, changed and removed files, and changed_files.txt the files to transfer (rsync --files-from).
+    Files whose size and modification time did not change keep their previous hash.
+    """
+    previous = load_manifest(production_dir)
+    old_files = previous.get("files", {})
+
+    files = {}
+    sources = {}
+    for root, dirs, names in os.walk(production_dir):
+        dirs.sort()
+        for file_name in sorted(names):
+            path = os.path.join(root, file_name)
+            relative = os.path.relpath(path, production_dir).replace(os.sep, '/')
+            if relative in (MANIFEST_FILE, MANIFEST_DIFF_FILE, CHANGED_LIST_FILE) or relative.endswith('.tmp'):
+                continue
+            stat = os.stat(path)
+            digest = cached_sha256(path, stat, old_files.get(relative, {}))
+            document = relative.split('/')[0] if '/' in relative else None
+            if document and document not in sources:
+                sources[document] = source_hash(input_dir, document)
+            files[relative] = {"size": stat.st_size, "sha256": digest, "etag": etag(digest),
+                               "mtime_ns": stat.st_mtime_ns, "document": document,
+                               "source_sha256": sources.get(document)}
+
+    diff = {
+        "previous": previous.get("generated"),
+        "added": sorted(path for path in files if path not in old_files),
+        "changed": sorted(path for path in files
+                          if path in old_files and old_files[path].get("sha256") != files[path]["sha256"]),
+        "removed": sorted(path for path in old_files if path not in files),
+    }
+    generated = time.strftime("%Y-%m-%dT%H:%M:%S")
+    diff["generated"] = generated
+    for target, data in ((MANIFEST_FILE, {"generated": generated, "files": files}), (MANIFEST_DIFF_FILE, diff)):
+        temp_file = os.path.join(production_dir, f"{target}.tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_file, os.path.join(production_dir, target))
+    with open(os.path.join(production_dir, CHANGED_LIST_FILE), 'w', encoding='utf-8') as f:
+        f.writelines(f"{path}\n" for path in diff["added"] + diff["changed"])
+
+    print(f"Manifest of {len(files)} files: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['removed'])} removed (see {os.path.join(production_dir, MANIFEST_DIFF_FILE)})")
+    return diff
+
+def prepare_for_production(input_file, production_dir, database_file=None, split_depth=0):
     """
     Prepare a final markdown file for production by:
     1. Changing image paths to point to a local media folder
     2. Copying the file and its images to the production directory
+    3. With database_file, storing its markdown, heading outline and media list in that SQLite database
+    4. With split_depth, writing one file per section of the first split_depth heading levels, <doc>.md being their index
+    Returns the name the document was published (and stored) under, which can be the one of its media directory.
     """
     # Get the base name of the document (without path and extension)
     base_name = os.path.basename(input_file)
@@ -78,10 +563,19 @@ def prepare_for_production(input_file, production_dir):
     
     print(f"Fixed image references: Markdown: {fixed_md}, HTML: {fixed_html}")
     
-    # Write the updated content to the production file
+    # Write the updated content to the production file, or to one file per section.
+    # Files whose content did not change are left as they are, with their precompressed siblings
     prod_md_file = os.path.join(doc_prod_dir, f"{clean_name}.md")
-    with open(prod_md_file, 'w', encoding='utf-8') as file:
-        file.write(content)
+    old_sections = set(glob.glob(os.path.join(doc_prod_dir, "[0-9][0-9][0-9]_*.md")))
+    written = write_split_document(content, doc_prod_dir, clean_name, split_depth) if split_depth else None
+    if written is None:
+        if split_depth:
+            print(f"WARNING: No headings to split {clean_name} at, writing a single file")
+        write_text(prod_md_file, content)
+    # Section files of a previous split never outlive it, whether this run splits the document again or not
+    for old_file in old_sections - set(written or []):
+        os.remove(old_file)
+        remove_siblings(old_file)
     
     # Copy all media files to the production media directory
     if os.path.exists(source_media_dir):
@@ -98,7 +592,7 @@ def prepare_for_production(input_file, production_dir):
             for media_file in media_files:
                 dest_file = os.path.join(media_prod_dir, os.path.basename(media_file))
                 print(f"Copying: {media_file} -> {dest_file}")
-                shutil.copy2(media_file, dest_file)
+                link_or_copy(media_file, dest_file)
             
             print(f"Copied {len(media_files)} media files to {media_prod_dir}")
         except Exception as e:
@@ -107,10 +601,16 @@ def prepare_for_production(input_file, production_dir):
         print(f"ERROR: Media directory not found: {source_media_dir}")
     
     print(f"Production file created: {prod_md_file}")
-    return True
 
-def process_directory(input_dir, production_dir):
-    """Process all final markdown files in a directory."""
+    if database_file:
+        store_document(database_file, clean_name, content, prod_md_file, media_prod_dir)
+    return clean_name
+
+def process_directory(input_dir, production_dir, database_file=None, split_depth=0):
+    """
+    Process all final markdown files in a directory. With database_file, the documents of the
+    database that no longer have a final markdown there are deleted from it.
+    """
     success_count = 0
     failure_count = 0
     
@@ -123,18 +623,27 @@ def process_directory(input_dir, production_dir):
     
     print(f"Found {len(final_files)} final markdown files to process")
     
+    # Names the documents are stored under, and the ones that failed keep their previous version
+    kept_names = set()
     for final_file in final_files:
         try:
-            if prepare_for_production(final_file, production_dir):
-                success_count += 1
-            else:
-                failure_count += 1
+            stored_name = prepare_for_production(final_file, production_dir, database_file, split_depth)
         except Exception as e:
             print(f"Error processing {final_file}: {str(e)}")
+            stored_name = None
+        if stored_name:
+            success_count += 1
+            kept_names.add(stored_name)
+        else:
             failure_count += 1
+            kept_names.add(os.path.basename(final_file)[:-len('_final.md')])
     
     print(f"Processed {success_count + failure_count} files")
     print(f"Success: {success_count}, Failures: {failure_count}")
+
+    # Documents removed from the input stop being returned by searches
+    if database_file:
+        prune_database(database_file, kept_names)
     
     return success_count, failure_count
 
@@ -143,17 +652,54 @@ if __name__ == "__main__":
     parser.add_argument('--input', '-i', default='output', help='Input directory containing final markdown files')
     parser.add_argument('--output', '-o', default='production', help='Output production directory')
     parser.add_argument('--file', '-f', help='Process a single file instead of a directory')
+    parser.add_argument('--database', '-d', help='Also store the documents in this SQLite database (full-text search)')
+    parser.add_argument('--search', '-q', help='Search the database (FTS5 query, e.g. "7609 AND chassis") and exit')
+    parser.add_argument('--split-depth', '-s', type=int, default=0, metavar='N',
+                        help='Write one file per section of the first N heading levels plus an index (1 = top-level sections)')
+    parser.add_argument('--precompress', '-z', action='store_true',
+                        help='Also write .gz (and .br / .zst when brotli / zstandard are installed) siblings of text files')
+    parser.add_argument('--min-size', type=int, default=PRECOMPRESS_MIN_SIZE,
+                        help='Smallest file, in bytes, that gets precompressed siblings')
+    parser.add_argument('--jobs', '-j', type=int, help='Files compressed at the same time (default: CPU count)')
+    parser.add_argument('--section', nargs=2, metavar=('DOC', 'ANCHOR'), help='Print one section from the database and exit')
     
     args = parser.parse_args()
+
+    if args.search or args.section:
+        if not args.database or not os.path.exists(args.database):
+            print("An existing --database is required to search")
+            sys.exit(1)
+        if args.search:
+            try:
+                results = search_database(args.database, args.search)
+            except sqlite3.OperationalError as e:
+                print(f"Invalid search query: {e}")
+                sys.exit(1)
+            for document, title, anchor, snippet in results:
+                print(f"{document}#{anchor}  {title}")
+                print(f"    {' '.join(snippet.split())}")
+        else:
+            section = find_section(args.database, *args.section)
+            if section is None:
+                print(f"Section not found: {args.section[0]}#{args.section[1]}")
+                sys.exit(1)
+            print(section)
+        sys.exit(0)
     
     # Create production directory if it doesn't exist
     os.makedirs(args.output, exist_ok=True)
     
     if args.file:
         if os.path.isfile(args.file) and args.file.endswith('.md'):
-            prepare_for_production(args.file, args.output)
+            prepare_for_production(args.file, args.output, args.database, args.split_depth)
         else:
             print(f"Invalid file: {args.file}")
             sys.exit(1)
     else:
-        process_directory(args.input, args.output)
+        process_directory(args.input, args.output, args.database, args.split_depth)
+
+    if args.precompress:
+        precompress(args.output, args.min_size, args.jobs)
+
+    # What the publishing step has to transfer
+    write_manifest(args.output, os.path.dirname(args.file) if args.file else args.input)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import pstats
+import cProfile
+import fnmatch
+import linecache
+import tracemalloc
+from contextlib import contextmanager
+
+class StepProfiler:
+    """
+    Profile each pipeline step of selected documents with cProfile, and optionally tracemalloc.
+    Files are written to <profile_dir>/<document>/: NN_<step>.pstats (open with pstats or snakeviz),
+    NN_<step>.txt (top functions by cumulative time) and NN_<step>_alloc.txt (top allocation sites).
+    """
+
+    def __init__(self, profile_dir, document, patterns=None, memory=False, top=30):
+        self.enabled = bool(profile_dir) and (not patterns or any(fnmatch.fnmatch(document, p) for p in patterns))
+        self.output_dir = os.path.join(profile_dir, document) if self.enabled else None
+        self.memory = memory
+        self.top = top
+        self.count = 0
+
+    @contextmanager
+    def step(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.count += 1
+        prefix = os.path.join(self.output_dir, f"{self.count:02d}_{name}")
+
+        started_tracemalloc = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            started_tracemalloc = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{prefix}.pstats")
+
+            report = io.StringIO()
+            stats = pstats.Stats(profiler, stream=report)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            stats.sort_stats("tottime").print_stats(self.top)
+            with open(f"{prefix}.txt", "w", encoding="utf-8") as f:
+                f.write(report.getvalue())
+
+            if started_tracemalloc:
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.write_allocations(f"{prefix}_alloc.txt", snapshot, peak)
+
+    def write_allocations(self, report_file, snapshot, peak):
+        """Top allocation sites still alive at the end of the step, and the traced peak."""
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        with open(report_file, "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MB\n\n")
+            for index, stat in enumerate(snapshot.statistics("lineno")[:self.top], 1):
+                frame = stat.traceback[0]
+                f.write(f"#{index}: {frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KB in {stat.count} blocks\n")
+                line = linecache.getline(frame.filename, frame.lineno).strip()
+                if line:
+                    f.write(f"    {line}\n")
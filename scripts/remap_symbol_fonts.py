@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import shutil
+import zipfile
+from lxml import etree
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# Parts whose runs are remapped
+TEXT_PART_PATTERN = re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes|comments)\.xml$')
+
+# Word stores symbol-font characters in the private-use area, at 0xF000 + the font code
+PRIVATE_USE = re.compile('[\ue000-\uf8ff]')
+
+# Symbol font (Adobe Symbol encoding) -> Unicode
+SYMBOL = {
+    0x20: ' ', 0x21: '!', 0x22: '∀', 0x23: '#', 0x24: '∃', 0x25: '%', 0x26: '&', 0x27: '∋',
+    0x28: '(', 0x29: ')', 0x2A: '∗', 0x2B: '+', 0x2C: ',', 0x2D: '−', 0x2E: '.', 0x2F: '/',
+    0x30: '0', 0x31: '1', 0x32: '2', 0x33: '3', 0x34: '4', 0x35: '5', 0x36: '6', 0x37: '7',
+    0x38: '8', 0x39: '9', 0x3A: ':', 0x3B: ';', 0x3C: '<', 0x3D: '=', 0x3E: '>', 0x3F: '?',
+    0x40: '≅', 0x41: 'Α', 0x42: 'Β', 0x43: 'Χ', 0x44: 'Δ', 0x45: 'Ε', 0x46: 'Φ', 0x47: 'Γ',
+    0x48: 'Η', 0x49: 'Ι', 0x4A: 'ϑ', 0x4B: 'Κ', 0x4C: 'Λ', 0x4D: 'Μ', 0x4E: 'Ν', 0x4F: 'Ο',
+    0x50: 'Π', 0x51: 'Θ', 0x52: 'Ρ', 0x53: 'Σ', 0x54: 'Τ', 0x55: 'Υ', 0x56: 'ς', 0x57: 'Ω',
+    0x58: 'Ξ', 0x59: 'Ψ', 0x5A: 'Ζ', 0x5B: '[', 0x5C: '∴', 0x5D: ']', 0x5E: '⊥', 0x5F: '_',
+    0x60: '‾', 0x61: 'α', 0x62: 'β', 0x63: 'χ', 0x64: 'δ', 0x65: 'ε', 0x66: 'φ', 0x67: 'γ',
+    0x68: 'η', 0x69: 'ι', 0x6A: 'ϕ', 0x6B: 'κ', 0x6C: 'λ', 0x6D: 'μ', 0x6E: 'ν', 0x6F: 'ο',
+    0x70: 'π', 0x71: 'θ', 0x72: 'ρ', 0x73: 'σ', 0x74: 'τ', 0x75: 'υ', 0x76: 'ϖ', 0x77: 'ω',
+    0x78: 'ξ', 0x79: 'ψ', 0x7A: 'ζ', 0x7B: '{', 0x7C: '|', 0x7D: '}', 0x7E: '∼',
+    0xA0: '€', 0xA1: 'ϒ', 0xA2: '′', 0xA3: '≤', 0xA4: '⁄', 0xA5: '∞', 0xA6: 'ƒ', 0xA7: '♣',
+    0xA8: '♦', 0xA9: '♥', 0xAA: '♠', 0xAB: '↔', 0xAC: '←', 0xAD: '↑', 0xAE: '→', 0xAF: '↓',
+    0xB0: '°', 0xB1: '±', 0xB2: '″', 0xB3: '≥', 0xB4: '×', 0xB5: '∝', 0xB6: '∂', 0xB7: '•',
+    0xB8: '÷', 0xB9: '≠', 0xBA: '≡', 0xBB: '≈', 0xBC: '…', 0xBD: '⏐', 0xBE: '⎯', 0xBF: '↵',
+    0xC0: 'ℵ', 0xC1: 'ℑ', 0xC2: 'ℜ', 0xC3: '℘', 0xC4: '⊗', 0xC5: '⊕', 0xC6: '∅', 0xC7: '∩',
+    0xC8: '∪', 0xC9: '⊃', 0xCA: '⊇', 0xCB: '⊄', 0xCC: '⊂', 0xCD: '⊆', 0xCE: '∈', 0xCF: '∉',
+    0xD0: '∠', 0xD1: '∇', 0xD2: '®', 0xD3: '©', 0xD4: '™', 0xD5: '∏', 0xD6: '√', 0xD7: '⋅',
+    0xD8: '¬', 0xD9: '∧', 0xDA: '∨', 0xDB: '⇔', 0xDC: '⇐', 0xDD: '⇑', 0xDE: '⇒', 0xDF: '⇓',
+    0xE0: '◊', 0xE1: '〈', 0xE2: '®', 0xE3: '©', 0xE4: '™', 0xE5: '∑', 0xE6: '⎛', 0xE7: '⎜',
+    0xE8: '⎝', 0xE9: '⎡', 0xEA: '⎢', 0xEB: '⎣', 0xEC: '⎧', 0xED: '⎨', 0xEE: '⎩', 0xEF: '⎪',
+    0xF1: '〉', 0xF2: '∫', 0xF3: '⌠', 0xF4: '⎮', 0xF5: '⌡', 0xF6: '⎞', 0xF7: '⎟', 0xF8: '⎠',
+    0xF9: '⎤', 0xFA: '⎥', 0xFB: '⎦', 0xFC: '⎫', 0xFD: '⎬', 0xFE: '⎭',
+}
+
+# Wingdings -> Unicode (bullets, check marks, arrows and the other glyphs found in our documents)
+WINGDINGS = {
+    0x20: ' ', 0x21: '✏', 0x22: '✂', 0x23: '✁', 0x28: '☎', 0x29: '✆', 0x2A: '✉', 0x36: '⌛',
+    0x37: '⌨', 0x3E: '✇', 0x3F: '✍', 0x41: '✌', 0x45: '☜', 0x46: '☞', 0x47: '☝', 0x48: '☟',
+    0x4A: '☺', 0x4C: '☹', 0x4E: '☠', 0x52: '☼', 0x54: '❄', 0x56: '✞', 0x58: '✠', 0x59: '✡',
+    0x5A: '☪', 0x5B: '☯', 0x5C: 'ॐ', 0x5D: '☸',
+    0x5E: '♈', 0x5F: '♉', 0x60: '♊', 0x61: '♋', 0x62: '♌', 0x63: '♍', 0x64: '♎', 0x65: '♏',
+    0x66: '♐', 0x67: '♑', 0x68: '♒', 0x69: '♓',
+    0x6C: '●', 0x6D: '❍', 0x6E: '■', 0x6F: '□', 0x71: '❑', 0x72: '❒', 0x73: '⬧', 0x74: '⧫',
+    0x75: '◆', 0x76: '❖', 0x77: '⬥', 0x78: '⌧', 0x7A: '⌘', 0x7B: '❀', 0x7C: '✿', 0x7D: '❝',
+    0x7E: '❞',
+    0x80: '⓪', 0x81: '①', 0x82: '②', 0x83: '③', 0x84: '④', 0x85: '⑤', 0x86: '⑥', 0x87: '⑦',
+    0x88: '⑧', 0x89: '⑨', 0x8A: '⑩', 0x8B: '⓿', 0x8C: '❶', 0x8D: '❷', 0x8E: '❸', 0x8F: '❹',
+    0x90: '❺', 0x91: '❻', 0x92: '❼', 0x93: '❽', 0x94: '❾', 0x95: '❿',
+    0x9E: '·', 0x9F: '•', 0xA0: '▪', 0xA1: '○', 0xA4: '◉', 0xA5: '◎', 0xA7: '▪', 0xA8: '◻',
+    0xAA: '✦', 0xAB: '★', 0xAC: '✶', 0xAD: '✴', 0xAE: '✹', 0xAF: '✵', 0xB1: '⌖', 0xB2: '⟡',
+    0xB3: '⌑', 0xD5: '⌫', 0xD6: '⌦', 0xD8: '➢', 0xE8: '➔', 0xEF: '⇦', 0xF0: '⇨', 0xF1: '⇧',
+    0xF2: '⇩', 0xF3: '⬄', 0xF4: '⇳', 0xFB: '✘', 0xFC: '✔', 0xFD: '☒', 0xFE: '☑',
+}
+
+WINGDINGS_2 = {
+    0x4F: '✗', 0x50: '✓', 0x52: '☑', 0x53: '☒', 0x97: '•',
+}
+
+WINGDINGS_3 = {
+    0x70: '▲', 0x71: '▼', 0x74: '◄', 0x75: '►',
+}
+
+WEBDINGS = {
+    0x33: '◀', 0x34: '▶', 0x35: '▲', 0x36: '▼', 0x61: '✓', 0x72: '✗',
+}
+
+SYMBOL_FONT_MAPS = {
+    "symbol": SYMBOL,
+    "wingdings": WINGDINGS,
+    "wingdings 2": WINGDINGS_2,
+    "wingdings 3": WINGDINGS_3,
+    "webdings": WEBDINGS,
+}
+
+def run_font(run):
+    """Return the font declared on a run (w:rFonts), or None."""
+    rpr = run.find(f"{W_NS}rPr")
+    if rpr is None:
+        return None
+    fonts = rpr.find(f"{W_NS}rFonts")
+    if fonts is None:
+        return None
+    for attr in ("ascii", "hAnsi", "cs", "eastAsia"):
+        value = fonts.get(f"{W_NS}{attr}")
+        if value and value.lower() in SYMBOL_FONT_MAPS:
+            return value
+    return fonts.get(f"{W_NS}ascii") or fonts.get(f"{W_NS}hAnsi")
+
+def map_symbol_char(char, font):
+    """Map a symbol-font character to Unicode, or return None."""
+    if not font:
+        return None
+    table = SYMBOL_FONT_MAPS.get(font.lower())
+    if table is None:
+        return None
+    code = ord(char)
+    if 0xF000 <= code <= 0xF0FF:
+        code -= 0xF000
+    return table.get(code)
+
+def remap_symbols(root, unmapped=None):
+    """
+    Replace symbol-font private-use characters of every run under root by real Unicode.
+    w:sym elements are turned into plain w:t text.
+    Characters that cannot be mapped are left in place and counted in unmapped,
+    keyed by (character, font).
+    Returns the number of characters remapped.
+    """
+    if unmapped is None:
+        unmapped = {}
+    remapped = 0
+
+    def replace(match, font):
+        nonlocal remapped
+        mapped = map_symbol_char(match.group(), font)
+        if mapped is None:
+            key = (match.group(), font or "")
+            unmapped[key] = unmapped.get(key, 0) + 1
+            return match.group()
+        remapped += 1
+        return mapped
+
+    for run in root.iter(f"{W_NS}r"):
+        font = run_font(run)
+        for child in list(run):
+            if child.tag == f"{W_NS}t" and child.text and PRIVATE_USE.search(child.text):
+                child.text = PRIVATE_USE.sub(lambda m: replace(m, font), child.text)
+            elif child.tag == f"{W_NS}sym":
+                sym_font = child.get(f"{W_NS}font") or font
+                char_code = child.get(f"{W_NS}char")
+                try:
+                    char = chr(int(char_code, 16))
+                except (TypeError, ValueError):
+                    continue
+                mapped = map_symbol_char(char, sym_font)
+                if mapped is None:
+                    key = (char, sym_font or "")
+                    unmapped[key] = unmapped.get(key, 0) + 1
+                    continue
+                text = run.makeelement(f"{W_NS}t", {})
+                text.text = mapped
+                text.set(XML_SPACE, "preserve")
+                run.replace(child, text)
+                remapped += 1
+
+    return remapped
+
+def remap_docx(input_file, output_file):
+    """
+    Write a copy of a DOCX with symbol-font characters mapped to Unicode.
+    Returns (number of characters remapped, {(character, font): count} of unmapped ones).
+    """
+    unmapped = {}
+    remapped = 0
+    changed_parts = {}
+
+    with zipfile.ZipFile(input_file) as zin:
+        for name in zin.namelist():
+            if not TEXT_PART_PATTERN.match(name):
+                continue
+            with zin.open(name) as part:
+                tree = etree.parse(part)
+            count = remap_symbols(tree.getroot(), unmapped)
+            if count:
+                remapped += count
+                changed_parts[name] = etree.tostring(tree, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+        if not changed_parts:
+            if os.path.abspath(input_file) != os.path.abspath(output_file):
+                shutil.copy2(input_file, output_file)
+            return remapped, unmapped
+
+        temp_file = output_file + ".tmp"
+        with zipfile.ZipFile(temp_file, 'w') as zout:
+            for info in zin.infolist():
+                data = changed_parts.get(info.filename)
+                zout.writestr(info, data if data is not None else zin.read(info))
+
+    os.replace(temp_file, output_file)
+    return remapped, unmapped
+
+def print_unmapped(unmapped):
+    """Report the characters that could not be mapped."""
+    if not unmapped:
+        return
+    print(f"{sum(unmapped.values())} symbol characters could not be remapped:")
+    for (char, font), count in sorted(unmapped.items(), key=lambda x: x[1], reverse=True):
+        print(f"  - Character: '{repr(char)[1:-1]}' font: '{font or 'unknown'}' ({count} times)")
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python remap_symbol_fonts.py <input.docx> <output.docx> [unmapped_report.json]")
+        sys.exit(1)
+
+    remapped, unmapped = remap_docx(sys.argv[1], sys.argv[2])
+    print(f"Remapped {remapped} symbol characters: {sys.argv[1]} → {sys.argv[2]}")
+    print_unmapped(unmapped)
+
+    if len(sys.argv) == 4:
+        report = [
+            {"character": repr(char)[1:-1], "codepoint": f"U+{ord(char):04X}", "font": font, "count": count}
+            for (char, font), count in unmapped.items()
+        ]
+        with open(sys.argv[3], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
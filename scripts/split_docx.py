@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import zipfile
+from lxml import etree
+
+from extract_media import R_NS, REL_NS, read_image_relationships, rels_path_for
+from native_convert import W_NS, load_styles
+
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS = rels_path_for(DOCUMENT_PART)
+
+HEADING_1 = re.compile(r'^heading\s+1$', re.IGNORECASE)
+
+def top_level_headings(body, styles):
+    """Return the indexes of the body children that are Heading 1 paragraphs."""
+    heading_ids = {style_id for style_id, (name, _) in styles.items() if HEADING_1.match(name)}
+    indexes = []
+    for index, child in enumerate(body):
+        if child.tag != f"{W_NS}p":
+            continue
+        style = child.find(f"{W_NS}pPr/{W_NS}pStyle")
+        if style is not None and style.get(f"{W_NS}val") in heading_ids:
+            indexes.append(index)
+    return indexes
+
+def used_relationship_ids(elements):
+    """Relationship ids referenced by a list of body elements."""
+    used = set()
+    for element in elements:
+        for elem in element.iter():
+            for attr, value in elem.attrib.items():
+                if attr.startswith(R_NS):
+                    used.add(value)
+    return used
+
+def split_docx(input_docx, output_dir, min_parts=2):
+    """
+    Split a DOCX before every Heading 1 into self-contained part documents.
+
+    Every part keeps the styles, numbering, headers and the final section properties
+    of the original, and the same media names, so the parts convert to markdown that
+    can be concatenated. Pictures a part does not use are left out of it.
+    Returns the list of part files, or an empty list when there would be fewer than min_parts.
+    """
+    with zipfile.ZipFile(input_docx) as zip_ref:
+        with zip_ref.open(DOCUMENT_PART) as document:
+            tree = etree.parse(document)
+        root = tree.getroot()
+        body = root.find(f"{W_NS}body")
+        styles = load_styles(zip_ref)
+
+        children = list(body)
+        sect_pr = None
+        if children and children[-1].tag == f"{W_NS}sectPr":
+            sect_pr = children.pop()
+
+        starts = top_level_headings(children, styles)
+        if not starts or starts[0] != 0:
+            # Title page, TOC... before the first heading form the first part
+            starts = [0] + starts
+        if len(starts) < min_parts:
+            return []
+        bounds = list(zip(starts, starts[1:] + [len(children)]))
+
+        # Pictures of document.xml, and the ones other parts (headers, footnotes...) need anyway
+        document_images = read_image_relationships(zip_ref, DOCUMENT_PART)
+        shared_images = set()
+        for name in zip_ref.namelist():
+            if name.endswith(".rels") and name not in (DOCUMENT_RELS, "_rels/.rels"):
+                part_name = name.replace("_rels/", "")[:-len(".rels")]
+                shared_images.update(read_image_relationships(zip_ref, part_name).values())
+
+        with zip_ref.open(DOCUMENT_RELS) as rels_file:
+            rels_root = etree.parse(rels_file).getroot()
+
+        for child in children:
+            body.remove(child)
+        if sect_pr is not None:
+            body.remove(sect_pr)
+
+        os.makedirs(output_dir, exist_ok=True)
+        part_files = []
+        for number, (start, end) in enumerate(bounds):
+            elements = children[start:end]
+            used = used_relationship_ids(elements)
+            unused = {rel_id for rel_id in document_images if rel_id not in used}
+            kept_targets = {document_images[rel_id] for rel_id in used if rel_id in document_images}
+            skipped = {document_images[rel_id] for rel_id in unused} - kept_targets - shared_images
+
+            body.extend(elements)
+            if sect_pr is not None:
+                body.append(sect_pr)
+            document_xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+            for element in elements:
+                body.remove(element)
+            if sect_pr is not None:
+                body.remove(sect_pr)
+
+            # Drop the relationships of the pictures the part does not show
+            removed = []
+            for rel in rels_root.findall(f"{REL_NS}Relationship"):
+                if rel.get("Id") in unused:
+                    rels_root.remove(rel)
+                    removed.append(rel)
+            rels_xml = etree.tostring(rels_root, xml_declaration=True, encoding="UTF-8", standalone=True)
+            rels_root.extend(removed)
+
+            part_file = os.path.join(output_dir, f"part_{number:03d}.docx")
+            with zipfile.ZipFile(part_file, 'w', zipfile.ZIP_DEFLATED) as part_zip:
+                for name in zip_ref.namelist():
+                    if name in skipped:
+                        continue
+                    if name == DOCUMENT_PART:
+                        part_zip.writestr(name, document_xml)
+                    elif name == DOCUMENT_RELS:
+                        part_zip.writestr(name, rels_xml)
+                    else:
+                        part_zip.writestr(name, zip_ref.read(name))
+            part_files.append(part_file)
+
+    return part_files
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python split_docx.py <input.docx> <output_dir>")
+        sys.exit(1)
+
+    parts = split_docx(sys.argv[1], sys.argv[2])
+    if not parts:
+        print(f"{sys.argv[1]} has no Heading 1 to split at")
+        sys.exit(2)
+    print(f"Split {sys.argv[1]} into {len(parts)} parts in {sys.argv[2]}")
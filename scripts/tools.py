@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import threading
+
+import tracing
+import governor
+
+# Seconds spent in each external tool, since the last reset, by the current thread:
+# pipeline steps running at the same time each count only their own tools
+_local = threading.local()
+# Helper threads of a step add to the step's dictionary
+_lock = threading.Lock()
+
+def _tool_seconds():
+    if not hasattr(_local, "seconds"):
+        _local.seconds = {}
+    return _local.seconds
+
+def bind(function):
+    """Wrap function so that, run in a helper thread, its tool time counts for the calling thread."""
+    seconds = _tool_seconds()
+
+    def bound(*args, **kwargs):
+        previous = getattr(_local, "seconds", None)
+        _local.seconds = seconds
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.seconds = previous if previous is not None else {}
+    return bound
+
+def record_tool(tool, seconds, **details):
+    """Add time spent in an external tool (for tools not started through run_tool), ending now."""
+    with _lock:
+        times = _tool_seconds()
+        times[tool] = times.get(tool, 0.0) + seconds
+    end = tracing.now_us()
+    tracing.emit(tool, "tool", end - seconds * 1e6, end, **details)
+
+def run_tool(cmd, **kwargs):
+    """
+    subprocess.run for the external tools of the pipeline, timing each invocation.
+    Tools run under the governor: wall-clock timeout, address space and CPU limits, whole group killed.
+    """
+    start = time.perf_counter()
+    try:
+        return governor.run(cmd, **kwargs)
+    finally:
+        record_tool(os.path.basename(cmd[0]), time.perf_counter() - start, command=" ".join(map(str, cmd)))
+
+def tool_times():
+    """Seconds per external tool recorded so far by the current thread."""
+    with _lock:
+        return dict(_tool_seconds())
+
+def reset_tool_times():
+    with _lock:
+        _tool_seconds().clear()
+
+def add_tool_times(times):
+    """Merge tool times measured in another process (which traced its own spans)."""
+    with _lock:
+        own = _tool_seconds()
+        for tool, seconds in times.items():
+            own[tool] = own.get(tool, 0.0) + seconds
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import glob
+import time
+import threading
+from contextlib import contextmanager
+
+# Set by configure() in every process taking part in a traced batch
+_trace_dir = None
+_worker_id = 0
+_worker_pid = None
+_thread_ids = {}
+_lock = threading.Lock()
+
+def configure(trace_dir, worker_id):
+    """Send the spans of this process to trace_dir, on the timeline row of worker_id."""
+    global _trace_dir, _worker_id, _worker_pid
+    _trace_dir = trace_dir
+    _worker_id = worker_id
+    _worker_pid = os.getpid()
+    if trace_dir:
+        os.makedirs(trace_dir, exist_ok=True)
+
+def enabled():
+    return _trace_dir is not None
+
+def now_us():
+    return time.time() * 1e6
+
+# Rows of the timeline: a worker's main thread is row <worker>, its extra threads <worker>*1000+n
+# and its child processes CHILD_ROWS+pid, pids being below 2**22
+CHILD_ROWS = 10 ** 7
+
+def _thread_row():
+    """
+    Timeline row of the caller as (tid, kind, number): the worker's own row for its main thread,
+    and separate rows for its extra threads and child processes (part converters, Inkscape shells)
+    so spans do not overlap.
+    """
+    if os.getpid() != _worker_pid:
+        return CHILD_ROWS + os.getpid(), "child", os.getpid()
+    ident = threading.get_ident()
+    if threading.current_thread() is threading.main_thread():
+        return _worker_id, "worker", 0
+    with _lock:
+        if ident not in _thread_ids:
+            _thread_ids[ident] = len(_thread_ids) + 1
+        return _worker_id * 1000 + _thread_ids[ident], "thread", _thread_ids[ident]
+
+def emit(name, category, start_us, end_us, **args):
+    """Write one complete span ("X" event) to this process' trace file."""
+    if _trace_dir is None:
+        return
+    tid, kind, number = _thread_row()
+    event = {
+        "name": name, "cat": category, "ph": "X",
+        "ts": round(start_us), "dur": max(0, round(end_us - start_us)),
+        "pid": 1, "tid": tid, "args": args,
+        # Used by merge() to name the row, and removed from the trace
+        "row": [_worker_id, kind, number],
+    }
+    with _lock:
+        with open(os.path.join(_trace_dir, f"{os.getpid()}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+
+@contextmanager
+def span(name, category, **args):
+    """Record the enclosed block as a span of the timeline."""
+    if _trace_dir is None:
+        yield
+        return
+    start = now_us()
+    try:
+        yield
+    finally:
+        emit(name, category, start, now_us(), **args)
+
+def merge(trace_dir, output_file):
+    """Combine the per-process span files into one Chrome trace-event JSON file (about:tracing, Perfetto)."""
+    events = []
+    for events_file in glob.glob(os.path.join(trace_dir, "*.jsonl")):
+        with open(events_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+
+    # Name the rows: workers, their threads and their child processes, each worker's rows together
+    rows = {}
+    for event in events:
+        worker, kind, number = event.pop("row", (0, "", event["tid"]))
+        rows[event["tid"]] = (worker, kind, number)
+    order = {"worker": 0, "thread": 1, "child": 2}
+    metadata = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "batch"}}]
+    for index, (tid, (worker, kind, number)) in enumerate(sorted(rows.items(),
+                                                                 key=lambda row: (row[1][0], order.get(row[1][1], 3), row[1][2]))):
+        if kind == "worker":
+            label = f"worker {worker}"
+        elif kind in ("thread", "child"):
+            label = f"worker {worker} {kind} {number}"
+        else:
+            label = f"row {tid}"
+        metadata.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": label}})
+        metadata.append({"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": tid, "args": {"sort_index": index}})
+
+    events.sort(key=lambda event: event["ts"])
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+    return len(events)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import glob
+import shutil
+import select
+import struct
+import ctypes
+import ctypes.util
+import zipfile
+import argparse
+
+from pipeline import convert_document, sanitize_name, remove_document_outputs, add_pipeline_arguments, pipeline_options, setup_logging
+from prepare_for_production import prepare_for_production, open_database, remove_from_database, write_manifest
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+def is_document(path):
+    """Only real .docx files count (not Word lock files or hidden temporary uploads)."""
+    name = os.path.basename(path)
+    return name.lower().endswith(".docx") and not name.startswith(("~$", "."))
+
+class InotifyWatcher:
+    """Report changed and deleted files of a directory using inotify through libc."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+
+    def events(self, timeout):
+        """Return [(kind, path)] with kind 'changed' or 'deleted', waiting at most timeout seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        buffer = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            _, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if not name:
+                continue
+            path = os.path.join(self.directory, name)
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                events.append(("deleted", path))
+            else:
+                events.append(("changed", path))
+        return events
+
+class PollingWatcher:
+    """Same interface as InotifyWatcher, comparing directory listings (non-Linux systems, network shares)."""
+
+    def __init__(self, directory, interval=2.0):
+        self.directory = directory
+        self.interval = interval
+        self.known = self.snapshot()
+
+    def snapshot(self):
+        files = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def events(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self.snapshot()
+        events = [("changed", path) for path, signature in current.items() if self.known.get(path) != signature]
+        events += [("deleted", path) for path in self.known if path not in current]
+        self.known = current
+        return events
+
+def upload_complete(path):
+    """A document is complete once it is a readable zip (scp and smb write it in place)."""
+    try:
+        with zipfile.ZipFile(path) as zip_ref:
+            return "word/document.xml" in zip_ref.NameToInfo
+    except (OSError, zipfile.BadZipFile):
+        return False
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def remove_document(name, production_dir, database_file=None):
+    """Delete every artifact of a document, including its production folder and database rows."""
+    removed = remove_document_outputs(name)
+    doc_prod_dir = os.path.join(production_dir, name)
+    if os.path.isdir(doc_prod_dir):
+        shutil.rmtree(doc_prod_dir, ignore_errors=True)
+        removed += 1
+    if database_file and os.path.exists(database_file):
+        connection = open_database(database_file)
+        try:
+            with connection:
+                remove_from_database(connection, name)
+        finally:
+            connection.close()
+    print(f"Removed {removed} artifacts of {name}")
+
+def process_document(path, production_dir, options, database_file=None, split_depth=0):
+    """Convert one document from scratch and refresh its production folder (split per section with split_depth)."""
+    name = sanitize_name(path)
+    print("==========================================")
+    print(f"Processing {os.path.basename(path)}...")
+    print("==========================================")
+    # Images or sections removed from the new version must not survive in the outputs
+    remove_document(name, production_dir, database_file)
+    try:
+        final_md = convert_document(path, **options)
+        if final_md:
+            os.makedirs(production_dir, exist_ok=True)
+            prepare_for_production(final_md, production_dir, database_file, split_depth)
+    except Exception as e:
+        print(f"ERROR: Conversion of {path} failed: {e}")
+    sys.stdout.flush()
+
+def out_of_date(path):
+    """True when the document has no final output or changed since it was converted."""
+    final_md = f"output/{sanitize_name(path)}_final.md"
+    return not os.path.exists(final_md) or os.path.getmtime(final_md) < os.path.getmtime(path)
+
+def watch(source_dir, production_dir, options, debounce=5.0, poll=False, database_file=None, split_depth=0):
+    """Convert documents of source_dir as soon as they are completely written, until interrupted."""
+    watcher = None
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(source_dir)
+            print(f"Watching {source_dir} with inotify")
+        except OSError as e:
+            print(f"inotify not available ({e}), polling instead")
+    if watcher is None:
+        watcher = PollingWatcher(source_dir)
+        print(f"Watching {source_dir} by polling every {watcher.interval}s")
+
+    # path -> (time of the last event, size and mtime at that time)
+    pending = {}
+
+    # Documents added or modified while the daemon was stopped
+    for path in sorted(glob.glob(os.path.join(source_dir, "*.docx"))):
+        if is_document(path) and out_of_date(path):
+            pending[path] = (0.0, file_signature(path))
+
+    while True:
+        for kind, path in watcher.events(timeout=1.0):
+            if not is_document(path):
+                continue
+            if kind == "deleted" and not os.path.exists(path):
+                pending.pop(path, None)
+                print(f"{path} was deleted")
+                remove_document(sanitize_name(path), production_dir, database_file)
+                if os.path.isdir(production_dir):
+                    write_manifest(production_dir)
+            else:
+                pending[path] = (time.monotonic(), file_signature(path))
+
+        now = time.monotonic()
+        for path, (last_event, signature) in list(pending.items()):
+            if now - last_event < debounce:
+                continue
+            current = file_signature(path)
+            if current is None:
+                del pending[path]
+            elif current != signature or not upload_complete(path):
+                # Still being written: wait for another quiet period
+                pending[path] = (now, current)
+            else:
+                del pending[path]
+                process_document(path, production_dir, options, database_file, split_depth)
+                if os.path.isdir(production_dir):
+                    write_manifest(production_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert documents dropped in source/ as soon as they are complete (run from the repository root).")
+    parser.add_argument("--source", default="source", help="directory to watch")
+    parser.add_argument("--production", default="production", help="production directory to keep up to date")
+    parser.add_argument("--debounce", type=float, default=5.0,
+                        help="seconds without change before a document is converted")
+    parser.add_argument("--poll", action="store_true", help="poll the directory instead of using inotify")
+    parser.add_argument("--database", help="also keep this SQLite production database up to date")
+    parser.add_argument("--split-depth", type=int, default=0, metavar="N",
+                        help="publish one file per section of the first N heading levels plus an index")
+    add_pipeline_arguments(parser)
+    args = parser.parse_args()
+    setup_logging()
+
+    os.makedirs(args.source, exist_ok=True)
+    try:
+        watch(args.source, args.production, pipeline_options(args), args.debounce, args.poll, args.database,
+              args.split_depth)
+    except KeyboardInterrupt:
+        print("Stopped watching")
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+
+from pipeline import convert_document, add_pipeline_arguments, pipeline_options, sanitize_name, setup_logging
+
+# Layout of a queue directory shared by every worker (NFS or any shared filesystem):
+#   pending/<doc>.docx      documents waiting to be converted
+#   leases/<doc>.lease      claim of a worker on a pending document, renewed by heartbeats
+#   done/<doc>/             outputs of a finished document (output/, images/, <doc>.log, result.json)
+#   failed/<doc>.json       failed attempts, failed/<doc>.docx once a document is given up
+QUEUE_DIRS = ("pending", "leases", "done", "failed")
+
+def queue_path(queue_dir, *parts):
+    return os.path.join(queue_dir, *parts)
+
+def init_queue(queue_dir):
+    for directory in QUEUE_DIRS:
+        os.makedirs(queue_path(queue_dir, directory), exist_ok=True)
+
+def write_atomic(path, data):
+    """Write a JSON file so that readers on any host see either the old or the new content."""
+    temp_file = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+
+def read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class Lease:
+    """
+    Exclusive claim of one worker on one document: a lease file created with O_EXCL and
+    holding an expiry time, which the owner pushes back with heartbeats.
+    Expiry times come from the workers' clocks, so the hosts must be kept in sync (NTP).
+    """
+
+    def __init__(self, queue_dir, name, worker_id, duration):
+        self.path = queue_path(queue_dir, "leases", f"{name}.lease")
+        self.worker_id = worker_id
+        self.duration = duration
+        self.token = uuid.uuid4().hex
+        self.attempt = 1
+        self.reclaimed_from = None
+
+    def content(self):
+        return {"worker": self.worker_id, "host": socket.gethostname(), "pid": os.getpid(),
+                "token": self.token, "attempt": self.attempt, "expires": time.time() + self.duration}
+
+    def create(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.content(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+
+    def acquire(self):
+        """Claim the document, reclaiming the lease of a worker that stopped renewing it."""
+        if self.create():
+            return True
+        current = read_json(self.path)
+        if current is None:
+            # Being written by its creator, or unreadable: expired only when its file is old
+            try:
+                if time.time() - os.path.getmtime(self.path) < self.duration:
+                    return False
+            except OSError:
+                return False
+            current = {"token": None, "attempt": 0}
+        elif current.get("expires", 0) > time.time():
+            return False
+
+        # Only one worker can move the expired lease away, the others get FileNotFoundError
+        stale = f"{self.path}.{self.token}.reclaim"
+        try:
+            os.rename(self.path, stale)
+        except FileNotFoundError:
+            return False
+        moved = read_json(stale) or {"token": None}
+        if moved.get("token") != current.get("token"):
+            # Another worker reclaimed it first and already holds a fresh lease: give it back
+            try:
+                os.link(stale, self.path)
+            except OSError:
+                pass
+            os.remove(stale)
+            return False
+        os.remove(stale)
+        print(f"Reclaiming expired lease of {current.get('worker', 'unknown worker')} on {os.path.basename(self.path)}")
+        self.attempt = current.get("attempt", 0) + 1
+        self.reclaimed_from = current.get("worker", "unknown worker")
+        return self.create()
+
+    def owned(self):
+        current = read_json(self.path)
+        return current is not None and current.get("token") == self.token
+
+    def renew(self):
+        """Push the expiry back; returns False when the lease was lost to another worker."""
+        if not self.owned():
+            return False
+        write_atomic(self.path, self.content())
+        return True
+
+    def release(self):
+        if self.owned():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+
+class Heartbeat(threading.Thread):
+    """Renew a lease every third of its duration while the document is converted."""
+
+    def __init__(self, lease):
+        super().__init__(daemon=True)
+        self.lease = lease
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.lease.duration / 3):
+            try:
+                if not self.lease.renew():
+                    self.lost = True
+                    return
+            except OSError as e:
+                # Shared filesystem hiccup: try again at the next beat, before the lease expires
+                print(f"WARNING: Could not renew {self.lease.path}: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def submit(queue_dir, files):
+    """Add documents to the queue, replacing the results of a previous conversion."""
+    init_queue(queue_dir)
+    for file in files:
+        name = sanitize_name(file)
+        shutil.rmtree(queue_path(queue_dir, "done", name), ignore_errors=True)
+        for stale in (queue_path(queue_dir, "failed", f"{name}.json"), queue_path(queue_dir, "failed", f"{name}.docx")):
+            if os.path.exists(stale):
+                os.remove(stale)
+        pending = queue_path(queue_dir, "pending", f"{name}.docx")
+        # Copied under a temporary name, so workers never pick up a partial file
+        temp_file = queue_path(queue_dir, "pending", f".{name}.{uuid.uuid4().hex}.tmp")
+        shutil.copyfile(file, temp_file)
+        os.replace(temp_file, pending)
+        print(f"Queued {name}")
+    return len(files)
+
+def convert_claimed(queue_dir, name, options, lease):
+    """
+    Convert a claimed document in a private local directory and publish its outputs in done/<doc>.
+    Returns True when the document was converted and published.
+    """
+    pending = queue_path(queue_dir, "pending", f"{name}.docx")
+    work_dir = tempfile.mkdtemp(prefix="docx2md_queue_")
+    previous_dir = os.getcwd()
+    heartbeat = Heartbeat(lease)
+    heartbeat.start()
+    start = time.time()
+    try:
+        os.chdir(work_dir)
+        os.makedirs("source", exist_ok=True)
+        source_file = os.path.join("source", f"{name}.docx")
+        shutil.copyfile(pending, source_file)
+        with open(f"{name}.log", 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+            try:
+                final_md = convert_document(source_file, **options)
+            except Exception as e:
+                print(f"ERROR: Conversion failed: {e}")
+                final_md = None
+
+        # The heartbeat keeps running until the outputs are published: copying them can take longer than the lease
+        if heartbeat.lost or not lease.owned():
+            print(f"Lease on {name} was lost, discarding this conversion")
+            return False
+        if not final_md:
+            with open(f"{name}.log", 'r', encoding='utf-8') as f:
+                record_failure(queue_dir, name, lease.worker_id, f.read()[-2000:])
+            return False
+
+        # Everything is staged next to done/ and renamed in one step
+        staging = queue_path(queue_dir, "done", f".{name}.{lease.token}.tmp")
+        os.makedirs(os.path.join(staging, "output"))
+        shutil.copyfile(final_md, os.path.join(staging, "output", os.path.basename(final_md)))
+        if os.path.isdir(os.path.join("images", name)):
+            shutil.copytree(os.path.join("images", name), os.path.join(staging, "images", name))
+        shutil.copyfile(f"{name}.log", os.path.join(staging, f"{name}.log"))
+        if os.path.exists("output/metrics.jsonl"):
+            shutil.copyfile("output/metrics.jsonl", os.path.join(staging, "metrics.jsonl"))
+        write_atomic(os.path.join(staging, "result.json"), {
+            "document": name, "worker": lease.worker_id, "host": socket.gethostname(),
+            "attempt": lease.attempt, "seconds": round(time.time() - start, 3),
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+
+        if heartbeat.lost or not lease.owned():
+            print(f"Lease on {name} was lost while publishing, discarding this conversion")
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+        done = queue_path(queue_dir, "done", name)
+        shutil.rmtree(done, ignore_errors=True)
+        os.rename(staging, done)
+        heartbeat.stop()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(pending)
+        return True
+    finally:
+        if heartbeat.is_alive():
+            heartbeat.stop()
+        os.chdir(previous_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        lease.release()
+
+def record_failure(queue_dir, name, worker_id, log):
+    """Count a failed attempt of a document (work() gives it up after max_attempts)."""
+    failures_file = queue_path(queue_dir, "failed", f"{name}.json")
+    failures = read_json(failures_file) or {"document": name, "attempts": []}
+    failures["attempts"].append({"worker": worker_id, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "log": log})
+    write_atomic(failures_file, failures)
+
+def attempts(queue_dir, name):
+    failures = read_json(queue_path(queue_dir, "failed", f"{name}.json"))
+    return len(failures["attempts"]) if failures else 0
+
+def work(queue_dir, options, worker_id, lease_seconds=60, wait=False, poll=5.0, max_attempts=3):
+    """
+    Claim and convert pending documents until none is left (or forever with wait=True).
+    Returns the number of documents this worker converted.
+    """
+    queue_dir = os.path.abspath(queue_dir)
+    init_queue(queue_dir)
+    converted = 0
+    while True:
+        claimed = False
+        for pending in sorted(glob.glob(queue_path(queue_dir, "pending", "*.docx"))):
+            name = os.path.splitext(os.path.basename(pending))[0]
+            if attempts(queue_dir, name) >= max_attempts:
+                # Given up: kept in failed/ for inspection
+                with contextlib.suppress(FileNotFoundError):
+                    os.replace(pending, queue_path(queue_dir, "failed", f"{name}.docx"))
+                print(f"[{worker_id}] Giving up {name} after {max_attempts} failed attempts")
+                continue
+            lease = Lease(queue_dir, name, worker_id, lease_seconds)
+            if not lease.acquire():
+                continue
+            if not os.path.exists(pending):
+                # Finished by another worker between the listing and the claim
+                lease.release()
+                continue
+            if lease.reclaimed_from:
+                # The previous worker died or hung on this document: that counts as a failed attempt
+                record_failure(queue_dir, name, lease.reclaimed_from, "lease expired")
+                if attempts(queue_dir, name) >= max_attempts:
+                    lease.release()
+                    continue
+            claimed = True
+            print(f"[{worker_id}] Converting {name} (attempt {lease.attempt})")
+            sys.stdout.flush()
+            if convert_claimed(queue_dir, name, options, lease):
+                converted += 1
+                print(f"[{worker_id}] Done {name}")
+            else:
+                print(f"[{worker_id}] Failed {name}")
+            sys.stdout.flush()
+        if not claimed:
+            if not wait and not glob.glob(queue_path(queue_dir, "pending", "*.docx")):
+                return converted
+            # Documents still pending are leased by other workers, which may crash
+            time.sleep(poll)
+
+def collect(queue_dir, output_dir="."):
+    """Copy the outputs of every finished document into output/ and images/ of output_dir."""
+    collected = 0
+    for done in sorted(glob.glob(queue_path(queue_dir, "done", "*"))):
+        if not os.path.isdir(done) or os.path.basename(done).startswith("."):
+            continue
+        for directory in ("output", "images"):
+            if os.path.isdir(os.path.join(done, directory)):
+                shutil.copytree(os.path.join(done, directory), os.path.join(output_dir, directory), dirs_exist_ok=True)
+        collected += 1
+    print(f"Collected {collected} documents into {os.path.abspath(output_dir)}")
+    return collected
+
+def status(queue_dir):
+    now = time.time()
+    pending = sorted(glob.glob(queue_path(queue_dir, "pending", "*.docx")))
+    done = [d for d in glob.glob(queue_path(queue_dir, "done", "*")) if not os.path.basename(d).startswith(".")]
+    given_up = glob.glob(queue_path(queue_dir, "failed", "*.docx"))
+    print(f"pending: {len(pending)}  done: {len(done)}  failed: {len(given_up)}")
+    for lease_file in sorted(glob.glob(queue_path(queue_dir, "leases", "*.lease"))):
+        lease = read_json(lease_file) or {}
+        remaining = lease.get("expires", 0) - now
+        state = f"expires in {remaining:.0f}s" if remaining > 0 else f"EXPIRED {-remaining:.0f}s ago"
+        print(f"  {os.path.basename(lease_file)[:-6]}: {lease.get('worker', '?')} attempt {lease.get('attempt', '?')}, {state}")
+
+def run_workers(queue_dir, options, processes, lease_seconds, wait, poll, max_attempts):
+    """Start several local workers (each one behaves like a worker on another host)."""
+    context = multiprocessing.get_context('fork')
+    workers = []
+    for index in range(processes):
+        worker_id = f"{socket.gethostname()}-{index + 1}"
+        process = context.Process(target=work, args=(queue_dir, options, worker_id, lease_seconds, wait, poll, max_attempts))
+        process.start()
+        workers.append(process)
+    for process in workers:
+        process.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work queue on a shared directory for converting on several hosts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="queue DOCX files (or every DOCX of directories)")
+    submit_parser.add_argument("queue")
+    submit_parser.add_argument("files", nargs="+")
+
+    worker_parser = commands.add_parser("worker", help="convert queued documents until the queue is empty")
+    worker_parser.add_argument("queue")
+    worker_parser.add_argument("--id", help="worker name (default: host-pid)")
+    worker_parser.add_argument("--processes", type=int, default=1, help="workers to start on this host")
+    worker_parser.add_argument("--lease", type=float, default=60, help="seconds a claim lasts without heartbeat")
+    worker_parser.add_argument("--wait", action="store_true", help="keep waiting for new documents")
+    worker_parser.add_argument("--poll", type=float, default=5.0, help="seconds between scans of an idle queue")
+    worker_parser.add_argument("--max-attempts", type=int, default=3, help="failed attempts before giving up")
+    add_pipeline_arguments(worker_parser)
+
+    collect_parser = commands.add_parser("collect", help="copy the finished outputs into output/ and images/")
+    collect_parser.add_argument("queue")
+    collect_parser.add_argument("--output", default=".", help="directory receiving output/ and images/")
+
+    status_parser = commands.add_parser("status", help="show pending, leased, done and failed documents")
+    status_parser.add_argument("queue")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.command == "submit":
+        files = []
+        for path in args.files:
+            files += sorted(glob.glob(os.path.join(path, "*.docx"))) if os.path.isdir(path) else [path]
+        submit(args.queue, files)
+    elif args.command == "worker":
+        options = pipeline_options(args)
+        if args.processes > 1:
+            run_workers(args.queue, options, args.processes, args.lease, args.wait, args.poll, args.max_attempts)
+        else:
+            worker_id = args.id or f"{socket.gethostname()}-{os.getpid()}"
+            work(args.queue, options, worker_id, args.lease, args.wait, args.poll, args.max_attempts)
+    elif args.command == "collect":
+        collect(args.queue, args.output)
+    else:
+        status(args.queue)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The pipeline modules import each other from scripts/, as when run from the repository root;
+# the standalone tools of the root (detect_non_unicode.py) come after them
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(1, ROOT)
@@ -0,0 +1,47 @@
+import zipfile
+
+from convert_parts import section_fingerprint
+from split_docx import split_docx
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W}">
+  <w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>
+</w:styles>"""
+
+RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"/>"""
+
+def paragraph(text, style=None, rsid="00A1B2C3"):
+    style_xml = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p w:rsidR="{rsid}">{style_xml}<w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+def make_docx(path, paragraphs, rsids):
+    body = "".join(paragraphs)
+    settings = "".join(f'<w:rsid w:val="{rsid}"/>' for rsid in rsids)
+    with zipfile.ZipFile(path, "w") as zip_out:
+        zip_out.writestr("word/document.xml",
+                         f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>')
+        zip_out.writestr("word/_rels/document.xml.rels", RELS)
+        zip_out.writestr("word/styles.xml", STYLES)
+        zip_out.writestr("word/settings.xml",
+                         f'<?xml version="1.0" encoding="UTF-8"?><w:settings xmlns:w="{W}"><w:rsids>{settings}</w:rsids></w:settings>')
+
+def fingerprints(tmp_path, name, paragraphs, rsids):
+    docx = tmp_path / f"{name}.docx"
+    make_docx(docx, paragraphs, rsids)
+    parts = split_docx(str(docx), str(tmp_path / name))
+    return [section_fingerprint(part, [])[0] for part in parts]
+
+def test_unchanged_section_keeps_its_fingerprint(tmp_path):
+    first = fingerprints(tmp_path, "v1", [paragraph("Introduction", "Heading1"), paragraph("Unchanged text"),
+                                          paragraph("Usage", "Heading1"), paragraph("Old text")],
+                         ["00A1B2C3"])
+    # Saving the edit adds a revision session to the settings and to the edited paragraph
+    second = fingerprints(tmp_path, "v2", [paragraph("Introduction", "Heading1"), paragraph("Unchanged text"),
+                                           paragraph("Usage", "Heading1"), paragraph("New text", rsid="00D4E5F6")],
+                          ["00A1B2C3", "00D4E5F6"])
+    assert len(first) == len(second) == 2
+    assert first[0] == second[0]
+    assert first[1] != second[1]
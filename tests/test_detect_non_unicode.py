@@ -0,0 +1,51 @@
+import zipfile
+
+from detect_non_unicode import scan_docx
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+
+def paragraph(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+def text_box(text):
+    # Word stores text boxes twice, the fallback copy must not be counted
+    content = f"<w:txbxContent>{paragraph(text)}</w:txbxContent>"
+    return (f'<w:p><w:r><mc:AlternateContent><mc:Choice Requires="wps">{content}</mc:Choice>'
+            f'<mc:Fallback>{content}</mc:Fallback></mc:AlternateContent></w:r></w:p>')
+
+def make_docx(path):
+    cell = paragraph("cell \ue000")
+    header = paragraph("header \uf0b7")
+    body = (paragraph("Plain text and accents (é) are fine")
+            + paragraph("Bullet \uf0b7 here")
+            + '<w:p><w:r><w:sym w:font="Wingdings" w:char="F0E0"/></w:r></w:p>'
+            + f'<w:tbl><w:tr><w:tc><w:p/></w:tc><w:tc>{cell}</w:tc></w:tr></w:tbl>'
+            + text_box("box \uf0b7"))
+    with zipfile.ZipFile(path, "w") as zip_out:
+        zip_out.writestr("word/document.xml",
+                         f'<w:document xmlns:w="{W}" xmlns:mc="{MC}"><w:body>{body}</w:body></w:document>')
+        zip_out.writestr("word/header2.xml", f'<w:hdr xmlns:w="{W}">{header}</w:hdr>')
+
+def test_private_use_characters_are_found_in_every_part(tmp_path):
+    docx = tmp_path / "test.docx"
+    make_docx(docx)
+
+    result = scan_docx(str(docx))
+
+    assert "error" not in result
+    assert result["occurrences"] == 5
+    bullet = result["characters"]["\\uf0b7"]
+    assert bullet["codepoint"] == "U+F0B7"
+    assert bullet["count"] == 3
+    assert bullet["locations"] == ["Paragraph 2 (position 7)", "Text box 1, Paragraph 1 (position 4)",
+                                   "Header 2, Paragraph 1 (position 7)"]
+    assert result["characters"]["\\uf0e0"]["locations"] == ["Paragraph 3 (position 0)"]
+    assert result["characters"]["\\ue000"]["locations"] == ["Table 1, Row 1, Column 2, Paragraph 1 (position 5)"]
+    assert result["locations"] == {"paragraph": 2, "table": 1, "text box": 1, "header": 1}
+
+def test_damaged_file_is_reported(tmp_path):
+    docx = tmp_path / "broken.docx"
+    docx.write_bytes(b"not a zip")
+
+    assert "error" in scan_docx(str(docx))
@@ -0,0 +1,56 @@
+import os
+import zipfile
+
+from extract_media import extract_media, rewrite_media_links, IMAGE_REL_TYPE
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+OLE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/oleObject"
+
+def relationship(rel_id, rel_type, target):
+    return f'<Relationship Id="{rel_id}" Type="{rel_type}" Target="{target}"/>'
+
+def make_docx(path):
+    body = (f'<w:p><w:r><w:drawing><a:blip xmlns:a="urn:a" r:embed="rId1"/></w:drawing></w:r></w:p>'
+            f'<w:p><w:r><w:drawing><a:blip xmlns:a="urn:a" r:embed="rId2"/></w:drawing></w:r></w:p>'
+            f'<w:p><w:r><w:object><o:OLEObject xmlns:o="urn:o" r:id="rId4"/></w:object></w:r></w:p>')
+    rels = (relationship("rId1", IMAGE_REL_TYPE, "media/image1.png")
+            + relationship("rId2", IMAGE_REL_TYPE, "media/image2.jpeg")
+            + relationship("rId3", IMAGE_REL_TYPE, "media/image3.png")
+            + relationship("rId4", OLE_REL_TYPE, "embeddings/oleObject1.bin"))
+    with zipfile.ZipFile(path, "w") as zip_out:
+        zip_out.writestr("word/document.xml",
+                         f'<w:document xmlns:w="{W}" xmlns:r="{R}"><w:body>{body}</w:body></w:document>')
+        zip_out.writestr("word/_rels/document.xml.rels",
+                         f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>')
+        # Pictures are usually stored as they are, other members deflated
+        zip_out.writestr("word/media/image1.png", b"\x89PNG stored", compress_type=zipfile.ZIP_STORED)
+        zip_out.writestr("word/media/image2.jpeg", b"\xff\xd8 deflated" * 100, compress_type=zipfile.ZIP_DEFLATED)
+        zip_out.writestr("word/media/image3.png", b"\x89PNG unused")
+        zip_out.writestr("word/embeddings/oleObject1.bin", b"OLE")
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_only_referenced_pictures_are_extracted(tmp_path):
+    docx = tmp_path / "test.docx"
+    make_docx(docx)
+    media_root = tmp_path / "images" / "test"
+
+    extracted = extract_media(str(docx), str(media_root))
+
+    assert sorted(os.path.relpath(path, media_root) for path in extracted) == ["media/image1.png", "media/image2.jpeg"]
+    assert read(media_root / "media" / "image1.png") == b"\x89PNG stored"
+    assert read(media_root / "media" / "image2.jpeg") == b"\xff\xd8 deflated" * 100
+    assert sorted(os.listdir(media_root)) == ["media"]
+    assert sorted(os.listdir(media_root / "media")) == ["image1.png", "image2.jpeg"]
+
+def test_media_links_get_the_media_root(tmp_path):
+    md_file = tmp_path / "test.md"
+    md_file.write_text('![](media/image1.png)\n<img src="media/image2.jpeg" />\n[not a picture](media/notes.txt)\n')
+
+    rewrite_media_links(str(md_file), "./images/test/")
+
+    assert md_file.read_text() == ('![](./images/test/media/image1.png)\n<img src="./images/test/media/image2.jpeg" />\n'
+                                   '[not a picture](media/notes.txt)\n')
@@ -0,0 +1,66 @@
+import zipfile
+
+import pytest
+
+from native_convert import NativeConverter, escape_block_start
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W}">
+  <w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>
+  <w:style w:type="paragraph" w:styleId="TOC1"><w:name w:val="toc 1"/></w:style>
+  <w:style w:type="paragraph" w:styleId="TOCHeading"><w:name w:val="TOC Heading"/></w:style>
+</w:styles>"""
+
+def paragraph(text, style=None):
+    style_xml = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{style_xml}<w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+def convert(tmp_path, *paragraphs):
+    docx = tmp_path / "test.docx"
+    body = "".join(paragraphs)
+    with zipfile.ZipFile(docx, "w") as zip_out:
+        zip_out.writestr("word/document.xml",
+                         f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>')
+        zip_out.writestr("word/styles.xml", STYLES)
+    with zipfile.ZipFile(docx) as zip_ref:
+        return NativeConverter(zip_ref, "test").convert()
+
+@pytest.mark.parametrize("text, expected", [
+    ("# not a heading", "\\# not a heading"),
+    ("###### not a heading", "\\###### not a heading"),
+    ("- not a list", "\\- not a list"),
+    ("+ not a list", "\\+ not a list"),
+    ("* not a list", "\\* not a list"),
+    ("1. not numbered", "1\\. not numbered"),
+    ("12) not numbered", "12\\) not numbered"),
+    ("> not a quote", "\\> not a quote"),
+    ("| not | a table", "\\| not | a table"),
+    ("---", "\\---"),
+    ("#hashtag", "#hashtag"),
+    ("-5 degrees", "-5 degrees"),
+    ("2.5 volts", "2.5 volts"),
+    ("plain text", "plain text"),
+])
+def test_escape_block_start(text, expected):
+    assert escape_block_start(text) == expected
+
+def test_plain_paragraphs_do_not_become_blocks(tmp_path):
+    markdown = convert(tmp_path, paragraph("- not a list"), paragraph("# not a heading"),
+                       paragraph("1. not numbered"), paragraph("A real heading", "Heading1"))
+    lines = [line for line in markdown.split("\n") if line]
+    assert lines == ["\\- not a list", "\\# not a heading", "1\\. not numbered", "# A real heading"]
+
+def test_toc_title_is_replaced_by_generated_toc(tmp_path):
+    markdown = convert(tmp_path, paragraph("Table of Contents", "TOCHeading"),
+                       paragraph("1 Introduction 3", "TOC1"), paragraph("1 Introduction", "Heading1"))
+    assert markdown.count("Table of Contents") == 1
+    assert markdown.startswith("## Table of Contents\n")
+    assert "* [1 Introduction](#1-introduction)" in markdown
+
+def test_toc_without_bookmarks_links_duplicate_headings_in_order(tmp_path):
+    markdown = convert(tmp_path, paragraph("1 Setup 3", "TOC1"), paragraph("2 Setup 5", "TOC1"),
+                       paragraph("Setup", "Heading1"), paragraph("Setup", "Heading1"))
+    assert "* [1 Setup](#setup)" in markdown
+    assert "* [2 Setup](#setup-1)" in markdown
@@ -0,0 +1,98 @@
+import json
+import zipfile
+
+from docx import Document
+
+from preflight import preflight, load_preflight
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+  <Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+  <Default Extension="xml" ContentType="application/xml"/>
+  <Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+  <Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>"""
+
+PACKAGE_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W}">
+  <w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+  <w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>
+</w:styles>"""
+
+def run(text, font=None):
+    fonts = f'<w:rPr><w:rFonts w:ascii="{font}" w:hAnsi="{font}"/></w:rPr>' if font else ""
+    return f'<w:r>{fonts}<w:t xml:space="preserve">{text}</w:t></w:r>'
+
+def paragraph(*runs, style=None):
+    style_xml = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{style_xml}{''.join(runs)}</w:p>"
+
+def make_docx(path, *paragraphs):
+    body = "".join(paragraphs)
+    with zipfile.ZipFile(path, "w") as zip_out:
+        zip_out.writestr("[Content_Types].xml", CONTENT_TYPES)
+        zip_out.writestr("_rels/.rels", PACKAGE_RELS)
+        zip_out.writestr("word/document.xml",
+                         f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>')
+        zip_out.writestr("word/_rels/document.xml.rels", DOCUMENT_RELS)
+        zip_out.writestr("word/styles.xml", STYLES)
+
+def run_preflight(tmp_path, *paragraphs):
+    docx = tmp_path / "test.docx"
+    make_docx(docx, *paragraphs)
+    marked = tmp_path / "marked.docx"
+    analysis = preflight(str(docx), str(marked), str(tmp_path / "codeblocks.json"), str(tmp_path / "preflight.json"))
+    return analysis, [p.text for p in Document(str(marked)).paragraphs]
+
+def test_symbol_font_characters_are_remapped(tmp_path):
+    analysis, texts = run_preflight(
+        tmp_path,
+        paragraph(run("Angle "), run("\uf061", "Symbol"), run(" and "), run("\uf0b3", "Symbol")),
+        paragraph(run("Call "), '<w:r><w:sym w:font="Wingdings" w:char="F028"/></w:r>'),
+        paragraph(run("Unknown \uf061", "Private Font")))
+
+    assert texts == ["Angle α and ≥", "Call ☎", "Unknown \uf061"]
+    assert analysis["symbols_remapped"] == 3
+    assert analysis["symbols_unmapped"] == [
+        {"character": "\\uf061", "codepoint": "U+F061", "font": "Private Font", "count": 1}]
+    # Only the character left unmapped is reported as special
+    assert list(analysis["special_characters"]) == ["\\uf061"]
+
+def test_one_pass_marks_code_blocks_and_records_the_outline(tmp_path):
+    analysis, texts = run_preflight(
+        tmp_path,
+        paragraph(run("Installation"), style="Heading1"),
+        paragraph(run("Run the installer:")),
+        paragraph(run("./configure", "Courier New")),
+        paragraph(run("make install", "Courier New")),
+        paragraph(run("Done.")))
+
+    assert texts == ["Installation", "Run the installer:", "@@CODEBLOCK_1@@", "", "Done."]
+    with open(tmp_path / "codeblocks.json", encoding="utf-8") as f:
+        assert json.load(f) == ["./configure\nmake install"]
+    assert analysis["code_blocks"] == [[3, 4]]
+    assert analysis["headings"] == [{"level": 1, "text": "Installation", "paragraph": 1}]
+    assert analysis["paragraphs"] == 5
+
+def test_analysis_of_another_version_is_not_reused(tmp_path):
+    run_preflight(tmp_path, paragraph(run("First version")))
+    docx = str(tmp_path / "test.docx")
+    analysis_file = str(tmp_path / "preflight.json")
+    assert load_preflight(analysis_file, docx) is not None
+
+    make_docx(docx, paragraph(run("Second version")))
+    assert load_preflight(analysis_file, docx) is None
+    # Without the document, the stored outline is still available (routing decisions)
+    assert load_preflight(analysis_file)["headings"] == []
@@ -0,0 +1,181 @@
+import os
+import json
+import gzip
+
+from prepare_for_production import (prepare_for_production, process_directory, write_split_document,
+                                    store_document, search_database, find_section, prune_database, open_database,
+                                    write_manifest, file_sha256, precompress, write_text)
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+GUIDE = """Intro text
+
+# Installation
+
+Run the installer.
+
+```
+# not a heading
+```
+
+## Options
+
+Set the proxy before installing.
+
+# Installation
+
+Second part.
+"""
+
+def media_rows(database, name):
+    connection = open_database(database)
+    try:
+        return connection.execute("SELECT name, bytes FROM media WHERE document = ? ORDER BY name", (name,)).fetchall()
+    finally:
+        connection.close()
+
+def test_sections_are_searchable_and_found_by_anchor(tmp_path):
+    database = str(tmp_path / "docs.db")
+    media_dir = tmp_path / "Guide" / "media"
+    media_dir.mkdir(parents=True)
+    (media_dir / "image1.png").write_bytes(b"12345")
+
+    assert store_document(database, "Guide", GUIDE, "Guide/Guide.md", str(media_dir))
+
+    results = search_database(database, "proxy")
+    assert [(document, title, anchor) for document, title, anchor, _ in results] == [("Guide", "Options", "options")]
+    assert "[proxy]" in results[0][3]
+    assert find_section(database, "Guide", "installation") == "# Installation\n\nRun the installer.\n\n```\n# not a heading\n```"
+    assert find_section(database, "Guide", "installation-1") == "# Installation\n\nSecond part."
+    assert find_section(database, "Guide", "missing") is None
+    assert media_rows(database, "Guide") == [("image1.png", 5)]
+
+def test_new_version_replaces_the_old_sections(tmp_path):
+    database = str(tmp_path / "docs.db")
+    store_document(database, "Guide", GUIDE, "Guide/Guide.md", str(tmp_path / "none"))
+    assert not store_document(database, "Guide", GUIDE, "Guide/Guide.md", str(tmp_path / "none"))
+
+    assert store_document(database, "Guide", "# Setup\n\nNo proxy any more, use a mirror.\n", "Guide/Guide.md",
+                          str(tmp_path / "none"))
+    assert search_database(database, "installer") == []
+    assert [title for _, title, _, _ in search_database(database, "mirror")] == ["Setup"]
+
+    assert prune_database(database, set()) == ["Guide"]
+    assert search_database(database, "mirror") == []
+
+def test_document_stored_under_its_media_name_is_not_pruned(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # The final markdown of "Report" uses the media directory of "Report_v2"
+    write("output/Report_final.md", "# Results\n\nMeasured values\n\n![chart](../images/Report_v2/media/image1.png)\n")
+    write("images/Report_v2/media/image1.png", "png")
+    database = str(tmp_path / "production" / "docs.db")
+
+    assert process_directory("output", "production", database) == (1, 0)
+    assert [row[0] for row in search_database(database, "measured")] == ["Report_v2"]
+
+MANUAL = """Title page
+
+## Table of Contents
+
+* [Introduction](#introduction)
+* [Usage](#usage)
+
+Revision 3
+
+# Introduction
+
+See [the options](#options).
+
+## Scope
+
+# Usage
+
+## Options
+
+Back to [scope](#scope) and [here](#options).
+"""
+
+def test_split_sections_link_to_each_other_through_their_files(tmp_path):
+    written = write_split_document(MANUAL, str(tmp_path), "Manual", 1)
+
+    assert [os.path.basename(path) for path in written] == ["Manual.md", "001_introduction.md", "002_usage.md"]
+    assert read(tmp_path / "Manual.md") == (
+        "Title page\n\n## Table of Contents\n\n"
+        "* [Introduction](001_introduction.md)\n  * [Scope](001_introduction.md#scope)\n"
+        "* [Usage](002_usage.md)\n  * [Options](002_usage.md#options)\n\nRevision 3\n")
+    assert read(tmp_path / "001_introduction.md") == "# Introduction\n\nSee [the options](002_usage.md#options).\n\n## Scope\n"
+    assert read(tmp_path / "002_usage.md") == (
+        "# Usage\n\n## Options\n\nBack to [scope](001_introduction.md#scope) and [here](#options).\n")
+
+def test_sections_of_a_previous_split_are_removed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("output/Manual_final.md", MANUAL)
+    prepare_for_production("output/Manual_final.md", "production", split_depth=1)
+    assert sorted(os.listdir("production/Manual")) == ["001_introduction.md", "002_usage.md", "Manual.md", "media"]
+
+    prepare_for_production("output/Manual_final.md", "production")
+    assert sorted(os.listdir("production/Manual")) == ["Manual.md", "media"]
+    assert read("production/Manual/Manual.md") == MANUAL
+
+def test_manifest_diff_lists_the_files_to_publish(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("output/Guide_preflight.json", json.dumps({"source_sha256": "abc"}))
+    write("production/Guide/Guide.md", "# Guide\n")
+    write("production/Guide/media/image1.png", "first")
+
+    diff = write_manifest("production")
+    assert diff["previous"] is None
+    assert diff["added"] == ["Guide/Guide.md", "Guide/media/image1.png"]
+    manifest = json.loads(read("production/manifest.json"))
+    entry = manifest["files"]["Guide/Guide.md"]
+    assert entry["sha256"] == file_sha256("production/Guide/Guide.md")
+    assert entry["etag"] == f'"{entry["sha256"][:32]}"'
+    assert (entry["document"], entry["source_sha256"]) == ("Guide", "abc")
+
+    write("production/Guide/Guide.md", "# Guide, second version\n")
+    os.remove("production/Guide/media/image1.png")
+    write("production/Guide/media/image2.png", "second")
+    diff = write_manifest("production")
+    assert diff["previous"] == manifest["generated"]
+    assert (diff["added"], diff["changed"], diff["removed"]) == (
+        ["Guide/media/image2.png"], ["Guide/Guide.md"], ["Guide/media/image1.png"])
+    assert read("production/changed_files.txt") == "Guide/media/image2.png\nGuide/Guide.md\n"
+
+    assert write_manifest("production")["changed"] == []
+
+def test_precompressed_siblings_follow_their_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    production = tmp_path / "production"
+    index = production / "Guide" / "Guide.md"
+    large = "# Guide\n\n" + "Some text to compress. " * 100
+    write(str(index), large)
+    write(str(production / "Guide" / "small.md"), "# Small\n")
+    write(str(production / "Guide" / "media" / "image1.png"), "png" * 1000)
+
+    assert precompress(str(production), min_size=1024, jobs=1) == 1
+    with gzip.open(f"{index}.gz", "rt", encoding="utf-8") as f:
+        assert f.read() == large
+    assert sorted(os.listdir(production / "Guide")) == ["Guide.md", "Guide.md.gz", "media", "small.md"]
+
+    # Unchanged since the manifest: nothing to compress again
+    write_manifest(str(production))
+    assert precompress(str(production), min_size=1024, jobs=1) == 0
+
+    # A rewritten file never keeps the siblings of its previous content
+    write_text(str(index), large + "More text.\n")
+    assert not os.path.exists(f"{index}.gz")
+    assert precompress(str(production), min_size=1024, jobs=1) == 1
+    with gzip.open(f"{index}.gz", "rt", encoding="utf-8") as f:
+        assert f.read().endswith("More text.\n")
+
+    # Siblings of a file that became too small are removed
+    write(str(index), "# Guide\n")
+    precompress(str(production), min_size=1024, jobs=1)
+    assert not os.path.exists(f"{index}.gz")
@@ -0,0 +1,70 @@
+import os
+import zipfile
+
+from lxml import etree
+
+from split_docx import split_docx, DOCUMENT_PART, DOCUMENT_RELS
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+STYLES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{W}">
+  <w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>
+  <w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/></w:style>
+</w:styles>"""
+
+RELS = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+  <Relationship Id="rId1" Type="{IMAGE}" Target="media/image1.png"/>
+  <Relationship Id="rId2" Type="{IMAGE}" Target="media/image2.png"/>
+</Relationships>"""
+
+def paragraph(text, style=None):
+    style_xml = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f'<w:p>{style_xml}<w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+def picture(rel_id):
+    return f'<w:p><w:r><w:drawing><a:blip xmlns:a="urn:a" r:embed="{rel_id}"/></w:drawing></w:r></w:p>'
+
+def make_docx(path, *paragraphs):
+    body = "".join(paragraphs) + '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/></w:sectPr>'
+    with zipfile.ZipFile(path, "w") as zip_out:
+        zip_out.writestr(DOCUMENT_PART,
+                         f'<w:document xmlns:w="{W}" xmlns:r="{R}"><w:body>{body}</w:body></w:document>')
+        zip_out.writestr(DOCUMENT_RELS, RELS)
+        zip_out.writestr("word/styles.xml", STYLES)
+        zip_out.writestr("word/media/image1.png", b"first")
+        zip_out.writestr("word/media/image2.png", b"second")
+
+def part_content(part_file):
+    """Texts of the body paragraphs, and the other members of a part."""
+    with zipfile.ZipFile(part_file) as zip_ref:
+        body = etree.fromstring(zip_ref.read(DOCUMENT_PART)).find(f"{{{W}}}body")
+        texts = ["".join(p.itertext()) for p in body.iter(f"{{{W}}}p")]
+        last = body[-1].tag
+        return texts, last, sorted(set(zip_ref.namelist()) - {DOCUMENT_PART})
+
+def test_parts_start_at_each_heading_1_and_keep_their_pictures(tmp_path):
+    docx = tmp_path / "test.docx"
+    make_docx(docx, paragraph("Title page"),
+              paragraph("Introduction", "Heading1"), paragraph("Overview", "Heading2"), picture("rId1"),
+              paragraph("Usage", "Heading1"), picture("rId2"))
+
+    parts = split_docx(str(docx), str(tmp_path / "parts"))
+
+    assert [os.path.basename(part) for part in parts] == ["part_000.docx", "part_001.docx", "part_002.docx"]
+    contents = [part_content(part) for part in parts]
+    assert [texts for texts, _, _ in contents] == [["Title page"], ["Introduction", "Overview", ""], ["Usage", ""]]
+    # Every part ends with the section properties of the document
+    assert all(last == f"{{{W}}}sectPr" for _, last, _ in contents)
+    assert contents[0][2] == [DOCUMENT_RELS, "word/styles.xml"]
+    assert contents[1][2] == [DOCUMENT_RELS, "word/media/image1.png", "word/styles.xml"]
+    assert contents[2][2] == [DOCUMENT_RELS, "word/media/image2.png", "word/styles.xml"]
+
+def test_document_with_a_single_section_is_not_split(tmp_path):
+    docx = tmp_path / "test.docx"
+    make_docx(docx, paragraph("Introduction", "Heading1"), paragraph("Overview", "Heading2"))
+
+    assert split_docx(str(docx), str(tmp_path / "parts")) == []
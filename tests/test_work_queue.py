@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import signal
+import shutil
+import multiprocessing
+
+import work_queue
+from pipeline import sanitize_name
+
+def fake_convert(file, delay=0.0, hang=False):
+    """Stands for convert_document: writes a final markdown and one image in the working directory."""
+    if hang:
+        time.sleep(600)
+    time.sleep(delay)
+    name = sanitize_name(file)
+    os.makedirs("output", exist_ok=True)
+    os.makedirs(os.path.join("images", name, "media"), exist_ok=True)
+    with open(os.path.join("images", name, "media", "image1.png"), "wb") as f:
+        f.write(b"png")
+    final_md = os.path.join("output", f"{name}_final.md")
+    with open(final_md, "w", encoding="utf-8") as f:
+        f.write(f"# {name}\n")
+    return final_md
+
+def make_queue(tmp_path, count):
+    queue = str(tmp_path / "queue")
+    files = []
+    for index in range(count):
+        docx = tmp_path / f"doc{index}.docx"
+        docx.write_bytes(b"PK")
+        files.append(str(docx))
+    work_queue.submit(queue, files)
+    return queue
+
+def start_worker(queue, options, worker_id, lease_seconds=2.0):
+    process = multiprocessing.get_context("fork").Process(
+        target=work_queue.work, args=(queue, options, worker_id, lease_seconds, False, 0.2, 3))
+    process.start()
+    return process
+
+def results(queue):
+    done = {}
+    for name in os.listdir(os.path.join(queue, "done")):
+        if not name.startswith("."):
+            with open(os.path.join(queue, "done", name, "result.json"), encoding="utf-8") as f:
+                done[name] = json.load(f)
+    return done
+
+def test_several_workers_convert_each_document_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "convert_document", fake_convert)
+    queue = make_queue(tmp_path, 6)
+    workers = [start_worker(queue, {"delay": 0.2}, f"w{index}") for index in range(3)]
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    done = results(queue)
+    assert sorted(done) == [f"doc{index}" for index in range(6)]
+    assert all(result["attempt"] == 1 for result in done.values())
+    assert os.listdir(os.path.join(queue, "pending")) == []
+    assert os.listdir(os.path.join(queue, "leases")) == []
+    assert os.listdir(os.path.join(queue, "failed")) == []
+    assert os.path.exists(os.path.join(queue, "done", "doc0", "images", "doc0", "media", "image1.png"))
+
+def test_document_of_a_killed_worker_is_reclaimed(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "convert_document", fake_convert)
+    queue = make_queue(tmp_path, 1)
+    hung = start_worker(queue, {"hang": True}, "hung", lease_seconds=1.0)
+    lease_file = os.path.join(queue, "leases", "doc0.lease")
+    deadline = time.time() + 10
+    while not os.path.exists(lease_file) and time.time() < deadline:
+        time.sleep(0.05)
+    assert os.path.exists(lease_file)
+    os.kill(hung.pid, signal.SIGKILL)
+    hung.join()
+
+    assert work_queue.work(queue, {}, "rescuer", lease_seconds=1.0, poll=0.2) == 1
+    assert results(queue)["doc0"]["attempt"] == 2
+    with open(os.path.join(queue, "failed", "doc0.json"), encoding="utf-8") as f:
+        attempts = json.load(f)["attempts"]
+    assert [(a["worker"], a["log"]) for a in attempts] == [("hung", "lease expired")]
+
+def test_lease_is_kept_while_publishing_slowly(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "convert_document", fake_convert)
+    copytree = shutil.copytree
+
+    def slow_copytree(*args, **kwargs):
+        # Publishing takes three lease durations, as a large images/ over NFS
+        time.sleep(3.0)
+        return copytree(*args, **kwargs)
+
+    monkeypatch.setattr(work_queue.shutil, "copytree", slow_copytree)
+    queue = make_queue(tmp_path, 1)
+    publisher = start_worker(queue, {}, "publisher", lease_seconds=1.0)
+    time.sleep(0.5)
+    other = start_worker(queue, {}, "other", lease_seconds=1.0)
+    for process in (publisher, other):
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert results(queue)["doc0"]["worker"] == "publisher"
+    assert results(queue)["doc0"]["attempt"] == 1
+    assert not os.path.exists(os.path.join(queue, "failed", "doc0.json"))